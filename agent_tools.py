@@ -1,9 +1,23 @@
 #!/usr/bin/env python
+import hashlib
 import json
-from typing import Literal
+import sys
+import types
+import weakref
+from typing import List, Literal, get_args, get_origin
 import inspect
 from docstring_parser import parse
-from puzzle_environment import PuzzleEnvironment
+from puzzle_environment import PuzzleEnvironment, move_report, move_sequence_report
+from tool_logging import get_tool_logger
+
+logger = get_tool_logger("tools")
+
+# Registr vygenerovaných schémat klíčovaný podkladovou funkcí (ne vázanou metodou),
+# takže nová instance AgentToolbox introspekci neopakuje.
+_schema_cache = weakref.WeakKeyDictionary()
+
+# Schémata načtená z předpočítaného JSON artefaktu, klíčovaná plným jménem funkce.
+_precomputed_schemas = {}
 
 
 class AgentToolbox:
@@ -14,11 +28,22 @@ class AgentToolbox:
     def __init__(self, puzzle_env: PuzzleEnvironment):
         self.puzzle_env = puzzle_env
 
+    def get_tools(self):
+        """
+        Vrátí seznam metod, které se agentovi registrují jako nástroje.
+        """
+        return [
+            self.get_current_state,
+            self.move_across_river,
+            self.move_sequence,
+            self.check_if_solved,
+        ]
+
     def get_current_state(self):
         """
         Získá aktuální stav hádanky – kdo je na kterém břehu a kde je loďka.
         """
-        print("--- Nástroj 'get_current_state' byl zavolán. ---")
+        logger.info("--- Nástroj 'get_current_state' byl zavolán. ---")
         return self.puzzle_env.get_state_description()
 
     def move_across_river(
@@ -29,22 +54,40 @@ class AgentToolbox:
 
         :param passenger: Koho převézt. Možnosti jsou 'wolf', 'goat', 'cabbage' nebo 'nothing' (převozník jede sám).
         """
-        print(
-            f"--- Nástroj 'move_across_river' byl zavolán s pasažérem: '{passenger}' ---"
+        logger.info(
+            "--- Nástroj 'move_across_river' byl zavolán s pasažérem: '%s' ---", passenger
         )
         passenger = passenger.lower()
 
-        success, message = self.puzzle_env.attempt_move(passenger)
+        response = move_report(self.puzzle_env, passenger)
+        return json.dumps(response, ensure_ascii=False)
+
+    def move_sequence(
+        self,
+        passengers: List[Literal["wolf", "goat", "cabbage", "nothing"]],
+        atomic: bool = False,
+    ):
+        """
+        Provede několik převozů za sebou jedním voláním.
 
-        if success:
+        :param passengers: Pasažéři jednotlivých převozů v pořadí, v jakém se mají provést.
+        :param atomic: Pokud je true a některý tah selže, vrátí se hádanka do stavu před prvním tahem. Jinak zůstanou provedeny tahy před chybou.
+        """
+        logger.info("--- Nástroj 'move_sequence' byl zavolán s pasažéry: %s ---", passengers)
+        # Model nemusí dodržet schéma; chybné argumenty nesmí shodit nástroj.
+        if not isinstance(passengers, list) or not all(
+            isinstance(passenger, str) for passenger in passengers
+        ):
             response = {
-                "status": "úspěch",
-                "popis": message,
-                "novy_stav": self.puzzle_env.get_state_description(),
+                "status": "chyba",
+                "duvod": (
+                    f"Neplatní pasažéři {passengers!r}. Parametr 'passengers' musí být seznam"
+                    " hodnot 'wolf', 'goat', 'cabbage' nebo 'nothing'. Žádný tah nebyl proveden."
+                ),
             }
-        else:
-            response = {"status": "chyba", "duvod": message}
-
+            return json.dumps(response, ensure_ascii=False)
+        passengers = [passenger.lower() for passenger in passengers]
+        response = move_sequence_report(self.puzzle_env, passengers, atomic)
         return json.dumps(response, ensure_ascii=False)
 
     def check_if_solved(self):
@@ -52,7 +95,7 @@ class AgentToolbox:
         Zkontroluje, zda byla hádanka úspěšně vyřešena.
         Tento nástroj volej, vždy když si myslíš, že je hadanka vyřešena, aby jsi si to ověřil.
         """
-        print("--- Nástroj 'check_if_solved' byl zavolán. ---")
+        logger.info("--- Nástroj 'check_if_solved' byl zavolán. ---")
 
         if self.puzzle_env.is_solved():
             return "Potvrzeno. Hádanka je skutečně vyřešena. Nyní můžeš napsat finální zprávu."
@@ -61,6 +104,41 @@ class AgentToolbox:
             return f"Negativní. Hádanka ještě není vyřešena. Pokračuj v práci. Aktuální stav je:\n{current_state}"
 
 
+# Mapa Python typů na JSON Schema typy
+_TYPE_MAPPING = {
+    "str": "string",
+    "int": "integer",
+    "float": "number",
+    "bool": "boolean",
+    "list": "array",
+    "tuple": "array",
+}
+
+
+def _annotation_schema(annotation):
+    """
+    Převede typovou anotaci parametru na JSON schéma (bez popisu).
+    """
+    origin = get_origin(annotation)
+    # Zpracování typu Literal pro vytvoření 'enum'
+    if origin is Literal:
+        return {"type": "string", "enum": list(get_args(annotation))}
+    # Seznamy (list[...], List[...]) se stávají polem se schématem prvků
+    if origin in (list, tuple):
+        args = get_args(annotation)
+        schema = {"type": "array"}
+        if args:
+            schema["items"] = _annotation_schema(args[0])
+        return schema
+
+    type_name = (
+        annotation.__name__
+        if hasattr(annotation, "__name__")
+        else str(annotation)
+    )
+    return {"type": _TYPE_MAPPING.get(type_name, "string")}
+
+
 def generate_tool_schema(func):
     """
     Generuje OpenAI JSON schéma pro danou funkci pomocí introspekce.
@@ -70,26 +148,11 @@ def generate_tool_schema(func):
     # Zparsujeme docstring pro získání popisů
     docstring = parse(func.__doc__)
 
-    # Mapa Python typů na JSON Schema typy
-    type_mapping = {
-        "str": "string",
-        "int": "integer",
-        "float": "number",
-        "bool": "boolean",
-    }
-
     properties = {}
     required = []
 
     for param in signature.parameters.values():
         param_name = param.name
-        param_type_name = (
-            param.annotation.__name__
-            if hasattr(param.annotation, "__name__")
-            else str(param.annotation)
-        )
-
-        schema_type = type_mapping.get(param_type_name, "string")
 
         # Najdeme popis parametru v docstringu
         param_doc = next(
@@ -97,13 +160,10 @@ def generate_tool_schema(func):
         )
         description = param_doc.description if param_doc else ""
 
+        param_schema = _annotation_schema(param.annotation)
         properties[param_name] = {
-            "type": schema_type, "description": description}
-
-        # Zpracování typu Literal pro vytvoření 'enum'
-        if "Literal" in str(param.annotation):
-            # Získáme hodnoty z Literal['a', 'b', ...]
-            properties[param_name]["enum"] = list(param.annotation.__args__)
+            "type": param_schema.pop("type"), "description": description}
+        properties[param_name].update(param_schema)
 
         # Pokud parametr nemá výchozí hodnotu, je povinný
         if param.default is inspect.Parameter.empty:
@@ -122,3 +182,84 @@ def generate_tool_schema(func):
         },
     }
     return tool_schema
+
+
+def _underlying_function(func):
+    return getattr(func, "__func__", func)
+
+
+def _bound_form(func):
+    """
+    Vrátí podobu nástroje, ze které se generuje schéma: metoda bez `self`,
+    ať už přišla vázaná, nebo jako funkce třídy (AgentToolbox.move_across_river).
+    """
+    func = _underlying_function(func)
+    parameters = list(inspect.signature(func).parameters)
+    if parameters and parameters[0] == "self":
+        # Vázání na zástupný objekt odstraní `self` z podpisu, jméno i docstring zůstanou.
+        return types.MethodType(func, object())
+    return func
+
+
+def _qualified_name(func):
+    func = _underlying_function(func)
+    return f"{func.__module__}.{func.__qualname__}"
+
+
+def _fingerprint(func):
+    """
+    Levný otisk docstringu a anotací - pozná zastaralý předpočítaný artefakt
+    bez volání inspect.signature a parse.
+    """
+    func = _underlying_function(func)
+    source = repr((func.__doc__, func.__annotations__, func.__defaults__))
+    return hashlib.sha1(source.encode("utf-8")).hexdigest()
+
+
+def get_tool_schema(func):
+    """
+    Vrátí schéma nástroje z registru; introspekce proběhne jen poprvé.
+    Vrácený slovník je sdílený a nesmí se měnit.
+    """
+    key = _underlying_function(func)
+    schema = _schema_cache.get(key)
+    if schema is None:
+        entry = _precomputed_schemas.get(_qualified_name(key))
+        if entry is not None and entry["fingerprint"] == _fingerprint(key):
+            schema = entry["schema"]
+        else:
+            schema = generate_tool_schema(_bound_form(key))
+        _schema_cache[key] = schema
+    return schema
+
+
+def dump_tool_schemas(funcs, path):
+    """
+    Uloží schémata daných funkcí do JSON artefaktu pro load_tool_schemas.
+    """
+    artifact = {
+        _qualified_name(func): {
+            "fingerprint": _fingerprint(func),
+            "schema": get_tool_schema(func),
+        }
+        for func in funcs
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(artifact, f, ensure_ascii=False, indent=2)
+
+
+def load_tool_schemas(path):
+    """
+    Načte předpočítaná schémata, aby get_tool_schema přeskočil introspekci.
+    Záznamy, jejichž funkce se mezitím změnila, se ignorují a vygenerují znovu.
+    """
+    with open(path, encoding="utf-8") as f:
+        _precomputed_schemas.update(json.load(f))
+
+
+if __name__ == "__main__":
+    # Použití: python agent_tools.py [tool_schemas.json]
+    output_path = sys.argv[1] if len(sys.argv) > 1 else "tool_schemas.json"
+    toolbox = AgentToolbox(PuzzleEnvironment())
+    dump_tool_schemas(toolbox.get_tools(), output_path)
+    print(f"Schémata nástrojů uložena do {output_path}")
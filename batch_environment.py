@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""
+Batch Puzzle Environment - many Wolf, Goat, Cabbage puzzles stepped in lockstep
+
+All states live in one NumPy array and every step is a lookup into the
+transition table from puzzle_solver, so results match PuzzleEnvironment
+exactly while the per-move Python overhead disappears.
+"""
+import numpy as np
+
+from puzzle_environment import (
+    INITIAL_BITS,
+    ITEMS_MASK,
+    MOVE_OK,
+    PASSENGERS,
+    decode_state,
+)
+from puzzle_solver import PASSENGER_INDEX, TRANSITIONS
+
+_ACTION_COUNT = len(PASSENGERS)
+
+# Ploché tabulky indexované hodnotou stav * počet akcí + akce.
+_NEXT_STATES = np.array(
+    [next_bits for row in TRANSITIONS for _, next_bits in row], dtype=np.uint8
+)
+_MOVE_CODES = np.array(
+    [code for row in TRANSITIONS for code, _ in row], dtype=np.uint8
+)
+
+
+def encode_actions(passengers):
+    """
+    Převede seznam jmen pasažérů na pole indexů akcí (pořadí dle PASSENGERS).
+    """
+    try:
+        return np.fromiter(
+            (PASSENGER_INDEX[passenger] for passenger in passengers),
+            dtype=np.intp,
+        )
+    except KeyError as e:
+        raise ValueError(
+            f"Invalid passenger {e}. Must be one of: {', '.join(PASSENGERS)}"
+        ) from None
+
+
+class BatchPuzzleEnvironment:
+    """
+    Drží N nezávislých hádanek v jednom poli bitových stavů.
+    """
+
+    def __init__(self, size: int):
+        self.states = np.full(size, INITIAL_BITS, dtype=np.uint8)
+
+    def __len__(self):
+        return len(self.states)
+
+    def reset(self, mask=None):
+        """
+        Vrátí všechna (nebo jen maskou vybraná) prostředí do počátečního stavu.
+        """
+        if mask is None:
+            self.states.fill(INITIAL_BITS)
+        else:
+            self.states[mask] = INITIAL_BITS
+
+    def step(self, actions):
+        """
+        Provede v každém prostředí jeden tah.
+
+        :param actions: Pole indexů akcí (pořadí dle PASSENGERS) nebo seznam jmen pasažérů.
+        Vrací: (pole bool: úspěch, pole uint8: kód MOVE_*, pole bool: vyřešeno)
+        """
+        actions = np.asarray(actions)
+        if actions.dtype.kind not in "iu":
+            actions = encode_actions(actions)
+        if actions.shape != self.states.shape:
+            raise ValueError(
+                f"Expected {len(self.states)} actions, got {actions.shape}"
+            )
+        if actions.size and (actions.min() < 0 or actions.max() >= _ACTION_COUNT):
+            raise ValueError("Action index out of range")
+
+        index = self.states.astype(np.intp) * _ACTION_COUNT + actions
+        codes = _MOVE_CODES[index]
+        self.states = _NEXT_STATES[index]
+        return codes == MOVE_OK, codes, self.is_solved()
+
+    def is_solved(self):
+        """
+        Vrátí pole příznaků, zda je dané prostředí vyřešeno.
+        """
+        return (self.states & ITEMS_MASK) == ITEMS_MASK
+
+    def get_state(self, index: int):
+        """
+        Vrátí stav jednoho prostředí ve slovníkovém formátu PuzzleEnvironment.state.
+        """
+        return decode_state(int(self.states[index]))
@@ -0,0 +1,284 @@
+#!/usr/bin/env python
+"""
+Benchmark suite for the puzzle environment, toolbox, MCP server and agent loop.
+
+Usage:
+    python benchmark.py --output bench.json
+    python benchmark.py --save-baseline baseline.json
+    python benchmark.py --baseline baseline.json --tolerance 0.25
+
+With --baseline the run exits with status 1 when any benchmark is slower
+than the stored baseline by more than the tolerance.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import timeit
+
+from agent_tools import AgentToolbox, generate_tool_schema, get_tool_schema
+from llm_backends import create_backend_factory
+from mcp_server import create_mcp_server
+from puzzle_environment import BitPuzzleEnvironment, PuzzleEnvironment
+from tool_logging import configure_tool_logging, restore_tool_logging, tool_logging_config
+
+# Registr benchmarků: jméno -> (příprava vracející měřenou funkci, počet volání v jednom měření).
+BENCHMARKS = {}
+
+
+def benchmark(name, number):
+    """
+    Dekorátor registrující benchmark. Dekorovaná funkce připraví data
+    a vrátí funkci bez argumentů, jejíž jedno volání je jedna operace,
+    případně dvojici (funkce, úklid), pokud drží proces nebo spojení.
+    """
+
+    def register(setup):
+        BENCHMARKS[name] = (setup, number)
+        return setup
+
+    return register
+
+
+def _cycle_moves(env_factory):
+    # Opakovaně hraje optimální řešení a pokus o neplatný tah; po vyřešení začne znovu.
+    moves = ["goat", "wolf", "nothing", "wolf", "goat", "cabbage", "nothing", "goat"]
+    env = env_factory()
+    position = 0
+
+    def run():
+        nonlocal env, position
+        env.attempt_move(moves[position])
+        position += 1
+        if position == len(moves):
+            env = env_factory()
+            position = 0
+
+    return run
+
+
+@benchmark("attempt_move", number=20000)
+def bench_attempt_move():
+    return _cycle_moves(PuzzleEnvironment)
+
+
+@benchmark("attempt_move_bits", number=20000)
+def bench_attempt_move_bits():
+    return _cycle_moves(BitPuzzleEnvironment)
+
+
+@benchmark("get_state_description", number=20000)
+def bench_get_state_description():
+    return PuzzleEnvironment().get_state_description
+
+
+@benchmark("get_state_description_bits", number=20000)
+def bench_get_state_description_bits():
+    return BitPuzzleEnvironment().get_state_description
+
+
+@benchmark("generate_tool_schema", number=500)
+def bench_generate_tool_schema():
+    func = AgentToolbox(PuzzleEnvironment()).move_across_river
+    return lambda: generate_tool_schema(func)
+
+
+@benchmark("get_tool_schema_cached", number=20000)
+def bench_get_tool_schema_cached():
+    func = AgentToolbox(PuzzleEnvironment()).move_across_river
+    get_tool_schema(func)
+    return lambda: get_tool_schema(func)
+
+
+@benchmark("mcp_call_tool", number=5000)
+def bench_mcp_call_tool():
+    server = create_mcp_server()
+    return lambda: server.call_tool("get_current_state", {})
+
+
+@benchmark("mcp_memory_call", number=1000)
+def bench_mcp_memory_call():
+    # Plný MCP protokol, ale přes paměťové streamy bez podprocesu.
+    from mcp_client import BlockingMCPClient, memory_session
+    from mcp_server import setup_mcp_server
+
+    client = BlockingMCPClient(lambda: memory_session(setup_mcp_server()))
+    return lambda: client.call_tool("get_current_state", {}), client.close
+
+
+@benchmark("mcp_stdio_call", number=200)
+def bench_mcp_stdio_call():
+    from mcp_client import SERVER_SCRIPT, BlockingMCPClient, stdio_session
+
+    client = BlockingMCPClient(lambda: stdio_session(args=[SERVER_SCRIPT, "--log-mode", "off"]))
+    return lambda: client.call_tool("get_current_state", {}), client.close
+
+
+@benchmark("mcp_http_call", number=200)
+def bench_mcp_http_call():
+    from mcp_client import BlockingMCPClient, http_session
+    from mcp_server import HTTPServerThread
+
+    server = HTTPServerThread().start()
+    client = BlockingMCPClient(lambda: http_session(server.url))
+
+    def cleanup():
+        client.close()
+        server.stop()
+
+    return lambda: client.call_tool("get_current_state", {}), cleanup
+
+
+@benchmark("mcp_stdio_connect", number=3)
+def bench_mcp_stdio_connect():
+    # Každý agent nad stdio platí spuštění nového procesu serveru.
+    from mcp_client import SERVER_SCRIPT, BlockingMCPClient, stdio_session
+
+    session = lambda: stdio_session(args=[SERVER_SCRIPT, "--log-mode", "off"])
+    return lambda: BlockingMCPClient(session).close()
+
+
+@benchmark("mcp_http_connect", number=20)
+def bench_mcp_http_connect():
+    # Nad HTTP se agent jen připojí k již běžícímu serveru.
+    from mcp_client import BlockingMCPClient, http_session
+    from mcp_server import HTTPServerThread
+
+    server = HTTPServerThread().start()
+    connect = lambda: BlockingMCPClient(lambda: http_session(server.url)).close()
+    return connect, server.stop
+
+
+@benchmark("offline_episode", number=50)
+def bench_offline_episode():
+    # Import až zde - main importuje litellm, což je pro ostatní měření zbytečné.
+    from main import run_episode
+
+    factory = create_backend_factory("oracle")
+    return lambda: run_episode("offline", 20, verbose=False, backend_factory=factory)
+
+
+@benchmark("offline_batch_episode", number=50)
+def bench_offline_batch_episode():
+    # Stejná epizoda, ale celé řešení jedním voláním move_sequence.
+    from main import run_episode
+
+    factory = create_backend_factory("oracle-batch")
+    return lambda: run_episode("offline", 20, verbose=False, backend_factory=factory)
+
+
+def run_benchmarks(names=None, repeat=5, scale=1.0):
+    """
+    Spustí vybrané benchmarky a vrátí slovník jméno -> statistiky.
+    Výsledkem je nejlepší z `repeat` měření, protože šum jen přidává čas.
+
+    :param names: Jména benchmarků (None = všechny).
+    :param repeat: Počet opakování měření.
+    :param scale: Násobek počtu volání v jednom měření (pro rychlé běhy < 1).
+    """
+    # Měříme nástroje, ne výpis do terminálu - hlášky o voláních vypneme
+    # a volajícímu pak vrátíme jeho nastavení.
+    previous_logging = tool_logging_config()
+    configure_tool_logging("off")
+    try:
+        results = {}
+        for name in names or BENCHMARKS:
+            setup, number = BENCHMARKS[name]
+            number = max(1, int(number * scale))
+            func = setup()
+            cleanup = None
+            if isinstance(func, tuple):
+                func, cleanup = func
+            try:
+                timings = timeit.Timer(func).repeat(repeat=repeat, number=number)
+            finally:
+                if cleanup is not None:
+                    cleanup()
+            best = min(timings) / number
+            results[name] = {
+                "ns_per_op": best * 1e9,
+                "ops_per_sec": 1 / best if best else float("inf"),
+                "number": number,
+                "repeat": repeat,
+            }
+    finally:
+        restore_tool_logging(previous_logging)
+    return results
+
+
+def compare_to_baseline(results, baseline, tolerance=0.25):
+    """
+    Porovná výsledky s uloženou baseline.
+    Vrací seznam regresí jako slovníky (jméno, baseline, aktuální hodnota, poměr).
+    """
+    regressions = []
+    for name, stats in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        ratio = stats["ns_per_op"] / reference["ns_per_op"]
+        if ratio > 1 + tolerance:
+            regressions.append(
+                {
+                    "name": name,
+                    "baseline_ns": reference["ns_per_op"],
+                    "current_ns": stats["ns_per_op"],
+                    "ratio": ratio,
+                }
+            )
+    return regressions
+
+
+def _report(results):
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--baseline", help="Compare against this stored report")
+    parser.add_argument("--save-baseline", help="Store the report as a new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("names", nargs="*", help="Benchmarks to run (default: all)")
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    results = run_benchmarks(args.names or None, args.repeat, args.scale)
+    report = _report(results)
+    output = json.dumps(report, indent=2)
+
+    print(output)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(output + "\n")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(
+                f"REGRESSION {regression['name']}: "
+                f"{regression['baseline_ns']:.0f} ns -> {regression['current_ns']:.0f} ns "
+                f"({regression['ratio']:.2f}x)",
+                file=sys.stderr,
+            )
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
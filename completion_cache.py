@@ -0,0 +1,318 @@
+#!/usr/bin/env python
+"""
+Completion cache - on-disk cache of model responses for deterministic reruns
+
+The cache key is a SHA-256 of the canonical JSON of everything that
+determines the response: model, messages, tool schemas and the remaining
+request parameters (tool_choice, temperature, ...). A rerun of the same
+evaluation therefore walks the same conversation prefixes and gets every
+response from SQLite instead of the provider.
+
+Only deterministic requests are cached: `temperature=0`, a backend that
+declares `deterministic = True` (the offline backends), or an explicit
+opt-in. A sampled response is not a function of the key - caching it would
+replay the first episode's trajectory for every later episode and turn a
+solve rate over N episodes into N copies of one sample.
+
+Entries are evicted least-recently-used once the cache exceeds
+`max_entries` or `max_bytes`. One SQLite file can be shared by several
+processes (evaluation workers); hit/miss counters are per instance.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from types import SimpleNamespace
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS completions (
+    key TEXT PRIMARY KEY,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS completions_last_used ON completions (last_used);
+"""
+
+
+def _tool_call_to_dict(tool_call):
+    return {
+        "id": getattr(tool_call, "id", None),
+        "type": getattr(tool_call, "type", "function"),
+        "function": {
+            "name": tool_call.function.name,
+            "arguments": tool_call.function.arguments,
+        },
+    }
+
+
+def _message_to_dict(message):
+    """
+    Převede zprávu (slovník nebo objekt odpovědi litellm) na čistý slovník.
+    """
+    if isinstance(message, dict):
+        return message
+    data = {
+        "role": getattr(message, "role", None),
+        "content": getattr(message, "content", None),
+    }
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        data["tool_calls"] = [_tool_call_to_dict(call) for call in tool_calls]
+    return data
+
+
+def cache_key(model, messages, tools=None, **params):
+    """
+    Vrátí klíč požadavku - hash modelu, zpráv, schémat nástrojů a parametrů.
+    """
+    request = {
+        "model": model,
+        "messages": [_message_to_dict(message) for message in messages],
+        "tools": tools,
+        "params": params,
+    }
+    canonical = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def response_to_dict(response):
+    """
+    Serializuje odpověď ve tvaru litellm do JSON slovníku.
+    """
+    usage = getattr(response, "usage", None)
+    return {
+        "model": getattr(response, "model", None),
+        "choices": [
+            {
+                "index": getattr(choice, "index", 0),
+                "finish_reason": getattr(choice, "finish_reason", None),
+                "message": _message_to_dict(choice.message),
+            }
+            for choice in response.choices
+        ],
+        "usage": None if usage is None else {
+            "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+            "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+            "total_tokens": getattr(usage, "total_tokens", 0) or 0,
+        },
+    }
+
+
+def response_from_dict(data):
+    """
+    Sestaví z uloženého slovníku odpověď ve tvaru litellm.
+    """
+    choices = []
+    for choice in data["choices"]:
+        message = choice["message"]
+        tool_calls = [
+            SimpleNamespace(
+                id=call["id"],
+                type=call["type"],
+                function=SimpleNamespace(**call["function"]),
+            )
+            for call in message.get("tool_calls") or ()
+        ]
+        choices.append(
+            SimpleNamespace(
+                index=choice["index"],
+                finish_reason=choice["finish_reason"],
+                message=SimpleNamespace(
+                    role=message["role"],
+                    content=message["content"],
+                    tool_calls=tool_calls or None,
+                ),
+            )
+        )
+    usage = data["usage"]
+    return SimpleNamespace(
+        model=data["model"],
+        choices=choices,
+        usage=None if usage is None else SimpleNamespace(**usage),
+        cache_hit=True,
+    )
+
+
+class CompletionCache:
+    """
+    SQLite úložiště odpovědí s LRU vyřazováním.
+
+    :param path: Soubor databáze (":memory:" pro cache jen v paměti).
+    :param max_entries: Nejvyšší počet uložených odpovědí (None = bez omezení).
+    :param max_bytes: Nejvyšší celková velikost uložených odpovědí v bajtech.
+    """
+
+    def __init__(self, path, max_entries=10000, max_bytes=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        if path != ":memory:":
+            # WAL dovolí souběžné čtení z více procesů evaluace.
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        # Průběžný počet a velikost záznamů, aby put nemusel procházet celou tabulku.
+        # Zápisy jiných procesů do sdíleného souboru nevidí, limity pak platí přibližně.
+        self._entries, self._size = self._db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions"
+        ).fetchone()
+
+    def get(self, key):
+        """
+        Vrátí uloženou odpověď, nebo None. Zásah posune záznam na konec LRU.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT response FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            with self._db:
+                self._db.execute(
+                    "UPDATE completions SET last_used = ? WHERE key = ?",
+                    (time.time(), key),
+                )
+        return response_from_dict(json.loads(row[0]))
+
+    def put(self, key, response):
+        """
+        Uloží odpověď a případně vyřadí nejdéle nepoužité záznamy.
+        """
+        payload = json.dumps(response_to_dict(response), ensure_ascii=False)
+        size = len(payload.encode("utf-8"))
+        with self._lock, self._db:
+            previous = self._db.execute(
+                "SELECT size FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO completions (key, response, size, last_used)"
+                " VALUES (?, ?, ?, ?)",
+                (key, payload, size, time.time()),
+            )
+            if previous is None:
+                self._entries += 1
+            else:
+                self._size -= previous[0]
+            self._size += size
+            self._evict()
+
+    def _over_limit(self):
+        return (self.max_entries is not None and self._entries > self.max_entries) or (
+            self.max_bytes is not None and self._size > self.max_bytes
+        )
+
+    def _evict(self):
+        if not self._over_limit():
+            return
+        # Projdeme nejstarší záznamy, dokud se nevejdeme do limitů.
+        victims = []
+        for key, entry_size in self._db.execute(
+            "SELECT key, size FROM completions ORDER BY last_used"
+        ):
+            if not self._over_limit():
+                break
+            victims.append((key,))
+            self._entries -= 1
+            self._size -= entry_size
+        self._db.executemany("DELETE FROM completions WHERE key = ?", victims)
+        self.evictions += len(victims)
+
+    def stats(self):
+        """
+        Vrátí počty zásahů a výpadků této instance a velikost cache.
+        """
+        with self._lock:
+            entries, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class CachedBackend:
+    """
+    Backend, který před voláním modelu zkusí cache a nové odpovědi do ní uloží.
+
+    Cachují se jen deterministická volání (viz `cacheable`), ostatní jdou
+    vždy na obalený backend.
+
+    :param backend: Obalený backend (LiteLLMBackend, OracleBackend, ...).
+    :param cache: Instance CompletionCache.
+    :param deterministic: Považovat každé volání za deterministické; výchozí
+        je atribut `deterministic` obaleného backendu.
+    """
+
+    def __init__(self, backend, cache, deterministic=None):
+        self.backend = backend
+        self.cache = cache
+        if deterministic is None:
+            deterministic = getattr(backend, "deterministic", False)
+        self.deterministic = deterministic
+        self.bypassed = 0
+
+    def cacheable(self, **kwargs):
+        """
+        Vrátí, zda je odpověď na volání s parametry `kwargs` určena klíčem.
+        """
+        return self.deterministic or kwargs.get("temperature") == 0
+
+    def completion(self, model=None, messages=(), tools=None, **kwargs):
+        if not self.cacheable(**kwargs):
+            self.bypassed += 1
+            return self.backend.completion(model=model, messages=messages, tools=tools, **kwargs)
+        key = cache_key(model, messages, tools, **kwargs)
+        response = self.cache.get(key)
+        if response is None:
+            response = self.backend.completion(
+                model=model, messages=messages, tools=tools, **kwargs
+            )
+            self.cache.put(key, response)
+        return response
+
+    async def acompletion(self, model=None, messages=(), tools=None, **kwargs):
+        if not self.cacheable(**kwargs):
+            self.bypassed += 1
+            return await self.backend.acompletion(
+                model=model, messages=messages, tools=tools, **kwargs
+            )
+        key = cache_key(model, messages, tools, **kwargs)
+        response = self.cache.get(key)
+        if response is None:
+            response = await self.backend.acompletion(
+                model=model, messages=messages, tools=tools, **kwargs
+            )
+            self.cache.put(key, response)
+        return response
+
+
+def cached_backend_factory(backend_factory, cache, deterministic=None):
+    """
+    Obalí továrnu backendů tak, aby každý backend epizody používal `cache`.
+    `deterministic=True` cachuje i volání bez temperature 0 (viz CachedBackend).
+    """
+    return lambda puzzle_env: CachedBackend(backend_factory(puzzle_env), cache, deterministic)
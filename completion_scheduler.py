@@ -0,0 +1,385 @@
+#!/usr/bin/env python
+"""
+Completion scheduler - deadlines, retries, rate limiting and hedging
+
+A CompletionScheduler sits between the agent loop and a backend and is
+meant to be shared by all concurrent episodes of a run:
+
+- every attempt has a timeout and the whole request an overall deadline,
+- retryable failures (timeouts, connection errors, HTTP 408/429/5xx) are
+  retried with exponential backoff and full jitter, honouring `retry_after`
+  when the provider sends one,
+- a token bucket caps the request rate across all episodes; every attempt
+  waits for a token before its timeout starts,
+- with `hedge_after` set, an attempt that has not answered in that time
+  gets a second, identical request if the bucket has a token to spare;
+  whichever answers first wins.
+
+The async path cancels losing or timed-out requests. The sync path runs
+attempts in a thread pool and abandons them instead, because a blocking
+call cannot be interrupted.
+
+A duplicate request is only harmless if the backend is idempotent. For a
+stateful backend (a replayed script) a hedge or an abandoned attempt would
+advance its state and desynchronize it, so calls marked non-idempotent are
+never hedged and, on the sync path, a timed-out attempt is not retried.
+ScheduledBackend takes the flag from the backend's `idempotent` attribute.
+"""
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures import wait as wait_futures
+
+RETRYABLE_STATUS_CODES = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+
+class CompletionTimeout(TimeoutError):
+    """Požadavek nedostal odpověď do svého termínu."""
+
+
+def is_retryable(error):
+    """
+    Rozhodne, zda má smysl chybu zkusit znovu (timeout, síť, 408/429/5xx).
+    """
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    return getattr(error, "status_code", None) in RETRYABLE_STATUS_CODES
+
+
+class TokenBucket:
+    """
+    Omezovač rychlosti sdílený mezi vlákny i korutinami.
+
+    Žeton se rezervuje okamžitě (zůstatek smí jít do mínusu) a volající jen
+    počká, než by na něj došlo - pořadí požadavků je tak férové bez fronty.
+
+    :param rate: Počet žetonů za sekundu.
+    :param capacity: Velikost zásobníku (nejvyšší povolený nárazový počet).
+    """
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens=1):
+        """
+        Odebere žetony a vrátí, kolik sekund je třeba počkat, než platí.
+        """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= tokens
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def try_acquire(self, tokens=1):
+        """
+        Odebere žetony jen tehdy, jsou-li k dispozici hned; jinak vrátí False.
+        """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            if self._tokens < tokens:
+                return False
+            self._tokens -= tokens
+            return True
+
+    def acquire(self, tokens=1):
+        delay = self.reserve(tokens)
+        if delay:
+            time.sleep(delay)
+        return delay
+
+    async def acquire_async(self, tokens=1):
+        delay = self.reserve(tokens)
+        if delay:
+            await asyncio.sleep(delay)
+        return delay
+
+
+class CompletionScheduler:
+    """
+    Pravidla pro volání modelu sdílená všemi epizodami běhu.
+
+    :param timeout: Limit jednoho pokusu v sekundách (None = bez limitu).
+    :param deadline: Limit celého požadavku včetně opakování (None = bez limitu).
+    :param max_retries: Kolikrát nejvýše pokus opakovat.
+    :param backoff_base: Základ exponenciálního čekání mezi pokusy.
+    :param backoff_max: Horní mez čekání mezi pokusy.
+    :param rate_limit: Požadavků za sekundu přes všechny epizody (None = bez omezení).
+    :param burst: Velikost zásobníku token bucketu.
+    :param hedge_after: Po kolika sekundách bez odpovědi poslat záložní požadavek.
+    :param rng: Zdroj náhody pro jitter (kvůli reprodukovatelným testům).
+    """
+
+    def __init__(
+        self,
+        timeout=60.0,
+        deadline=None,
+        max_retries=3,
+        backoff_base=0.5,
+        backoff_max=30.0,
+        rate_limit=None,
+        burst=None,
+        hedge_after=None,
+        rng=None,
+        max_workers=32,
+    ):
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.bucket = TokenBucket(rate_limit, burst) if rate_limit else None
+        self.hedge_after = hedge_after
+        self.rng = rng or random.Random()
+        self.max_workers = max_workers
+        self._executor = None
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            "requests": 0,
+            "attempts": 0,
+            "retries": 0,
+            "timeouts": 0,
+            "failures": 0,
+            "hedges": 0,
+            "hedges_won": 0,
+            "rate_limit_wait": 0.0,
+        }
+
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def backoff(self, attempt, error=None):
+        """
+        Čekání před dalším pokusem: full jitter z exponenciálně rostoucí meze.
+        """
+        delay = self.rng.uniform(
+            0, min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        )
+        retry_after = getattr(error, "retry_after", None)
+        if isinstance(retry_after, (int, float)):
+            delay = max(delay, retry_after)
+        return delay
+
+    def _attempt_timeout(self, started):
+        # Pokus nesmí přesáhnout ani vlastní limit, ani termín celého požadavku.
+        limits = [self.timeout] if self.timeout is not None else []
+        if self.deadline is not None:
+            limits.append(self.deadline - (time.monotonic() - started))
+        return min(limits) if limits else None
+
+    def _retry_delay(self, attempt, error, started):
+        """
+        Vrátí čekání před dalším pokusem, nebo None, pokud už se to nevyplatí.
+        """
+        if attempt >= self.max_retries or not is_retryable(error):
+            return None
+        delay = self.backoff(attempt, error)
+        if self.deadline is not None and (
+            time.monotonic() - started + delay >= self.deadline
+        ):
+            return None
+        return delay
+
+    def _hedge_allowed(self):
+        # Záložní požadavek nesmí čekat na žeton - jen pokud je volný hned.
+        return self.bucket is None or self.bucket.try_acquire()
+
+    # --- asynchronní cesta -------------------------------------------------
+
+    async def _attempt_async(self, call, idempotent=True):
+        self._count("attempts")
+        primary = asyncio.ensure_future(call())
+        tasks = [primary]
+        try:
+            if self.hedge_after is not None and idempotent:
+                done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+                if not done and self._hedge_allowed():
+                    self._count("attempts")
+                    self._count("hedges")
+                    tasks.append(asyncio.ensure_future(call()))
+
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self._count("hedges_won")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def acall(self, call, idempotent=True):
+        """
+        Provede `call()` (vrací awaitable) podle pravidel plánovače.
+        Neidempotentní volání se nezálohuje (hedge); vypršený pokus se zruší,
+        takže ho lze opakovat.
+        """
+        self._count("requests")
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            if self.bucket is not None:
+                self._count("rate_limit_wait", await self.bucket.acquire_async())
+            timeout = self._attempt_timeout(started)
+            try:
+                if timeout is not None and timeout <= 0:
+                    raise CompletionTimeout("completion deadline exceeded")
+                return await asyncio.wait_for(self._attempt_async(call, idempotent), timeout)
+            except asyncio.TimeoutError:
+                self._count("timeouts")
+                error = CompletionTimeout(f"completion attempt timed out after {timeout:.3f}s")
+            except Exception as e:
+                error = e
+
+            delay = self._retry_delay(attempt, error, started)
+            if delay is None:
+                self._count("failures")
+                raise error
+            self._count("retries")
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    # --- synchronní cesta --------------------------------------------------
+
+    def _pool(self):
+        with self._stats_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="completion"
+                )
+            return self._executor
+
+    def _launch(self, call):
+        self._count("attempts")
+        return self._pool().submit(call)
+
+    def _attempt(self, call, timeout, idempotent=True):
+        started = time.monotonic()
+        remaining = lambda: None if timeout is None else max(0.0, timeout - (time.monotonic() - started))
+
+        primary = self._launch(call)
+        futures = [primary]
+        if (
+            self.hedge_after is not None
+            and idempotent
+            and (timeout is None or self.hedge_after < timeout)
+        ):
+            done, _ = wait_futures(futures, timeout=self.hedge_after)
+            if not done and self._hedge_allowed():
+                self._count("hedges")
+                futures.append(self._launch(call))
+
+        pending = set(futures)
+        error = None
+        while pending:
+            done, pending = wait_futures(pending, timeout=remaining(), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    if future is not primary:
+                        self._count("hedges_won")
+                    return future.result()
+                error = future.exception()
+        for future in pending:
+            # Běžící volání nejde přerušit; výsledek se jen zahodí.
+            future.cancel()
+        if error is not None and not pending:
+            raise error
+        raise FutureTimeoutError()
+
+    def call(self, call, idempotent=True):
+        """
+        Provede blokující `call()` podle pravidel plánovače.
+        Neidempotentní volání se nezálohuje a po vypršení se neopakuje:
+        opuštěný pokus dál běží a opakování by stav backendu posunulo dvakrát.
+        """
+        self._count("requests")
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            if self.bucket is not None:
+                self._count("rate_limit_wait", self.bucket.acquire())
+            timeout = self._attempt_timeout(started)
+            try:
+                if timeout is not None and timeout <= 0:
+                    raise CompletionTimeout("completion deadline exceeded")
+                return self._attempt(call, timeout, idempotent)
+            except FutureTimeoutError:
+                self._count("timeouts")
+                error = CompletionTimeout(f"completion attempt timed out after {timeout:.3f}s")
+                if not idempotent:
+                    self._count("failures")
+                    raise error
+            except Exception as e:
+                error = e
+
+            delay = self._retry_delay(attempt, error, started)
+            if delay is None:
+                self._count("failures")
+                raise error
+            self._count("retries")
+            attempt += 1
+            time.sleep(delay)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+class ScheduledBackend:
+    """
+    Backend, jehož volání modelu řídí sdílený CompletionScheduler.
+    """
+
+    def __init__(self, backend, scheduler):
+        self.backend = backend
+        self.scheduler = scheduler
+
+    @property
+    def deterministic(self):
+        # Plánovač odpovědi nemění, rozhoduje obalený backend (viz CompletionCache).
+        return getattr(self.backend, "deterministic", False)
+
+    @property
+    def idempotent(self):
+        # Backend bez označení se považuje za stavový - bez hedgingu.
+        return getattr(self.backend, "idempotent", False)
+
+    def completion(self, **kwargs):
+        return self.scheduler.call(lambda: self.backend.completion(**kwargs), self.idempotent)
+
+    async def acompletion(self, **kwargs):
+        return await self.scheduler.acall(
+            lambda: self.backend.acompletion(**kwargs), self.idempotent
+        )
+
+
+def scheduled_backend_factory(backend_factory, scheduler):
+    """
+    Obalí továrnu backendů tak, aby všechny epizody sdílely `scheduler`.
+    """
+    return lambda puzzle_env: ScheduledBackend(backend_factory(puzzle_env), scheduler)
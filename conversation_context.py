@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+"""
+Conversation Context - compaction of the agent's conversation history
+
+Without compaction the prompt grows linearly with every step: each model
+reply and each tool result (including the full state description in
+`novy_stav`) is sent again. ConversationContext keeps the system prompt, a
+short summary of the current state and only the last K exchanges (a model
+reply plus the results of its tools), and estimates how many prompt tokens
+that saved.
+"""
+import json
+from collections import deque
+
+from llm_backends import estimate_tokens
+
+
+def compact_state_summary(puzzle_env):
+    """
+    Vrátí jednořádkové shrnutí stavu hádanky pro zkrácenou konverzaci.
+    """
+    state = puzzle_env.state
+    left = ", ".join(sorted(state["left_bank"])) or "-"
+    right = ", ".join(sorted(state["right_bank"])) or "-"
+    boat = "vlevo" if state["boat_location"] == "left" else "vpravo"
+    return f"Aktuální stav: levý břeh [{left}], pravý břeh [{right}], loďka {boat}."
+
+
+def _without_state(message):
+    """
+    Vrátí zprávu nástroje bez `novy_stav` - starší výměny stav opakovat nemusí,
+    aktuální stav nese shrnutí.
+    """
+    try:
+        content = json.loads(message["content"])
+    except (TypeError, ValueError):
+        return message
+    if not isinstance(content, dict) or "novy_stav" not in content:
+        return message
+    del content["novy_stav"]
+    return {**message, "content": json.dumps(content, ensure_ascii=False)}
+
+
+class _Exchange:
+    """
+    Jedna výměna: zpráva modelu a odpovědi nástrojů na její volání.
+    Nástroje se od své zprávy modelu nesmí oddělit, proto se zahazují jen celé.
+    """
+
+    __slots__ = ("messages", "compact_messages", "tokens", "compact_tokens")
+
+    def __init__(self, assistant_message, tool_messages):
+        self.messages = [assistant_message, *tool_messages]
+        self.compact_messages = [assistant_message, *map(_without_state, tool_messages)]
+        self.tokens = estimate_tokens(self.messages)
+        self.compact_tokens = estimate_tokens(self.compact_messages)
+
+
+class ConversationContext:
+    """
+    Zprávy posílané modelu s volitelnou kompakcí historie.
+
+    :param system_prompt: Systémový prompt, vždy na začátku konverzace.
+    :param max_exchanges: Kolik posledních výměn ponechat; None = celá historie
+        beze změny (původní chování).
+    :param state_summary: Funkce bez argumentů vracející shrnutí aktuálního stavu;
+        při kompakci se vkládá hned za systémový prompt.
+    """
+
+    def __init__(self, system_prompt, max_exchanges=None, state_summary=None):
+        if max_exchanges is not None and max_exchanges < 1:
+            raise ValueError("max_exchanges must be at least 1")
+        self.system_message = {"role": "system", "content": system_prompt}
+        self.max_exchanges = max_exchanges
+        self.state_summary = state_summary
+        self.exchanges = deque(maxlen=max_exchanges)
+        self.dropped_exchanges = 0
+        self._system_tokens = estimate_tokens([self.system_message])
+        # Velikost celé historie - tolik by měl prompt bez kompakce.
+        self._history_tokens = self._system_tokens
+        # Součty přes všechna volání modelu v epizodě.
+        self.full_prompt_tokens = 0
+        self.sent_prompt_tokens = 0
+
+    def add_exchange(self, assistant_message, tool_messages=()):
+        """
+        Přidá odpověď modelu spolu s výsledky nástrojů, které volala.
+        """
+        if self.max_exchanges is not None and len(self.exchanges) == self.max_exchanges:
+            self.dropped_exchanges += 1
+        exchange = _Exchange(assistant_message, tool_messages)
+        self.exchanges.append(exchange)
+        self._history_tokens += exchange.tokens
+
+    def messages(self):
+        """
+        Sestaví zprávy pro další volání modelu a započte odhad ušetřených tokenů.
+        """
+        messages = [self.system_message]
+        sent_tokens = self._system_tokens
+
+        if self.max_exchanges is None:
+            for exchange in self.exchanges:
+                messages.extend(exchange.messages)
+                sent_tokens += exchange.tokens
+        else:
+            if self.state_summary is not None or self.dropped_exchanges:
+                summary = {"role": "system", "content": self._summary_text()}
+                messages.append(summary)
+                sent_tokens += estimate_tokens([summary])
+            last = len(self.exchanges) - 1
+            for index, exchange in enumerate(self.exchanges):
+                # Jen poslední výměna si nechává plný popis stavu.
+                if index == last:
+                    messages.extend(exchange.messages)
+                    sent_tokens += exchange.tokens
+                else:
+                    messages.extend(exchange.compact_messages)
+                    sent_tokens += exchange.compact_tokens
+
+        self.full_prompt_tokens += self._history_tokens
+        self.sent_prompt_tokens += sent_tokens
+        return messages
+
+    def _summary_text(self):
+        lines = []
+        if self.dropped_exchanges:
+            lines.append(
+                f"Starší kroky ({self.dropped_exchanges}) byly z konverzace vynechány."
+            )
+        if self.state_summary is not None:
+            lines.append(self.state_summary())
+        return "\n".join(lines)
+
+    @property
+    def saved_tokens(self):
+        return self.full_prompt_tokens - self.sent_prompt_tokens
+
+    def stats(self):
+        """
+        Vrátí odhad velikosti promptů za epizodu - s kompakcí i bez ní.
+        """
+        return {
+            "context_full_tokens": self.full_prompt_tokens,
+            "context_sent_tokens": self.sent_prompt_tokens,
+            "context_tokens_saved": self.saved_tokens,
+            "context_dropped_exchanges": self.dropped_exchanges,
+        }
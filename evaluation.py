@@ -0,0 +1,338 @@
+#!/usr/bin/env python
+"""
+Evaluation harness - sweeps a grid of agent configurations over a process pool.
+
+Every (model, prompt, max_steps, tool interface) combination is run for a
+number of episodes. Episodes are fanned out to worker processes, each with
+its own PuzzleEnvironment or PuzzleMCPServer, and every finished episode is
+appended to a JSONL file immediately. Re-running with the same output file
+skips episodes that are already recorded, so a crashed sweep can resume.
+Episodes recorded with an error (timeouts, rate limits, ...) are retried:
+their records are dropped from the file and the episodes run again.
+With --store, finished episodes (including their binary move logs) are also
+written to a columnar results store for grouped analytics (results_store).
+
+Usage:
+    python evaluation.py --models openrouter/openai/gpt-4-turbo \\
+        --max-steps 15,30 --episodes 20 --workers 8 --output results.jsonl
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from dotenv import load_dotenv
+
+# Výsledky epizody, které se zapisují do JSONL.
+RESULT_FIELDS = (
+    "solved",
+    "finished",
+    "steps",
+    "tool_calls",
+    "invalid_moves",
+    "prompt_tokens",
+    "completion_tokens",
+    "wall_time",
+    "context_tokens_saved",
+    "error",
+)
+
+
+def config_id(config):
+    """
+    Vrátí stabilní identifikátor konfigurace pro obnovení běhu.
+    """
+    interface = "mcp" if config["use_mcp"] else "direct"
+    return f"{config['model']}|{config['prompt_name']}|{config['max_steps']}|{interface}"
+
+
+def build_jobs(models, prompts, max_steps_values, use_mcp_values, episodes):
+    """
+    Rozvine mřížku konfigurací na jednotlivé úlohy (jedna úloha = jedna epizoda).
+
+    :param prompts: Slovník jméno promptu -> text systémového promptu.
+    """
+    jobs = []
+    for model, prompt_name, max_steps, use_mcp in itertools.product(
+        models, prompts, max_steps_values, use_mcp_values
+    ):
+        config = {
+            "model": model,
+            "prompt_name": prompt_name,
+            "max_steps": max_steps,
+            "use_mcp": use_mcp,
+        }
+        for episode in range(episodes):
+            jobs.append(
+                {
+                    **config,
+                    "config_id": config_id(config),
+                    "episode": episode,
+                    "system_prompt": prompts[prompt_name],
+                }
+            )
+    return jobs
+
+
+def _read_records(path):
+    """
+    Vrátí záznamy z JSONL; neúplný poslední řádek po pádu se ignoruje.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def load_completed(path):
+    """
+    Načte úspěšně zapsané epizody jako množinu (config_id, episode).
+    Epizody zapsané s chybou se nepočítají, při obnovení se spustí znovu.
+    """
+    return {
+        (record["config_id"], record["episode"])
+        for record in _read_records(path)
+        if record.get("error") is None
+    }
+
+
+def _drop_failed_records(path):
+    """
+    Odstraní ze souboru záznamy epizod s chybou, které se budou opakovat,
+    aby v něm každá epizoda měla jen jeden záznam.
+    """
+    records = list(_read_records(path))
+    if all(record.get("error") is None for record in records):
+        return
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for record in records:
+            if record.get("error") is None:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    os.replace(tmp_path, path)
+
+
+def _drop_partial_line(path):
+    """
+    Odřízne neúplný poslední řádek po pádu, aby se k němu nepřilepil další záznam.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        position = f.seek(0, os.SEEK_END)
+        if not position:
+            return
+        f.seek(position - 1)
+        if f.read(1) == b"\n":
+            return
+        # Hledáme poslední konec řádku odzadu, bez čtení celého souboru.
+        while position > 0:
+            start = max(0, position - 4096)
+            f.seek(start)
+            index = f.read(position - start).rfind(b"\n")
+            if index != -1:
+                f.truncate(start + index + 1)
+                return
+            position = start
+        f.truncate(0)
+
+
+def run_job(job, backend="litellm", latency=0.0, cache_path=None, record_moves=False, cache_deterministic=None, temperature=None):
+    """
+    Spustí jednu epizodu ve workeru a vrátí záznam pro JSONL.
+    S `cache_path` se deterministické odpovědi modelu (`temperature=0`) berou ze
+    sdílené CompletionCache; `cache_deterministic=True` cachuje i vzorkované odpovědi.
+    `record_moves` přidá do záznamu log tahů epizody (hex, viz move_log).
+    """
+    # Import až ve workeru - main táhne litellm a MCP.
+    from completion_cache import CompletionCache, cached_backend_factory
+    from llm_backends import create_backend_factory
+    from main import run_episode
+    from tool_logging import configure_tool_logging
+
+    record = {
+        key: job[key]
+        for key in ("config_id", "episode", "model", "prompt_name", "max_steps", "use_mcp")
+    }
+    started = time.perf_counter()
+    cache = None
+    try:
+        # Hlášky nástrojů by ve workeru výpočet jen zdržovaly.
+        configure_tool_logging("off")
+        backend_factory = create_backend_factory(backend, latency)
+        if cache_path is not None:
+            cache = CompletionCache(cache_path)
+            backend_factory = cached_backend_factory(backend_factory, cache, cache_deterministic)
+        result = run_episode(
+            job["model"],
+            job["max_steps"],
+            use_mcp=job["use_mcp"],
+            system_prompt=job["system_prompt"],
+            verbose=False,
+            backend_factory=backend_factory,
+            record_moves=record_moves,
+            temperature=temperature,
+        )
+        record.update({field: result[field] for field in RESULT_FIELDS})
+        if "move_log" in result:
+            record["move_log"] = result["move_log"].hex()
+        if cache is not None:
+            record["cache_hits"] = cache.hits
+            record["cache_misses"] = cache.misses
+    except Exception as e:
+        record.update({field: None for field in RESULT_FIELDS})
+        record.update(
+            {
+                "solved": False,
+                "wall_time": time.perf_counter() - started,
+                "error": f"{type(e).__name__}: {e}",
+            }
+        )
+    finally:
+        if cache is not None:
+            cache.close()
+    return record
+
+
+def run_sweep(jobs, output_path, workers=None, backend="litellm", latency=0.0, cache_path=None, store=None, cache_deterministic=None, temperature=None):
+    """
+    Spustí úlohy, které ještě nejsou v `output_path`, v poolu procesů
+    a každý hotový výsledek hned připíše do JSONL.
+    S `store` (results_store.ResultsWriter) se výsledky zapisují i do sloupcového úložiště.
+    Vrací počet nově dokončených epizod.
+    """
+    completed = load_completed(output_path)
+    pending = [
+        job for job in jobs if (job["config_id"], job["episode"]) not in completed
+    ]
+    if not pending:
+        return 0
+
+    _drop_partial_line(output_path)
+    _drop_failed_records(output_path)
+    finished = 0
+    with open(output_path, "a", encoding="utf-8") as output, ProcessPoolExecutor(
+        max_workers=workers
+    ) as pool:
+        futures = [
+            pool.submit(
+                run_job,
+                job,
+                backend,
+                latency,
+                cache_path,
+                store is not None,
+                cache_deterministic,
+                temperature,
+            )
+            for job in pending
+        ]
+        for future in as_completed(futures):
+            record = future.result()
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+            # Chybné epizody se při obnovení opakují, do úložiště jde až jejich výsledek.
+            if store is not None and record["error"] is None:
+                store.write(record)
+            finished += 1
+    return finished
+
+
+def _split(value, cast=str):
+    return [cast(item.strip()) for item in value.split(",") if item.strip()]
+
+
+def _parse_prompts(values):
+    # Bez zadání se použije systémový prompt z main.py.
+    if not values:
+        from main import SYSTEM_PROMPT
+
+        return {"default": SYSTEM_PROMPT}
+
+    prompts = {}
+    for value in values:
+        name, _, path = value.partition("=")
+        with open(path, encoding="utf-8") as f:
+            prompts[name] = f.read()
+    return prompts
+
+
+def main(argv=None):
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--models", default=os.environ.get("MODEL", "openrouter/openai/gpt-4-turbo")
+    )
+    parser.add_argument("--prompt", action="append", help="name=path to a system prompt file")
+    parser.add_argument("--max-steps", default=os.environ.get("MAX_STEP", "15"))
+    parser.add_argument("--use-mcp", default="false", help="Comma separated true/false values")
+    parser.add_argument("--episodes", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--backend", default=os.environ.get("BACKEND", "litellm"))
+    parser.add_argument(
+        "--latency", type=float, default=float(os.environ.get("BACKEND_LATENCY", "0"))
+    )
+    parser.add_argument("--output", default="results.jsonl")
+    parser.add_argument(
+        "--cache",
+        default=os.environ.get("COMPLETION_CACHE"),
+        help="SQLite completion cache shared by the workers",
+    )
+    parser.add_argument(
+        "--cache-deterministic",
+        action="store_true",
+        help="Cache sampled responses too (every episode then replays the first one)",
+    )
+    parser.add_argument(
+        "--temperature",
+        type=float,
+        default=float(os.environ["TEMPERATURE"]) if os.environ.get("TEMPERATURE") else None,
+        help="Sampling temperature sent to the model; 0 makes responses cacheable",
+    )
+    parser.add_argument(
+        "--store",
+        default=os.environ.get("RESULTS_STORE"),
+        help="Directory of a columnar results store to append the episodes to",
+    )
+    args = parser.parse_args(argv)
+
+    jobs = build_jobs(
+        _split(args.models),
+        _parse_prompts(args.prompt),
+        _split(args.max_steps, int),
+        [value.lower() == "true" for value in _split(args.use_mcp)],
+        args.episodes,
+    )
+    store = None
+    if args.store:
+        from results_store import ResultsWriter
+
+        store = ResultsWriter(args.store)
+    try:
+        finished = run_sweep(
+            jobs,
+            args.output,
+            args.workers,
+            args.backend,
+            args.latency,
+            args.cache,
+            store,
+            args.cache_deterministic or None,
+            args.temperature,
+        )
+    finally:
+        if store is not None:
+            store.close()
+    print(f"Dokončeno {finished} epizod ({len(jobs) - finished} již bylo v {args.output}).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+"""
+LLM Backends - pluggable completion providers for the agent loop
+
+Every backend exposes `completion(...)` and `acompletion(...)` with the
+litellm call signature and returns objects shaped like litellm responses
+(`response.choices[0].message.tool_calls`, `response.usage`). Besides the
+real litellm backend there are offline "models" for deterministic
+benchmarking of the harness without network access.
+"""
+import abc
+import ast
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+import puzzle_solver
+
+
+def estimate_tokens(value):
+    """
+    Hrubý odhad počtu tokenů (~4 znaky na token) pro offline backendy.
+    """
+    if not isinstance(value, str):
+        value = json.dumps(value, ensure_ascii=False, default=_message_content)
+    return max(1, len(value) // 4)
+
+
+def _message_content(message):
+    # Zprávy modelu jsou objekty s atributy, ne slovníky.
+    return {
+        "role": getattr(message, "role", None),
+        "content": getattr(message, "content", None),
+    }
+
+
+def make_tool_call(call_id, name, arguments):
+    """
+    Vytvoří objekt volání nástroje ve tvaru litellm.
+    """
+    return SimpleNamespace(
+        id=call_id,
+        type="function",
+        function=SimpleNamespace(
+            name=name, arguments=json.dumps(arguments, ensure_ascii=False)
+        ),
+    )
+
+
+def make_response(messages, content=None, tool_calls=None, model="offline"):
+    """
+    Vytvoří odpověď ve tvaru litellm ModelResponse včetně odhadu spotřeby tokenů.
+    """
+    message = SimpleNamespace(
+        role="assistant", content=content, tool_calls=tool_calls or None
+    )
+    completion_tokens = estimate_tokens(
+        content or [(c.function.name, c.function.arguments) for c in tool_calls]
+    )
+    prompt_tokens = estimate_tokens(messages)
+    return SimpleNamespace(
+        model=model,
+        choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")],
+        usage=SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens,
+        ),
+    )
+
+
+class LiteLLMBackend:
+    """
+    Skutečný model přes litellm (síťové volání).
+    """
+
+    # Opakovaný požadavek stojí jen tokeny, plánovač ho smí zálohovat i opakovat.
+    idempotent = True
+
+    def completion(self, **kwargs):
+        from litellm import completion
+
+        return completion(**kwargs)
+
+    async def acompletion(self, **kwargs):
+        from litellm import acompletion
+
+        return await acompletion(**kwargs)
+
+
+class OfflineBackend(abc.ABC):
+    """
+    Základ offline backendů - doplní umělou latenci a synchronní i asynchronní rozhraní.
+
+    :param latency: Umělá doba "přemýšlení" modelu v sekundách.
+    """
+
+    # Odpověď je daná konverzací a stavem, CompletionCache ji smí cachovat.
+    deterministic = True
+    # Volání posouvá stav backendu (calls); podtřídy bez závislosti na něm to přepíší.
+    idempotent = False
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+
+    @abc.abstractmethod
+    def next_response(self, messages):
+        """
+        Vrátí odpověď ve tvaru litellm pro danou konverzaci.
+        """
+
+    def completion(self, model=None, messages=(), tools=None, tool_choice=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        self.calls += 1
+        return self.next_response(messages)
+
+    async def acompletion(self, model=None, messages=(), tools=None, tool_choice=None, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.calls += 1
+        return self.next_response(messages)
+
+
+class OracleBackend(OfflineBackend):
+    """
+    Dokonalý "model", který volí optimální tahy podle puzzle_solver.
+
+    Dokud hádanka není vyřešena, převáží podle nejkratší cesty, poté si řešení
+    ověří přes `check_if_solved` a nakonec odpoví textem.
+
+    :param batch: Provést celou zbývající cestu jedním voláním `move_sequence`.
+    """
+
+    # Odpověď určuje stav hádanky; počitadlo volání jen čísluje id volání nástrojů.
+    idempotent = True
+
+    def __init__(self, puzzle_env, latency=0.0, batch=False):
+        super().__init__(latency)
+        self.puzzle_env = puzzle_env
+        self.batch = batch
+
+    def next_response(self, messages):
+        call_id = f"call_{self.calls}"
+        moves = puzzle_solver.optimal_moves(self.puzzle_env)
+        if moves:
+            if self.batch:
+                path = puzzle_solver.shortest_path(self.puzzle_env)
+                tool_call = make_tool_call(call_id, "move_sequence", {"passengers": path})
+            else:
+                tool_call = make_tool_call(call_id, "move_across_river", {"passenger": moves[0]})
+            return make_response(messages, tool_calls=[tool_call])
+
+        last = messages[-1] if messages else None
+        if isinstance(last, dict) and last.get("name") == "check_if_solved":
+            return make_response(messages, content="Hádanka je vyřešena.")
+        tool_call = make_tool_call(call_id, "check_if_solved", {})
+        return make_response(messages, tool_calls=[tool_call])
+
+
+class ScriptedBackend(OfflineBackend):
+    """
+    Přehraje předem daný seznam kroků bez ohledu na stav hádanky.
+
+    :param steps: Seznam kroků; krok je buď text (závěrečná odpověď), nebo seznam
+        dvojic (jméno nástroje, argumenty) volaných v jedné odpovědi.
+    """
+
+    def __init__(self, steps, latency=0.0):
+        super().__init__(latency)
+        self.steps = list(steps)
+
+    def next_response(self, messages):
+        if self.calls > len(self.steps):
+            return make_response(messages, content="Skript je vyčerpán.")
+
+        step = self.steps[self.calls - 1]
+        if isinstance(step, str):
+            return make_response(messages, content=step)
+        tool_calls = [
+            make_tool_call(f"call_{self.calls}_{index}", name, arguments)
+            for index, (name, arguments) in enumerate(step)
+        ]
+        return make_response(messages, tool_calls=tool_calls)
+
+
+class ProviderError(Exception):
+    """
+    Chyba poskytovatele s HTTP stavovým kódem (např. 429 při překročení limitu).
+    """
+
+    def __init__(self, status_code, message="", retry_after=None):
+        super().__init__(message or f"provider returned HTTP {status_code}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class FaultyBackend:
+    """
+    Lokální "poskytovatel" s nespolehlivostí skutečné sítě pro testy plánovače.
+
+    Obalí jiný backend a před každým voláním podle plánu buď selže
+    (ProviderError s daným kódem), nebo se zdrží. Plán je seznam položek
+    pro jednotlivá volání: číslo = stavový kód chyby, dvojice ("delay", s)
+    = zpoždění; po vyčerpání plánu se použije náhodný profil.
+
+    Záložní nebo opakovaný požadavek spotřebuje další položku plánu stejně
+    jako skutečná síť; idempotence se přebírá z obaleného backendu.
+
+    :param failure_rate: Pravděpodobnost chyby 429 mimo plán.
+    :param tail_rate: Pravděpodobnost pomalé odpovědi (`tail_latency`) mimo plán.
+    """
+
+    def __init__(self, backend, plan=(), failure_rate=0.0, tail_rate=0.0, tail_latency=1.0, seed=None):
+        self.backend = backend
+        self.plan = list(plan)
+        self.failure_rate = failure_rate
+        self.tail_rate = tail_rate
+        self.tail_latency = tail_latency
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    @property
+    def idempotent(self):
+        return getattr(self.backend, "idempotent", False)
+
+    def _next_fault(self):
+        with self._lock:
+            index = self.calls
+            self.calls += 1
+            if index < len(self.plan):
+                return self.plan[index]
+            if self.rng.random() < self.failure_rate:
+                return 429
+            if self.rng.random() < self.tail_rate:
+                return ("delay", self.tail_latency)
+            return None
+
+    def completion(self, **kwargs):
+        fault = self._next_fault()
+        if isinstance(fault, int):
+            raise ProviderError(fault)
+        if fault is not None:
+            time.sleep(fault[1])
+        return self.backend.completion(**kwargs)
+
+    async def acompletion(self, **kwargs):
+        fault = self._next_fault()
+        if isinstance(fault, int):
+            raise ProviderError(fault)
+        if fault is not None:
+            await asyncio.sleep(fault[1])
+        return await self.backend.acompletion(**kwargs)
+
+
+_STEP_RE = re.compile(r"^--- KROK \d+ ---$")
+_ACTION_RE = re.compile(r"^Agent navrhuje akci: (\w+) s argumenty (\{.*\})$")
+_FINAL_PREFIX = "Agent ukončil práci a říká: "
+
+
+def parse_transcript(path):
+    """
+    Načte kroky agenta z výpisu main.py (např. log.txt) pro ScriptedBackend.
+    """
+    steps = []
+    current = None
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if _STEP_RE.match(line):
+                current = []
+                steps.append(current)
+                continue
+            if current is None:
+                continue
+            match = _ACTION_RE.match(line)
+            if match:
+                current.append((match.group(1), ast.literal_eval(match.group(2))))
+            elif line.startswith(_FINAL_PREFIX):
+                steps[-1] = line[len(_FINAL_PREFIX):]
+                current = None
+    return steps
+
+
+def create_backend_factory(name="litellm", latency=0.0, transcript_path="log.txt"):
+    """
+    Vrátí funkci, která pro prostředí epizody vytvoří backend.
+
+    :param name: 'litellm', 'oracle', 'oracle-batch' nebo 'replay'.
+    :param latency: Umělá latence offline backendů v sekundách.
+    :param transcript_path: Výpis pro backend 'replay'.
+    """
+    if name == "litellm":
+        return lambda puzzle_env: LiteLLMBackend()
+    if name == "oracle":
+        return lambda puzzle_env: OracleBackend(puzzle_env, latency)
+    if name == "oracle-batch":
+        return lambda puzzle_env: OracleBackend(puzzle_env, latency, batch=True)
+    if name == "replay":
+        steps = parse_transcript(transcript_path)
+        return lambda puzzle_env: ScriptedBackend(steps, latency)
+    raise ValueError(f"Unknown backend '{name}'. Must be one of: litellm, oracle, oracle-batch, replay")
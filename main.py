@@ -1,164 +1,811 @@
 #!/usr/bin/env python
+import asyncio
+import contextlib
+import copy
+import inspect
 import os
-from litellm import completion
+import time
+from litellm import acompletion, completion
 from dotenv import load_dotenv
 import json
 from puzzle_environment import PuzzleEnvironment
-from agent_tools import AgentToolbox, generate_tool_schema
-from mcp_server import create_mcp_server
+from agent_tools import AgentToolbox, get_tool_schema, load_tool_schemas
+from llm_backends import FaultyBackend, create_backend_factory
+from completion_cache import CompletionCache, cached_backend_factory
+from completion_scheduler import CompletionScheduler, scheduled_backend_factory
+from conversation_context import ConversationContext, compact_state_summary
+from speculation import MoveSpeculator, submit as submit_speculation
+from tool_executor import ToolExecutor
+from tracing import NULL_TRACER, JsonlSpanExporter, Tracer, format_summary
+from tool_logging import configure_tool_logging
+from mcp_client import BlockingMCPClient, memory_session
+from mcp_client import call_tool as call_mcp_tool, list_tools as list_mcp_tools
+from mcp_server import PuzzleMCPServer, PuzzleSessionTable, create_mcp_server, setup_mcp_server
+from move_log import LoggedPuzzleEnvironment
 
 
-def create_tool_interface(use_mcp=False):
+MCP_TRANSPORTS = ("direct", "memory")
+
+# Relace, pod kterou harness volá paměťový MCP server.
+AGENT_SESSION_ID = "agent"
+
+
+class LivePuzzleEnvironment:
     """
-    Vytvoří rozhraní pro nástroje - buď přes MCP server nebo přímou class.
-    Vrací tuple (tools_schemas, available_tools, puzzle_env).
+    Prostředí hádanky MCP serveru, které se dohledává při každém použití.
+
+    Nástroj reset_puzzle nahradí prostředí serveru novým, spekulace,
+    orákulum ani log tahů proto nesmí držet odkaz na to původní.
+
+    :param lookup: Funkce vracející aktuální prostředí serveru.
     """
-    if use_mcp:
-        # Použij MCP server
-        mcp_server = create_mcp_server()
-        mcp_tools = mcp_server.get_tools()
-        
-        # Převeď MCP tools na formát pro litellm
-        tools_schemas = []
-        for tool in mcp_tools:
-            schema = {
-                "type": "function",
-                "function": {
-                    "name": tool["name"],
-                    "description": tool["description"],
-                    "parameters": tool["inputSchema"]
-                }
+
+    def __init__(self, lookup):
+        object.__setattr__(self, "_lookup", lookup)
+
+    def __getattr__(self, name):
+        return getattr(self._lookup(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._lookup(), name, value)
+
+    def __deepcopy__(self, memo):
+        # Kopie (např. pro předpočet tahů) je kopií aktuálního prostředí.
+        return copy.deepcopy(self._lookup(), memo)
+
+
+def _agent_sessions(env_factory):
+    server_factory = (lambda: PuzzleMCPServer(env_factory)) if env_factory else None
+    sessions = PuzzleSessionTable(
+        max_sessions=1, idle_timeout=None, server_factory=server_factory
+    )
+    sessions.get(AGENT_SESSION_ID)
+    puzzle_env = LivePuzzleEnvironment(lambda: sessions.lookup(AGENT_SESSION_ID).puzzle_env)
+    return sessions, puzzle_env
+
+
+def _hide_session_id(mcp_tools):
+    for tool in mcp_tools:
+        # session_id doplňuje harness, model ho nevidí.
+        properties = dict(tool["inputSchema"]["properties"])
+        properties.pop("session_id", None)
+        tool["inputSchema"] = {**tool["inputSchema"], "properties": properties}
+    return mcp_tools
+
+
+def _mcp_tool_interface(mcp_tools, call_tool):
+    """
+    Převede MCP tools na schémata pro litellm a obalí jejich volání.
+    Je-li `call_tool` korutina, jsou i obalené nástroje asynchronní.
+    Vrací tuple (tools_schemas, available_tools).
+    """
+    # Převeď MCP tools na formát pro litellm
+    tools_schemas = []
+    for tool in mcp_tools:
+        schema = {
+            "type": "function",
+            "function": {
+                "name": tool["name"],
+                "description": tool["description"],
+                "parameters": tool["inputSchema"]
             }
-            tools_schemas.append(schema)
-        
-        # Vytvořím wrapper funkce pro MCP volání
-        def create_mcp_wrapper(tool_name):
+        }
+        tools_schemas.append(schema)
+
+    # Vytvořím wrapper funkce pro MCP volání
+    def create_mcp_wrapper(tool_name):
+        if inspect.iscoroutinefunction(call_tool):
+            async def wrapper(**kwargs):
+                result = await call_tool(tool_name, kwargs)
+                return result["content"][0]["text"]
+        else:
             def wrapper(**kwargs):
-                result = mcp_server.call_tool(tool_name, kwargs)
-                if result.get("isError", False):
-                    return result["content"][0]["text"]
+                result = call_tool(tool_name, kwargs)
                 return result["content"][0]["text"]
-            wrapper.__name__ = tool_name
-            return wrapper
-        
-        available_tools = {tool["name"]: create_mcp_wrapper(tool["name"]) for tool in mcp_tools}
-        puzzle_env = mcp_server.puzzle_env
-        
+        wrapper.__name__ = tool_name
+        return wrapper
+
+    available_tools = {tool["name"]: create_mcp_wrapper(tool["name"]) for tool in mcp_tools}
+    return tools_schemas, available_tools
+
+
+def open_tool_interface(use_mcp=False, mcp_transport="direct", env_factory=None):
+    """
+    Vytvoří rozhraní pro nástroje - buď přes MCP server nebo přímou class.
+
+    :param use_mcp: Zda použít MCP server místo AgentToolbox.
+    :param mcp_transport: 'direct' volá PuzzleMCPServer.call_tool přímo,
+        'memory' posílá volání skutečným MCP protokolem přes paměťové proudy.
+    :param env_factory: Třída prostředí hádanky (výchozí podle rozhraní).
+    Vrací tuple (tools_schemas, available_tools, puzzle_env, close). U MCP je
+    puzzle_env LivePuzzleEnvironment, takže sleduje i reset_puzzle.
+    """
+    if mcp_transport not in MCP_TRANSPORTS:
+        raise ValueError(
+            f"Unknown MCP transport '{mcp_transport}'. Must be one of: {', '.join(MCP_TRANSPORTS)}"
+        )
+    close = lambda: None
+
+    if use_mcp and mcp_transport == "memory":
+        # Skutečný MCP Server a klient ve stejném procesu, bez podprocesu a rour.
+        sessions, puzzle_env = _agent_sessions(env_factory)
+        client = BlockingMCPClient(lambda: memory_session(setup_mcp_server(sessions)))
+        mcp_tools = _hide_session_id(client.list_tools())
+        call_tool = lambda name, kwargs: client.call_tool(
+            name, {**kwargs, "session_id": AGENT_SESSION_ID}
+        )
+        tools_schemas, available_tools = _mcp_tool_interface(mcp_tools, call_tool)
+        close = client.close
+    elif use_mcp:
+        # Použij MCP server
+        mcp_server = create_mcp_server(env_factory or PuzzleEnvironment)
+        puzzle_env = LivePuzzleEnvironment(lambda: mcp_server.puzzle_env)
+        tools_schemas, available_tools = _mcp_tool_interface(
+            mcp_server.get_tools(), mcp_server.call_tool
+        )
     else:
         # Použij přímou class
-        puzzle_env = PuzzleEnvironment()
+        puzzle_env = (env_factory or PuzzleEnvironment)()
         toolbox = AgentToolbox(puzzle_env)
         
-        tools_to_register = [toolbox.get_current_state, toolbox.move_across_river, toolbox.check_if_solved]
-        tools_schemas = [generate_tool_schema(func) for func in tools_to_register]
+        tools_to_register = toolbox.get_tools()
+        tools_schemas = [get_tool_schema(func) for func in tools_to_register]
         available_tools = {func.__name__: func for func in tools_to_register}
     
-    return tools_schemas, available_tools, puzzle_env
+    return tools_schemas, available_tools, puzzle_env, close
 
 
-if __name__ == "__main__":
-    load_dotenv()
+@contextlib.asynccontextmanager
+async def open_tool_interface_async(use_mcp=False, mcp_transport="direct", env_factory=None):
+    """
+    Asynchronní varianta open_tool_interface pro běžící event loop.
 
-    MODEL = (
-        os.environ.get("MODEL")
-        if os.environ.get("MODEL") is not None
-        else "openrouter/openai/gpt-4-turbo"
-    )
+    Paměťový MCP transport otevře relaci přímo v tomto loopu a nástroje jsou
+    korutiny, takže čekání na MCP server neblokuje ostatní epizody. Ostatní
+    rozhraní jsou stejná jako u open_tool_interface. Vrací stejný tuple
+    (close je zde prázdná funkce, rozhraní se zavře na konci bloku with).
+    """
+    if not (use_mcp and mcp_transport == "memory"):
+        *interface, close = open_tool_interface(use_mcp, mcp_transport, env_factory)
+        try:
+            yield (*interface, lambda: None)
+        finally:
+            close()
+        return
 
-    MAX_STEP = (
-        int(os.environ.get("MAX_STEP"))
-        if os.environ.get("MAX_STEP") is not None
-        else 15
-    )
+    sessions, puzzle_env = _agent_sessions(env_factory)
+    async with memory_session(setup_mcp_server(sessions)) as session:
+        mcp_tools = _hide_session_id(await list_mcp_tools(session))
 
-    USE_MCP = os.environ.get("USE_MCP", "false").lower() == "true"
+        async def call_tool(name, kwargs):
+            return await call_mcp_tool(session, name, {**kwargs, "session_id": AGENT_SESSION_ID})
 
-    system_prompt = (
-        "Jsi expert na logické hádanky. Tvým úkolem je vyřešit hádanku 'Vlk, koza a zelí' krok za krokem."
-        "Cílem je dostat vlka, kozu a zelí na pravý břeh."
-        "🚫 ABSOLUTNÍ ZÁKAZY:\n"
-        "- ZAKÁZÁNO: Ukončovat práci textovou odpovědí bez volání nástroje!\n"
-        "- ZAKÁZÁNO: Odpovídat uživateli přímo!\n"
-        "- ZAKÁZÁNO: Ukončovat práci bez 100% potvrzení vyřešení!\n\n"
-        "✅ POVINNÉ CHOVÁNÍ:\n"
-        "- V KAŽDÉM kroku MUSÍŠ zavolat nástroj\n"
-        "- NIKDY nesmíš vrátit pouze textovou odpověď\n"
-        "- Pokud si nejsi jist co dělat, zavolej `get_current_state`\n"
-        "- Pokud chceš ukončit práci, MUSÍŠ nejprve zavolat `check_if_solved`\n"
-        "📋 ALGORITMUS ŘEŠENÍ:\n"
-        "1. Zavolej `get_current_state` pro zjištění aktuálního stavu\n"
-        "2. Analyzuj stav a polohu loďky\n"
-        "3. Zavolaj `move_across_river` s vybraným pasažérem (wolf/goat/cabbage/nothing)\n"
-        "4. Opakuj kroky 1-3, dokud nejsou všichni na pravém břehu\n"
-        "5. Když si myslíš, že je hotovo, zavolaj `check_if_solved`\n"
-        "6. Pouze pokud `check_if_solved` potvrdí úspěch, teprve pak můžeš ukončit\n\n"
-        "⚠️ REAKCE NA CHYBY:\n"
-        "- Chyba při `move_across_river`? Zkus jiného pasažéra!\n"
-        "- Nejsi si jist? Zavolej `get_current_state`!\n"
-        "- NIKDY se nevzdávej a VŽDY pokračuj voláním nástrojů!\n\n"
-        "💡 KLÍČOVÉ POZNATKY:\n"
-        "- Převozník může jet i sám (passenger='nothing')\n"
-        "- Někdy musíš vzít někoho zpět na levý břeh\n"
-        "- Vlk a koza nesmí být sami, koza a zelí nesmí být sami\n"
-    )
+        tools_schemas, available_tools = _mcp_tool_interface(mcp_tools, call_tool)
+        yield tools_schemas, available_tools, puzzle_env, lambda: None
+
+
+def create_tool_interface(use_mcp=False, mcp_transport="direct"):
+    """
+    Vytvoří rozhraní pro nástroje - buď přes MCP server nebo přímou class.
+    Vrací tuple (tools_schemas, available_tools, puzzle_env).
+    Paměťový MCP transport zde běží až do konce procesu; pro jeho ukončení použij open_tool_interface.
+    """
+    return open_tool_interface(use_mcp, mcp_transport)[:3]
 
-    # Vytvořím tool interface podle nastavení USE_MCP
-    tools_schemas, available_tools, puzzle_env = create_tool_interface(USE_MCP)
 
-    messages = [{"role": "system", "content": system_prompt}]
+SYSTEM_PROMPT = (
+    "Jsi expert na logické hádanky. Tvým úkolem je vyřešit hádanku 'Vlk, koza a zelí' krok za krokem."
+    "Cílem je dostat vlka, kozu a zelí na pravý břeh."
+    "🚫 ABSOLUTNÍ ZÁKAZY:\n"
+    "- ZAKÁZÁNO: Ukončovat práci textovou odpovědí bez volání nástroje!\n"
+    "- ZAKÁZÁNO: Odpovídat uživateli přímo!\n"
+    "- ZAKÁZÁNO: Ukončovat práci bez 100% potvrzení vyřešení!\n\n"
+    "✅ POVINNÉ CHOVÁNÍ:\n"
+    "- V KAŽDÉM kroku MUSÍŠ zavolat nástroj\n"
+    "- NIKDY nesmíš vrátit pouze textovou odpověď\n"
+    "- Pokud si nejsi jist co dělat, zavolej `get_current_state`\n"
+    "- Pokud chceš ukončit práci, MUSÍŠ nejprve zavolat `check_if_solved`\n"
+    "📋 ALGORITMUS ŘEŠENÍ:\n"
+    "1. Zavolej `get_current_state` pro zjištění aktuálního stavu\n"
+    "2. Analyzuj stav a polohu loďky\n"
+    "3. Zavolaj `move_across_river` s vybraným pasažérem (wolf/goat/cabbage/nothing)\n"
+    "4. Opakuj kroky 1-3, dokud nejsou všichni na pravém břehu\n"
+    "5. Když si myslíš, že je hotovo, zavolaj `check_if_solved`\n"
+    "6. Pouze pokud `check_if_solved` potvrdí úspěch, teprve pak můžeš ukončit\n\n"
+    "⚠️ REAKCE NA CHYBY:\n"
+    "- Chyba při `move_across_river`? Zkus jiného pasažéra!\n"
+    "- Nejsi si jist? Zavolej `get_current_state`!\n"
+    "- NIKDY se nevzdávej a VŽDY pokračuj voláním nástrojů!\n\n"
+    "💡 KLÍČOVÉ POZNATKY:\n"
+    "- Převozník může jet i sám (passenger='nothing')\n"
+    "- Jsi-li si jistý více tahy, proveď je najednou přes `move_sequence`\n"
+    "- Někdy musíš vzít někoho zpět na levý břeh\n"
+    "- Vlk a koza nesmí být sami, koza a zelí nesmí být sami\n"
+)
+
+
+def _is_rejected_move(function_name, function_response):
+    """
+    Zjistí, zda nástroj pro tah vrátil chybu (neplatný tah).
+    """
+    if function_name not in ("move_across_river", "move_sequence"):
+        return False
+    try:
+        return json.loads(function_response).get("status") != "úspěch"
+    except (TypeError, ValueError, AttributeError):
+        # MCP vrací chyby validace jako prostý text.
+        return True
 
-    print(f"\nMODEL: {MODEL}")
-    print(f"USE_MCP: {USE_MCP}\n")
 
-    print("--- START ŘEŠENÍ HÁDANKY ---")
-    print(f"Počáteční stav:\n{puzzle_env.get_state_description()}\n")
+def _usage_attributes(response):
+    """
+    Vytáhne spotřebu tokenů z odpovědi litellm (pojmenovanou dle OpenTelemetry GenAI).
+    """
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return {}
+    return {
+        "gen_ai.usage.input_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "gen_ai.usage.output_tokens": getattr(usage, "completion_tokens", 0) or 0,
+    }
 
-    for step in range(1, MAX_STEP + 1):
-        print(f"--- KROK {step} ---")
 
-        response = completion(
-            model=MODEL,
-            messages=messages,
-            tools=tools_schemas,
-            tool_choice="auto",
+def episode_env_factory(record_moves=False):
+    """
+    Vrátí třídu prostředí epizody (None = výchozí podle rozhraní nástrojů).
+    """
+    return LoggedPuzzleEnvironment if record_moves else None
+
+
+class AgentEpisode:
+    """
+    Stav jedné epizody agenta - nástroje, prostředí, konverzace a průběžný výsledek.
+    Sdílí ji synchronní i asynchronní smyčka; liší se jen způsobem volání modelu.
+    """
+
+    def __init__(self, model, use_mcp=False, mcp_transport="direct", system_prompt=SYSTEM_PROMPT, verbose=True, context_window=None, tracer=None, speculate=False, tool_workers=1, record_moves=False, tool_interface=None, temperature=None):
+        self.started = time.perf_counter()
+        self.verbose = verbose
+        self.model = model
+        self.tracer = tracer or NULL_TRACER
+        # temperature=None nechá výchozí hodnotu poskytovatele.
+        self.temperature = temperature
+        # tool_interface = už otevřené rozhraní (viz open_tool_interface_async).
+        (
+            self.tools_schemas,
+            self.available_tools,
+            self.puzzle_env,
+            self._close,
+        ) = tool_interface or open_tool_interface(
+            use_mcp, mcp_transport, episode_env_factory(record_moves)
+        )
+        # context_window=K posílá modelu jen posledních K výměn a shrnutí stavu.
+        self.context = ConversationContext(
+            system_prompt,
+            max_exchanges=context_window,
+            state_summary=lambda: compact_state_summary(self.puzzle_env),
+        )
+        # Předpočet tahů; u MCP stav spravuje server, tahy pak jen vyhodnocujeme.
+        self.speculator = (
+            MoveSpeculator(self.puzzle_env, serve=not use_mcp)
+            if speculate
+            else None
         )
+        # Víc volání nástrojů v jedné odpovědi: čtení souběžně, tahy postupně.
+        self.tool_executor = ToolExecutor(max_workers=tool_workers)
+        self.result = {
+            "model": model,
+            "solved": False,
+            "finished": False,
+            "steps": 0,
+            "tool_calls": 0,
+            "invalid_moves": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "wall_time": 0.0,
+            "error": None,
+        }
+        if verbose:
+            print("--- START ŘEŠENÍ HÁDANKY ---")
+            print(f"Počáteční stav:\n{self.puzzle_env.get_state_description()}\n")
 
-        response_message = response.choices[0].message
-        messages.append(response_message)
+    def start_speculation(self):
+        """
+        Spustí předpočet tahů z aktuálního stavu ve vlákně, aby běžel souběžně
+        s voláním modelu. Vrací future (None bez spekulace), na kterou je před
+        provedením nástrojů nutné počkat.
+        """
+        if self.speculator is None:
+            return None
+        tracer = self.tracer
+        parent_span_id = tracer.current_span_id()
 
-        if response_message.tool_calls:
-            for tool_call in response_message.tool_calls:
-                function_name = tool_call.function.name
-                function_to_call = available_tools[function_name]
-                function_args = json.loads(tool_call.function.arguments)
+        def prepare():
+            with tracer.span("speculate", parent_span_id=parent_span_id):
+                self.speculator.prepare()
 
-                print(
-                    f"Agent navrhuje akci: {function_name} s argumenty {function_args}"
-                )
+        return submit_speculation(prepare)
+
+    def _call_tool(self, function_name, function_to_call, function_args):
+        if (
+            self.speculator is not None
+            and function_name == "move_across_river"
+            and isinstance(function_args.get("passenger"), str)
+        ):
+            function_response = self.speculator.move(function_args["passenger"])
+            if function_response is not None:
+                return function_response
+        return function_to_call(**function_args)
+
+    def completion_kwargs(self, model):
+        kwargs = {
+            "model": model,
+            "messages": self.context.messages(),
+            "tools": self.tools_schemas,
+            "tool_choice": "auto",
+        }
+        if self.temperature is not None:
+            kwargs["temperature"] = self.temperature
+        return kwargs
+
+    def _dispatch_span(self, tool_call, parent_span_id):
+        return self.tracer.span(
+            "dispatch",
+            parent_span_id,
+            **{"gen_ai.tool.name": tool_call.function.name, "gen_ai.tool.call.id": tool_call.id},
+        )
 
-                function_response = function_to_call(**function_args)
+    def _parse_call(self, tool_call, parent_span_id=None):
+        function_name = tool_call.function.name
+        function_to_call = self.available_tools[function_name]
+        with self.tracer.span("parse", parent_span_id):
+            function_args = json.loads(tool_call.function.arguments)
 
-                print(f"Výsledek nástroje: {function_response}\n")
+        if self.verbose:
+            print(f"Agent navrhuje akci: {function_name} s argumenty {function_args}")
+        return function_name, function_to_call, function_args
 
-                messages.append(
+    def _check_outcome(self, dispatch_span, function_name, function_response):
+        rejected = _is_rejected_move(function_name, function_response)
+        if rejected:
+            dispatch_span.set(rejected_move=True)
+
+        if self.verbose:
+            print(f"Výsledek nástroje: {function_response}\n")
+        return rejected
+
+    def _dispatch(self, tool_call, parent_span_id=None):
+        """
+        Provede jedno volání nástroje; běží i ve vlákně ToolExecutoru.
+        Vrací (odpověď nástroje, zda šlo o odmítnutý tah).
+        """
+        with self._dispatch_span(tool_call, parent_span_id) as dispatch_span:
+            function_name, function_to_call, function_args = self._parse_call(tool_call)
+            with self.tracer.span("tool", **{"gen_ai.tool.name": function_name}):
+                function_response = self._call_tool(function_name, function_to_call, function_args)
+            rejected = self._check_outcome(dispatch_span, function_name, function_response)
+        return function_response, rejected
+
+    async def _adispatch(self, tool_call, parent_span_id=None):
+        """
+        Asynchronní varianta _dispatch; nástroj smí být korutina (MCP relace v loopu).
+        Souběžná volání sdílejí zásobník spanů vlákna, proto mají vnořené spany
+        rodiče zadaného explicitně.
+        """
+        with self._dispatch_span(tool_call, parent_span_id) as dispatch_span:
+            function_name, function_to_call, function_args = self._parse_call(
+                tool_call, dispatch_span.span_id
+            )
+            with self.tracer.span(
+                "tool", dispatch_span.span_id, **{"gen_ai.tool.name": function_name}
+            ):
+                function_response = self._call_tool(function_name, function_to_call, function_args)
+                if inspect.isawaitable(function_response):
+                    function_response = await function_response
+            rejected = self._check_outcome(dispatch_span, function_name, function_response)
+        return function_response, rejected
+
+    def _count_usage(self, response):
+        usage = _usage_attributes(response)
+        self.result["prompt_tokens"] += usage.get("gen_ai.usage.input_tokens", 0)
+        self.result["completion_tokens"] += usage.get("gen_ai.usage.output_tokens", 0)
+        return response.choices[0].message
+
+    def handle_response(self, response):
+        """
+        Zpracuje jednu odpověď modelu - provede volané nástroje a doplní zprávy.
+        Vrací True, pokud agent práci ukončil textovou odpovědí.
+        """
+        response_message = self._count_usage(response)
+        outcomes = None
+        if response_message.tool_calls:
+            tool_calls = response_message.tool_calls
+            parent_span_id = self.tracer.current_span_id()
+            outcomes = self.tool_executor.run(
+                [tool_call.function.name for tool_call in tool_calls],
+                lambda index: self._dispatch(tool_calls[index], parent_span_id),
+            )
+        return self._record_response(response_message, outcomes)
+
+    async def ahandle_response(self, response):
+        """
+        Asynchronní varianta handle_response. Nástroje se dělí na dávky stejně
+        jako v synchronní smyčce; čtení jedné dávky se čekají souběžně.
+        """
+        response_message = self._count_usage(response)
+        outcomes = None
+        if response_message.tool_calls:
+            tool_calls = response_message.tool_calls
+            parent_span_id = self.tracer.current_span_id()
+            outcomes = await self.tool_executor.arun(
+                [tool_call.function.name for tool_call in tool_calls],
+                lambda index: self._adispatch(tool_calls[index], parent_span_id),
+            )
+        return self._record_response(response_message, outcomes)
+
+    def _record_response(self, response_message, outcomes):
+        """
+        Doplní zprávy a počty z provedených nástrojů (outcomes None = textová odpověď).
+        Vrací True, pokud agent práci ukončil.
+        """
+        result = self.result
+        tool_messages = []
+
+        if outcomes is not None:
+            tool_calls = response_message.tool_calls
+            for tool_call, (function_response, rejected) in zip(tool_calls, outcomes):
+                result["tool_calls"] += 1
+                if rejected:
+                    result["invalid_moves"] += 1
+                tool_messages.append(
                     {
                         "tool_call_id": tool_call.id,
                         "role": "tool",
-                        "name": function_name,
+                        "name": tool_call.function.name,
                         "content": function_response,
                     }
                 )
-        else:
+            self.context.add_exchange(response_message, tool_messages)
+            return False
+
+        self.context.add_exchange(response_message)
+        result["finished"] = True
+        if self.verbose:
             print(f"Agent ukončil práci a říká: {response_message.content}\n")
             # Tímto práce agenta končí - již vratil finalní odpověd.
-            if puzzle_env.is_solved():
+            if self.puzzle_env.is_solved():
                 print("🎉 OVĚŘENO: Agent hádanku skutečně vyřešil!")
             else:
                 print(
                     "❌ CHYBA: Agent si myslel, že hádanku vyřešil (nebo se zasekl), ale neudělal to.")
                 print(
-                    f"Skutečný finální stav:\n{puzzle_env.get_state_description()}")
-            break
+                    f"Skutečný finální stav:\n{self.puzzle_env.get_state_description()}")
+        return True
+
+    def finish(self):
+        """
+        Uzavře rozhraní nástrojů a doplní výsledek epizody.
+        """
+        self._close()
+        self.tool_executor.close()
+        result = self.result
+        result["solved"] = self.puzzle_env.is_solved()
+        result["wall_time"] = time.perf_counter() - self.started
+        result.update(self.context.stats())
+        if self.speculator is not None:
+            result.update(self.speculator.stats())
+        move_log = getattr(self.puzzle_env, "move_log", None)
+        if move_log is not None:
+            result["move_log"] = move_log.to_bytes()
+        summary = self.tracer.summary()
+        if summary is not None:
+            result["trace"] = summary
+        if self.verbose and not result["finished"] and result["error"] is None:
+            # Smyčka doběhla do konce, aniž by agent přestal volat nástroje.
+            print("❌ CHYBA: Agentovi se nepodařilo dokončit úkol v daném počtu kroků (nikdy nepřestal volat nástroje).")
+        if self.verbose and self.context.max_exchanges is not None and result["context_full_tokens"]:
+            saved = result["context_tokens_saved"]
+            share = saved / result["context_full_tokens"]
+            print(f"Kompakce kontextu ušetřila ~{saved} tokenů promptu ({share:.0%}).")
+        if self.verbose and self.speculator is not None and result["speculated_moves"]:
+            print(
+                f"Agent zvolil optimální tah v {result['optimal_choices']}"
+                f" z {result['speculated_moves']} tahů ({result['optimal_choice_rate']:.0%})."
+            )
+        if self.verbose and summary is not None:
+            print(f"Souhrn měření epizody:\n{format_summary(summary)}")
+        return result
+
+
+def run_episode(model, max_steps, use_mcp=False, system_prompt=SYSTEM_PROMPT, verbose=True, backend_factory=None, mcp_transport="direct", context_window=None, trace=False, trace_exporter=None, speculate=False, tool_workers=1, record_moves=False, temperature=None):
+    """
+    Nechá agenta řešit jednu hádanku pomocí blokujícího volání completion.
+    `backend_factory(puzzle_env)` může místo litellm dodat jiný backend (viz llm_backends).
+    `context_window` omezí konverzaci na posledních K výměn (viz conversation_context).
+    `trace` zapne měření spanů (viz tracing), `trace_exporter` je navíc průběžně zapisuje.
+    `speculate` předpočítává tahy a měří shodu agenta s optimem (viz speculation).
+    `tool_workers` > 1 provádí čtecí nástroje jedné odpovědi souběžně (viz tool_executor).
+    `record_moves` zapíše tahy do binárního logu, výsledek ho nese v `move_log` (viz move_log).
+    `temperature` se posílá modelu; temperature 0 je deterministická a cachuje se (viz completion_cache).
+    Vrací slovník s výsledkem epizody.
+    """
+    tracer = Tracer(trace_exporter) if trace or trace_exporter is not None else NULL_TRACER
+    episode = AgentEpisode(model, use_mcp, mcp_transport, system_prompt, verbose, context_window, tracer, speculate, tool_workers, record_moves, temperature=temperature)
+    call_completion = (
+        backend_factory(episode.puzzle_env).completion if backend_factory else completion
+    )
+
+    try:
+        with tracer.span("episode", **{"gen_ai.request.model": model}):
+            for step in range(1, max_steps + 1):
+                if verbose:
+                    print(f"--- KROK {step} ---")
+                episode.result["steps"] = step
+
+                with tracer.span("step", step=step):
+                    pending = episode.start_speculation()
+                    with tracer.span("completion") as span:
+                        response = call_completion(**episode.completion_kwargs(model))
+                        span.set(**_usage_attributes(response))
+                    if pending is not None:
+                        pending.result()
+                    if episode.handle_response(response):
+                        break
+    finally:
+        episode.finish()
+
+    return episode.result
+
+
+async def run_episode_async(model, max_steps, use_mcp=False, system_prompt=SYSTEM_PROMPT, verbose=False, backend_factory=None, mcp_transport="direct", context_window=None, trace=False, trace_exporter=None, speculate=False, tool_workers=1, record_moves=False, temperature=None):
+    """
+    Asynchronní varianta run_episode používající acompletion.
+    Každá epizoda má vlastní PuzzleEnvironment, takže jich může běžet víc naráz.
+    """
+    tracer = Tracer(trace_exporter) if trace or trace_exporter is not None else NULL_TRACER
+    async with open_tool_interface_async(
+        use_mcp, mcp_transport, episode_env_factory(record_moves)
+    ) as tool_interface:
+        episode = AgentEpisode(model, use_mcp, mcp_transport, system_prompt, verbose, context_window, tracer, speculate, tool_workers, record_moves, tool_interface, temperature)
+        call_acompletion = (
+            backend_factory(episode.puzzle_env).acompletion if backend_factory else acompletion
+        )
+
+        try:
+            with tracer.span("episode", **{"gen_ai.request.model": model}):
+                for step in range(1, max_steps + 1):
+                    episode.result["steps"] = step
+                    with tracer.span("step", step=step):
+                        pending = episode.start_speculation()
+                        with tracer.span("completion") as span:
+                            response = await call_acompletion(**episode.completion_kwargs(model))
+                            span.set(**_usage_attributes(response))
+                        if pending is not None:
+                            await asyncio.wrap_future(pending)
+                        if await episode.ahandle_response(response):
+                            break
+        except Exception as e:
+            # Chyba jedné epizody nesmí shodit celý benchmark.
+            episode.result["error"] = f"{type(e).__name__}: {e}"
+
+        return episode.finish()
+
+
+async def run_episodes_async(episodes, concurrency, **episode_kwargs):
+    """
+    Spustí `episodes` nezávislých epizod, nejvýše `concurrency` současně.
+    Vrací seznam výsledků ve stejném pořadí, v jakém byly epizody spuštěny.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(episode):
+        async with semaphore:
+            result = await run_episode_async(**episode_kwargs)
+            result["episode"] = episode
+            return result
+
+    return await asyncio.gather(*(limited(episode) for episode in range(episodes)))
+
+
+def summarize_results(results):
+    """
+    Agreguje výsledky epizod do souhrnných statistik.
+    """
+    count = len(results)
+    solved = sum(1 for r in results if r["solved"])
+    speculated = [r for r in results if r.get("speculated_moves")]
+    summary = {
+        "episodes": count,
+        "solved": solved,
+        "solve_rate": solved / count if count else 0.0,
+        "errors": sum(1 for r in results if r["error"] is not None),
+        "avg_steps": sum(r["steps"] for r in results) / count if count else 0.0,
+        "avg_invalid_moves": (
+            sum(r["invalid_moves"] for r in results) / count if count else 0.0
+        ),
+        "max_wall_time": max((r["wall_time"] for r in results), default=0.0),
+        "avg_context_tokens_saved": (
+            sum(r.get("context_tokens_saved", 0) for r in results) / count if count else 0.0
+        ),
+    }
+    if speculated:
+        summary["optimal_choice_rate"] = sum(
+            r["optimal_choices"] for r in speculated
+        ) / sum(r["speculated_moves"] for r in speculated)
+    return summary
+
+
+if __name__ == "__main__":
+    load_dotenv()
+
+    MODEL = (
+        os.environ.get("MODEL")
+        if os.environ.get("MODEL") is not None
+        else "openrouter/openai/gpt-4-turbo"
+    )
+
+    MAX_STEP = (
+        int(os.environ.get("MAX_STEP"))
+        if os.environ.get("MAX_STEP") is not None
+        else 15
+    )
+
+    # TEMPERATURE=0 dělá odpovědi modelu opakovatelnými (a cachovatelnými).
+    TEMPERATURE = (
+        float(os.environ.get("TEMPERATURE"))
+        if os.environ.get("TEMPERATURE")
+        else None
+    )
+
+    USE_MCP = os.environ.get("USE_MCP", "false").lower() == "true"
+    # 'memory' pošle volání nástrojů skutečným MCP protokolem v rámci procesu.
+    MCP_TRANSPORT = os.environ.get("MCP_TRANSPORT", "direct")
+
+    # TRACE=true vypíše souhrn spanů, TRACE_PATH je navíc zapisuje jako JSONL.
+    TRACE_PATH = os.environ.get("TRACE_PATH")
+    TRACE = os.environ.get("TRACE", "false").lower() == "true" or bool(TRACE_PATH)
+    trace_exporter = JsonlSpanExporter(TRACE_PATH) if TRACE_PATH else None
+
+    # CONTEXT_WINDOW=K posílá modelu jen posledních K výměn a shrnutí stavu.
+    CONTEXT_WINDOW = (
+        int(os.environ.get("CONTEXT_WINDOW"))
+        if os.environ.get("CONTEXT_WINDOW")
+        else None
+    )
+
+    # SPECULATE=true předpočítá tahy, než model odpoví, a změří shodu s optimem.
+    SPECULATE = os.environ.get("SPECULATE", "false").lower() == "true"
+
+    # TOOL_WORKERS=N provede čtecí nástroje z jedné odpovědi modelu souběžně.
+    TOOL_WORKERS = int(os.environ.get("TOOL_WORKERS", "1"))
+
+    # MOVE_LOG_DIR=adresář uloží binární log tahů každé epizody pro offline analýzu.
+    MOVE_LOG_DIR = os.environ.get("MOVE_LOG_DIR")
+    if MOVE_LOG_DIR:
+        os.makedirs(MOVE_LOG_DIR, exist_ok=True)
+
+    # RESULTS_STORE=adresář připíše výsledky (včetně logu tahů) do sloupcového úložiště.
+    RESULTS_STORE = os.environ.get("RESULTS_STORE")
+    RECORD_MOVES = bool(MOVE_LOG_DIR or RESULTS_STORE)
+
+    # Více epizod se spouští souběžně přes asyncio.
+    EPISODES = int(os.environ.get("EPISODES", "1"))
+    CONCURRENCY = int(os.environ.get("CONCURRENCY", "10"))
+
+    # Hlášky nástrojů: 'sync' (v pořadí s výpisem agenta), 'queue' (neblokující
+    # zápis z vlákna) nebo 'off'. Při více epizodách jsou výchozí vypnuté.
+    TOOL_LOG = os.environ.get("TOOL_LOG", "sync" if EPISODES == 1 else "off")
+    configure_tool_logging(TOOL_LOG)
+
+    # Offline backendy ('oracle', 'replay') umožňují měřit smyčku bez sítě.
+    BACKEND = os.environ.get("BACKEND", "litellm")
+    BACKEND_LATENCY = float(os.environ.get("BACKEND_LATENCY", "0"))
+    REPLAY_LOG = os.environ.get("REPLAY_LOG", "log.txt")
+    backend_factory = create_backend_factory(BACKEND, BACKEND_LATENCY, REPLAY_LOG)
+
+    # Simulace nespolehlivého poskytovatele (chyby 429 a pomalé odpovědi).
+    FAULT_RATE = float(os.environ.get("FAULT_RATE", "0"))
+    TAIL_RATE = float(os.environ.get("TAIL_RATE", "0"))
+    if FAULT_RATE or TAIL_RATE:
+        unreliable = backend_factory
+        backend_factory = lambda puzzle_env: FaultyBackend(
+            unreliable(puzzle_env), failure_rate=FAULT_RATE, tail_rate=TAIL_RATE
+        )
+
+    # Plánovač volání modelu: timeout pokusu, opakování s backoffem, společný
+    # limit požadavků za sekundu a záložní (hedged) požadavky.
+    scheduler = CompletionScheduler(
+        timeout=float(os.environ.get("COMPLETION_TIMEOUT", "60")),
+        max_retries=int(os.environ.get("COMPLETION_RETRIES", "3")),
+        rate_limit=float(os.environ.get("RATE_LIMIT", "0")) or None,
+        hedge_after=float(os.environ.get("HEDGE_AFTER", "0")) or None,
+    )
+    backend_factory = scheduled_backend_factory(backend_factory, scheduler)
+
+    # COMPLETION_CACHE=soubor.sqlite vrací opakovaná deterministická volání modelu z disku.
+    # U skutečných modelů to vyžaduje TEMPERATURE=0; vzorkované odpovědi se cachují jen s
+    # COMPLETION_CACHE_DETERMINISTIC=true (každá epizoda by jinak přehrála tu první).
+    COMPLETION_CACHE = os.environ.get("COMPLETION_CACHE")
+    completion_cache = None
+    if COMPLETION_CACHE:
+        completion_cache = CompletionCache(
+            COMPLETION_CACHE,
+            max_entries=int(os.environ.get("COMPLETION_CACHE_MAX_ENTRIES", "10000")),
+        )
+        backend_factory = cached_backend_factory(
+            backend_factory,
+            completion_cache,
+            os.environ.get("COMPLETION_CACHE_DETERMINISTIC", "false").lower() == "true" or None,
+        )
+
+    # Předpočítaná schémata (python agent_tools.py tool_schemas.json) přeskočí introspekci.
+    TOOL_SCHEMAS_PATH = os.environ.get("TOOL_SCHEMAS_PATH", "tool_schemas.json")
+    if os.path.exists(TOOL_SCHEMAS_PATH):
+        load_tool_schemas(TOOL_SCHEMAS_PATH)
+
+    print(f"\nMODEL: {MODEL}")
+    print(f"USE_MCP: {USE_MCP} (transport: {MCP_TRANSPORT})")
+    print(f"BACKEND: {BACKEND}\n")
+
+    if EPISODES == 1:
+        result = run_episode(
+            MODEL,
+            MAX_STEP,
+            use_mcp=USE_MCP,
+            backend_factory=backend_factory,
+            mcp_transport=MCP_TRANSPORT,
+            context_window=CONTEXT_WINDOW,
+            trace=TRACE,
+            trace_exporter=trace_exporter,
+            speculate=SPECULATE,
+            tool_workers=TOOL_WORKERS,
+            record_moves=RECORD_MOVES,
+            temperature=TEMPERATURE,
+        )
+        result["episode"] = 0
+        results = [result]
     else:
-        # Tento blok se spustí, pokud smyčka doběhla do konce bez 'break'
-        print("❌ CHYBA: Agentovi se nepodařilo dokončit úkol v daném počtu kroků (nikdy nepřestal volat nástroje).")
+        print(f"Spouštím {EPISODES} epizod, souběžně nejvýše {CONCURRENCY}.\n")
+        results = asyncio.run(
+            run_episodes_async(
+                EPISODES,
+                CONCURRENCY,
+                model=MODEL,
+                max_steps=MAX_STEP,
+                use_mcp=USE_MCP,
+                backend_factory=backend_factory,
+                mcp_transport=MCP_TRANSPORT,
+                context_window=CONTEXT_WINDOW,
+                trace=TRACE,
+                trace_exporter=trace_exporter,
+                speculate=SPECULATE,
+                tool_workers=TOOL_WORKERS,
+                record_moves=RECORD_MOVES,
+                temperature=TEMPERATURE,
+            )
+        )
+        print(json.dumps(summarize_results(results), ensure_ascii=False, indent=2))
+
+    if MOVE_LOG_DIR:
+        for result in results:
+            if "move_log" in result:
+                path = os.path.join(MOVE_LOG_DIR, f"episode-{result['episode']:05d}.pzml")
+                with open(path, "wb") as f:
+                    f.write(result["move_log"])
+        print(f"Logy tahů uloženy do {MOVE_LOG_DIR}.")
+
+    if RESULTS_STORE:
+        from results_store import ResultsWriter
+
+        with ResultsWriter(RESULTS_STORE) as store:
+            for result in results:
+                store.write(result, model=MODEL)
+        print(f"Výsledky připsány do úložiště {RESULTS_STORE}.")
+
+    if trace_exporter is not None:
+        trace_exporter.close()
+    if completion_cache is not None:
+        print(f"Cache odpovědí: {json.dumps(completion_cache.stats(), ensure_ascii=False)}")
+        completion_cache.close()
+    print(f"Plánovač volání modelu: {json.dumps(scheduler.stats, ensure_ascii=False)}")
+    scheduler.close()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+"""
+MCP client helpers for talking to the puzzle MCP server over real transports.
+
+The session factories open an initialized ClientSession over stdio (one
+server subprocess per client), streamable HTTP (one shared server) or
+paired in-memory streams (the real Server in the client's event loop,
+with no process spawn or pipe serialization).
+BlockingMCPClient drives such a session from synchronous code, which is
+what the synchronous agent loop, the tests and the benchmarks need; async
+code awaits list_tools/call_tool on the session directly.
+"""
+import asyncio
+import concurrent.futures
+import contextlib
+import os
+import sys
+import threading
+from typing import Any, Dict, List
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from mcp.client.streamable_http import streamablehttp_client
+from mcp.shared.memory import create_connected_server_and_client_session
+
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mcp_server.py")
+
+
+@contextlib.asynccontextmanager
+async def stdio_session(command: str = sys.executable, args: List[str] = None):
+    """Spawn the server as a subprocess and open a session over its stdin/stdout."""
+    params = StdioServerParameters(command=command, args=args or [SERVER_SCRIPT])
+    async with stdio_client(params) as (read_stream, write_stream):
+        async with ClientSession(read_stream, write_stream) as session:
+            await session.initialize()
+            yield session
+
+
+@contextlib.asynccontextmanager
+async def http_session(url: str):
+    """Open a session to a running server over streamable HTTP."""
+    async with streamablehttp_client(url) as (read_stream, write_stream, _):
+        async with ClientSession(read_stream, write_stream) as session:
+            await session.initialize()
+            yield session
+
+
+@contextlib.asynccontextmanager
+async def memory_session(server):
+    """Run an MCP Server (e.g. from setup_mcp_server) over in-memory streams."""
+    async with create_connected_server_and_client_session(server) as session:
+        yield session
+
+
+async def list_tools(session) -> List[Dict[str, Any]]:
+    """Return the session's tools in the same format as PuzzleMCPServer.get_tools."""
+    result = await session.list_tools()
+    return [
+        {
+            "name": tool.name,
+            "description": tool.description,
+            "inputSchema": tool.inputSchema,
+        }
+        for tool in result.tools
+    ]
+
+
+async def call_tool(session, name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+    """Call a tool and return the result in PuzzleMCPServer.call_tool format."""
+    result = await session.call_tool(name, arguments)
+    response = {
+        "content": [
+            {"type": "text", "text": content.text}
+            for content in result.content
+            if content.type == "text"
+        ]
+    }
+    if result.isError:
+        response["isError"] = True
+    return response
+
+
+class BlockingMCPClient:
+    """
+    Synchronous facade over an MCP ClientSession.
+
+    The session lives in a private event loop thread. It is opened and
+    closed inside one task, as the anyio-based transports require, while
+    individual calls are submitted to the loop from the caller's thread.
+    Results use the same dict format as PuzzleMCPServer.call_tool.
+    """
+
+    def __init__(self, session_factory, timeout: float = 30.0):
+        self.timeout = timeout
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+
+        ready = concurrent.futures.Future()
+        self._closing = None
+        self._lifecycle = asyncio.run_coroutine_threadsafe(
+            self._hold_session(session_factory, ready), self._loop
+        )
+        try:
+            self.session = ready.result(timeout)
+        except BaseException:
+            self._shutdown_loop()
+            raise
+
+    async def _hold_session(self, session_factory, ready):
+        try:
+            async with session_factory() as session:
+                self._closing = asyncio.Event()
+                ready.set_result(session)
+                await self._closing.wait()
+        except BaseException as e:
+            if not ready.done():
+                ready.set_exception(e)
+            raise
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(self.timeout)
+
+    def list_tools(self) -> List[Dict[str, Any]]:
+        """Return the tools in the same format as PuzzleMCPServer.get_tools."""
+        return self._run(list_tools(self.session))
+
+    def call_tool(self, name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """Call a tool and return the result in PuzzleMCPServer.call_tool format."""
+        return self._run(call_tool(self.session, name, arguments))
+
+    def _shutdown_loop(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def close(self) -> None:
+        if self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self._closing.set)
+        with contextlib.suppress(Exception):
+            self._lifecycle.result(self.timeout)
+        self._shutdown_loop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
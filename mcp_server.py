@@ -6,10 +6,17 @@ This server provides Model Context Protocol (MCP) tools that allow AI agents
 to interact with the puzzle environment through standardized MCP interfaces.
 """
 
+import argparse
 import asyncio
+import contextlib
 import json
 import sys
-from typing import Any, Dict, List, Literal
+import threading
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Literal, Optional
 
 from mcp.server.models import InitializationOptions
 from mcp.server import NotificationOptions, Server
@@ -21,7 +28,102 @@ from mcp.types import (
     TextContent,
     Tool,
 )
-from puzzle_environment import PuzzleEnvironment
+from puzzle_environment import (
+    PASSENGERS,
+    AtomicPuzzleEnvironment,
+    PuzzleEnvironment,
+    move_report,
+    move_sequence_report,
+)
+from tool_logging import configure_tool_logging, get_tool_logger
+
+logger = get_tool_logger("mcp")
+
+
+_JSON_TYPES = {
+    "string": str,
+    "integer": int,
+    "number": (int, float),
+    "boolean": bool,
+    "array": list,
+    "object": dict,
+}
+
+
+class MCPToolDefinition:
+    """
+    A registered tool: its MCP metadata, handler and pre-compiled argument checks.
+
+    The schema is inspected once at registration, so a call only has to look
+    up the declared parameters instead of walking the JSON schema again.
+    """
+
+    __slots__ = ("name", "description", "input_schema", "handler", "listing", "_parameters", "_required")
+
+    def __init__(self, name: str, description: str, input_schema: Dict[str, Any], handler: Callable):
+        self.name = name
+        self.description = description
+        self.input_schema = input_schema
+        self.handler = handler
+        self.listing = {"name": name, "description": description, "inputSchema": input_schema}
+        self._parameters = tuple(
+            (param, _JSON_TYPES.get(spec.get("type")))
+            for param, spec in input_schema.get("properties", {}).items()
+        )
+        self._required = frozenset(input_schema.get("required", ()))
+
+    def bind_arguments(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """Check arguments against the schema and return handler keyword arguments."""
+        properties = self.input_schema["properties"]
+        unknown = [param for param in arguments if param not in properties]
+        if unknown:
+            raise ValueError(f"Unknown parameter(s): {', '.join(map(str, unknown))}")
+        kwargs = {}
+        for param, expected_type in self._parameters:
+            if param not in arguments:
+                if param in self._required:
+                    raise ValueError(f"Parameter '{param}' is required")
+                continue
+            value = arguments[param]
+            # An explicit null is a wrong type, not a missing argument.
+            if expected_type is not None and (
+                value is None
+                or not isinstance(value, expected_type)
+                # bool is an int subclass, but JSON keeps them apart.
+                or (isinstance(value, bool) and expected_type is not bool)
+            ):
+                raise ValueError(
+                    f"Parameter '{param}' must be of type {self.input_schema['properties'][param]['type']}"
+                )
+            kwargs[param] = value
+        return kwargs
+
+
+def mcp_tool(name: str, description: str, properties: Optional[Dict[str, Any]] = None, required: tuple = ()):
+    """
+    Register a PuzzleMCPServer method as an MCP tool.
+
+    The method receives the validated arguments as keyword arguments and
+    returns the text of the tool result; raised exceptions become MCP errors.
+    """
+    input_schema = {
+        "type": "object",
+        "properties": properties or {},
+        "required": list(required),
+    }
+
+    def decorator(method: Callable) -> Callable:
+        method.__mcp_tool__ = (name, description, input_schema)
+        return method
+
+    return decorator
+
+
+def _text_result(text: str, is_error: bool = False) -> Dict[str, Any]:
+    result = {"content": [{"type": "text", "text": text}]}
+    if is_error:
+        result["isError"] = True
+    return result
 
 
 class PuzzleMCPServer:
@@ -29,66 +131,38 @@ class PuzzleMCPServer:
     MCP Server that provides puzzle-solving tools through the Model Context Protocol.
     
     This server wraps the PuzzleEnvironment class and exposes its functionality
-    as MCP tools that can be used by AI agents.
+    as MCP tools that can be used by AI agents. Tools are methods decorated
+    with @mcp_tool; subclasses can add or override tools the same way.
     """
+
+    # Class-level dispatch table and tool listing, built once per class.
+    _tools: Dict[str, MCPToolDefinition] = {}
+    _tool_listing: List[Dict[str, Any]] = []
     
-    def __init__(self):
-        self.puzzle_env = PuzzleEnvironment()
-        self._tools = self._register_tools()
-    
-    def _register_tools(self) -> Dict[str, Dict[str, Any]]:
-        """Register all available MCP tools with their schemas."""
-        return {
-            "get_current_state": {
-                "description": "Získá aktuální stav hádanky – kdo je na kterém břehu a kde je loďka.",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {},
-                    "required": []
-                }
-            },
-            "move_across_river": {
-                "description": "Pokusí se převézt pasažéra na druhý břeh.",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "passenger": {
-                            "type": "string",
-                            "enum": ["wolf", "goat", "cabbage", "nothing"],
-                            "description": "Koho převézt. Možnosti jsou 'wolf', 'goat', 'cabbage' nebo 'nothing' (převozník jede sám)."
-                        }
-                    },
-                    "required": ["passenger"]
-                }
-            },
-            "check_if_solved": {
-                "description": "Zkontroluje, zda byla hádanka úspěšně vyřešena.",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {},
-                    "required": []
-                }
-            },
-            "reset_puzzle": {
-                "description": "Resetuje hádanku do počátečního stavu.",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {},
-                    "required": []
-                }
-            }
-        }
+    def __init__(self, env_factory: Callable[[], PuzzleEnvironment] = PuzzleEnvironment):
+        self._env_factory = env_factory
+        self.puzzle_env = env_factory()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._register_tools()
+
+    @classmethod
+    def _register_tools(cls) -> None:
+        """Collect @mcp_tool methods (base classes first) into the dispatch table."""
+        tools = {}
+        for klass in reversed(cls.__mro__):
+            for attr, method in vars(klass).items():
+                spec = getattr(method, "__mcp_tool__", None)
+                if spec is not None:
+                    name, description, input_schema = spec
+                    tools[name] = MCPToolDefinition(name, description, input_schema, attr)
+        cls._tools = tools
+        cls._tool_listing = [tool.listing for tool in tools.values()]
     
     def get_tools(self) -> List[Dict[str, Any]]:
-        """Return list of available tools in MCP format."""
-        tools = []
-        for name, config in self._tools.items():
-            tools.append({
-                "name": name,
-                "description": config["description"],
-                "inputSchema": config["inputSchema"]
-            })
-        return tools
+        """Return list of available tools in MCP format (shared, treat as read-only)."""
+        return list(self._tool_listing)
     
     def call_tool(self, name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -101,89 +175,84 @@ class PuzzleMCPServer:
         Returns:
             Dict containing the tool result in MCP format
         """
-        if name not in self._tools:
-            return {
-                "content": [
-                    {
-                        "type": "text",
-                        "text": f"Error: Unknown tool '{name}'"
-                    }
-                ],
-                "isError": True
-            }
+        tool = self._tools.get(name)
+        if tool is None:
+            return _text_result(f"Error: Unknown tool '{name}'", is_error=True)
         
         try:
-            if name == "get_current_state":
-                result = self._get_current_state()
-            elif name == "move_across_river":
-                result = self._move_across_river(arguments.get("passenger"))
-            elif name == "check_if_solved":
-                result = self._check_if_solved()
-            elif name == "reset_puzzle":
-                result = self._reset_puzzle()
-            else:
-                return {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": f"Error: Tool '{name}' not implemented"
-                        }
-                    ],
-                    "isError": True
-                }
-            
-            return {
-                "content": [
-                    {
-                        "type": "text",
-                        "text": result
-                    }
-                ]
-            }
-            
+            kwargs = tool.bind_arguments(arguments or {})
+            return _text_result(getattr(self, tool.handler)(**kwargs))
         except Exception as e:
-            return {
-                "content": [
-                    {
-                        "type": "text",
-                        "text": f"Error executing tool '{name}': {str(e)}"
-                    }
-                ],
-                "isError": True
-            }
+            return _text_result(f"Error executing tool '{name}': {str(e)}", is_error=True)
     
+    @mcp_tool(
+        "get_current_state",
+        "Získá aktuální stav hádanky – kdo je na kterém břehu a kde je loďka.",
+    )
     def _get_current_state(self) -> str:
         """Get the current state of the puzzle."""
-        print("--- MCP nástroj 'get_current_state' byl zavolán. ---")
+        logger.info("--- MCP nástroj 'get_current_state' byl zavolán. ---")
         return self.puzzle_env.get_state_description()
     
+    @mcp_tool(
+        "move_across_river",
+        "Pokusí se převézt pasažéra na druhý břeh.",
+        properties={
+            "passenger": {
+                "type": "string",
+                "enum": ["wolf", "goat", "cabbage", "nothing"],
+                "description": "Koho převézt. Možnosti jsou 'wolf', 'goat', 'cabbage' nebo 'nothing' (převozník jede sám)."
+            }
+        },
+        required=("passenger",),
+    )
     def _move_across_river(self, passenger: str) -> str:
         """Move a passenger across the river."""
-        if not passenger:
-            raise ValueError("Parameter 'passenger' is required")
-        
-        print(f"--- MCP nástroj 'move_across_river' byl zavolán s pasažérem: '{passenger}' ---")
+        logger.info("--- MCP nástroj 'move_across_river' byl zavolán s pasažérem: '%s' ---", passenger)
         
         passenger = passenger.lower()
         if passenger not in ["wolf", "goat", "cabbage", "nothing"]:
             raise ValueError(f"Invalid passenger '{passenger}'. Must be one of: wolf, goat, cabbage, nothing")
         
-        success, message = self.puzzle_env.attempt_move(passenger)
-        
-        if success:
-            response = {
-                "status": "úspěch",
-                "popis": message,
-                "novy_stav": self.puzzle_env.get_state_description(),
+        response = move_report(self.puzzle_env, passenger)
+        return json.dumps(response, ensure_ascii=False)
+    
+    @mcp_tool(
+        "move_sequence",
+        "Provede několik převozů za sebou jedním voláním.",
+        properties={
+            "passengers": {
+                "type": "array",
+                "items": {"type": "string", "enum": ["wolf", "goat", "cabbage", "nothing"]},
+                "description": "Pasažéři jednotlivých převozů v pořadí, v jakém se mají provést."
+            },
+            "atomic": {
+                "type": "boolean",
+                "description": "Pokud je true a některý tah selže, vrátí se hádanka do stavu před prvním tahem. Jinak zůstanou provedeny tahy před chybou."
             }
-        else:
-            response = {"status": "chyba", "duvod": message}
-        
+        },
+        required=("passengers",),
+    )
+    def _move_sequence(self, passengers: List[str], atomic: bool = False) -> str:
+        """Apply several moves in order, up to the first failure (or none if atomic)."""
+        logger.info("--- MCP nástroj 'move_sequence' byl zavolán s pasažéry: %s ---", passengers)
+
+        normalized = []
+        for passenger in passengers:
+            if not isinstance(passenger, str) or passenger.lower() not in PASSENGERS:
+                raise ValueError(f"Invalid passenger '{passenger}'. Must be one of: wolf, goat, cabbage, nothing")
+            normalized.append(passenger.lower())
+
+        response = move_sequence_report(self.puzzle_env, normalized, atomic)
         return json.dumps(response, ensure_ascii=False)
     
+    @mcp_tool(
+        "check_if_solved",
+        "Zkontroluje, zda byla hádanka úspěšně vyřešena.",
+    )
     def _check_if_solved(self) -> str:
         """Check if the puzzle is solved."""
-        print("--- MCP nástroj 'check_if_solved' byl zavolán. ---")
+        logger.info("--- MCP nástroj 'check_if_solved' byl zavolán. ---")
         
         if self.puzzle_env.is_solved():
             return "Potvrzeno. Hádanka je skutečně vyřešena. Nyní můžeš napsat finální zprávu."
@@ -191,53 +260,162 @@ class PuzzleMCPServer:
             current_state = self.puzzle_env.get_state_description()
             return f"Negativní. Hádanka ještě není vyřešena. Pokračuj v práci. Aktuální stav je:\n{current_state}"
     
+    @mcp_tool(
+        "reset_puzzle",
+        "Resetuje hádanku do počátečního stavu.",
+    )
     def _reset_puzzle(self) -> str:
         """Reset the puzzle to initial state."""
-        print("--- MCP nástroj 'reset_puzzle' byl zavolán. ---")
-        self.puzzle_env = PuzzleEnvironment()
+        logger.info("--- MCP nástroj 'reset_puzzle' byl zavolán. ---")
+        self.puzzle_env = self._env_factory()
         return f"Hádanka byla resetována do počátečního stavu:\n{self.puzzle_env.get_state_description()}"
 
 
-def create_mcp_server() -> PuzzleMCPServer:
+PuzzleMCPServer._register_tools()
+
+
+def create_mcp_server(env_factory: Callable[[], PuzzleEnvironment] = PuzzleEnvironment) -> PuzzleMCPServer:
     """Factory function to create a new MCP server instance."""
-    return PuzzleMCPServer()
+    return PuzzleMCPServer(env_factory)
+
+
+def create_session_server() -> PuzzleMCPServer:
+    """Server for a session table; its puzzle is safe under concurrent requests."""
+    return PuzzleMCPServer(AtomicPuzzleEnvironment)
+
+
+class PuzzleSessionTable:
+    """
+    LRU-bounded table of per-session puzzle servers.
+
+    Every session id gets its own PuzzleMCPServer (and thus its own
+    puzzle), so concurrent agents never see each other's moves. By default
+    the puzzle is an AtomicPuzzleEnvironment, so concurrent requests within
+    one session cannot interleave a move either.
+    Sessions are kept in least-recently-used order, which is also idle
+    order, so both the size bound and the idle timeout only ever evict
+    from the front of the table.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 1024,
+        idle_timeout: Optional[float] = 900.0,
+        server_factory: Optional[Callable[[], PuzzleMCPServer]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if max_sessions < 1:
+            raise ValueError("max_sessions must be at least 1")
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self._server_factory = server_factory or create_session_server
+        self._clock = clock
+        self._sessions: "OrderedDict[str, List[Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def get(self, session_id: str) -> PuzzleMCPServer:
+        """Return the server for a session, creating it on first use."""
+        now = self._clock()
+        self.evict_idle(now)
+
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            entry = [self._server_factory(), now]
+            self._sessions[session_id] = entry
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            entry[1] = now
+            self._sessions.move_to_end(session_id)
+        return entry[0]
+
+    def lookup(self, session_id: str) -> Optional[PuzzleMCPServer]:
+        """Return the server for an existing session without creating or touching it."""
+        entry = self._sessions.get(session_id)
+        return entry[0] if entry is not None else None
+
+    def close(self, session_id: str) -> bool:
+        """Drop a session. Returns True if it existed."""
+        return self._sessions.pop(session_id, None) is not None
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        """Drop sessions idle for longer than idle_timeout. Returns how many were dropped."""
+        if self.idle_timeout is None:
+            return 0
+        now = self._clock() if now is None else now
+        evicted = 0
+        while self._sessions:
+            _, (_, last_used) = next(iter(self._sessions.items()))
+            if now - last_used <= self.idle_timeout:
+                break
+            self._sessions.popitem(last=False)
+            evicted += 1
+        return evicted
 
 
-def setup_mcp_server():
-    """Setup and configure the MCP server with handlers."""
-    # Global puzzle server instance
-    puzzle_server = None
+SESSION_ID_SCHEMA = {
+    "type": "string",
+    "description": "Identifikátor relace. Každá relace má vlastní hádanku; bez něj se použije relace spojení.",
+}
+
+
+def setup_mcp_server(sessions: Optional[PuzzleSessionTable] = None):
+    """
+    Setup and configure the MCP server with handlers.
+
+    Each tool call is routed to a session-scoped puzzle: the optional
+    `session_id` argument selects the session explicitly, otherwise every
+    client connection gets its own session.
+    """
+    if sessions is None:
+        sessions = PuzzleSessionTable()
+
+    # Stable ids for client connections; weak keys let closed connections go away.
+    connection_ids = weakref.WeakKeyDictionary()
+
+    # Tool definitions are the same for every session, so the Tool objects
+    # (with the injected session_id parameter) are built once.
+    listed_tools = [
+        Tool(
+            name=tool["name"],
+            description=tool["description"],
+            inputSchema={
+                **tool["inputSchema"],
+                "properties": {
+                    **tool["inputSchema"]["properties"],
+                    "session_id": SESSION_ID_SCHEMA,
+                },
+            },
+        )
+        for tool in create_mcp_server().get_tools()
+    ]
 
     # Create MCP server instance
     mcp_server = Server("puzzle-solver")
 
+    def connection_session_id() -> str:
+        session = mcp_server.request_context.session
+        session_id = connection_ids.get(session)
+        if session_id is None:
+            session_id = connection_ids[session] = f"connection-{uuid.uuid4().hex}"
+        return session_id
+
     @mcp_server.list_tools()
     async def handle_list_tools() -> list[Tool]:
         """List available tools."""
-        nonlocal puzzle_server
-        if puzzle_server is None:
-            puzzle_server = create_mcp_server()
-        
-        tools = puzzle_server.get_tools()
-        mcp_tools = []
-        
-        for tool in tools:
-            mcp_tools.append(
-                Tool(
-                    name=tool["name"],
-                    description=tool["description"],
-                    inputSchema=tool["inputSchema"]
-                )
-            )
-        
-        return mcp_tools
+        return listed_tools
 
     @mcp_server.call_tool()
     async def handle_call_tool(name: str, arguments: dict) -> list[TextContent]:
         """Handle tool calls."""
-        nonlocal puzzle_server
-        if puzzle_server is None:
-            puzzle_server = create_mcp_server()
+        arguments = dict(arguments or {})
+        session_id = arguments.pop("session_id", None) or connection_session_id()
+        puzzle_server = sessions.get(session_id)
         
         result = puzzle_server.call_tool(name, arguments)
         
@@ -250,15 +428,89 @@ def setup_mcp_server():
     
     return mcp_server
 
-async def main():
-    """Run the MCP server."""
-    # Setup the MCP server only when running as main
+
+class _StreamableHTTPEndpoint:
+    """ASGI endpoint forwarding requests to the streamable HTTP session manager."""
+
+    def __init__(self, session_manager):
+        self.session_manager = session_manager
+
+    async def __call__(self, scope, receive, send):
+        await self.session_manager.handle_request(scope, receive, send)
+
+
+def create_http_app(
+    sessions: Optional[PuzzleSessionTable] = None, json_response: bool = True
+):
+    """
+    Create an ASGI app serving the puzzle tools over streamable HTTP at /mcp.
+
+    One long-lived process serves many agents over persistent connections;
+    every MCP session (Mcp-Session-Id) gets its own puzzle unless the client
+    passes an explicit session_id.
+    """
+    from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+    from starlette.applications import Starlette
+    from starlette.routing import Route
+
+    session_manager = StreamableHTTPSessionManager(
+        app=setup_mcp_server(sessions), json_response=json_response
+    )
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        async with session_manager.run():
+            yield
+
+    return Starlette(
+        routes=[Route("/mcp", endpoint=_StreamableHTTPEndpoint(session_manager))],
+        lifespan=lifespan,
+    )
+
+
+class HTTPServerThread:
+    """
+    Run the HTTP transport in a background thread (tests and benchmarks).
+
+    Port 0 picks a free port; the actual URL is available as `url` after start().
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, sessions=None):
+        import uvicorn
+
+        config = uvicorn.Config(
+            create_http_app(sessions), host=host, port=port, log_level="warning"
+        )
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self.url = None
+
+    def start(self, timeout: float = 10.0) -> "HTTPServerThread":
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self._server.started:
+            if not self._thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError("HTTP MCP server failed to start")
+            time.sleep(0.01)
+        host, port = self._server.servers[0].sockets[0].getsockname()[:2]
+        self.url = f"http://{host}:{port}/mcp"
+        return self
+
+    def stop(self) -> None:
+        self._server.should_exit = True
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+async def serve_stdio():
+    """Serve a single client over stdin/stdout."""
     mcp_server = setup_mcp_server()
-    
-    # Log server startup to stderr so it doesn't interfere with MCP protocol
-    print("Wolf, Goat, Cabbage MCP Server starting...", file=sys.stderr)
-    print("Available tools: get_current_state, move_across_river, check_if_solved, reset_puzzle", file=sys.stderr)
-    
+
     async with stdio_server() as (read_stream, write_stream):
         await mcp_server.run(
             read_stream,
@@ -273,5 +525,41 @@ async def main():
             ),
         )
 
+
+async def serve_http(host: str = "127.0.0.1", port: int = 8000):
+    """Serve many clients over streamable HTTP."""
+    import uvicorn
+
+    config = uvicorn.Config(create_http_app(), host=host, port=port, log_level="warning")
+    await uvicorn.Server(config).serve()
+
+
+async def main(argv=None):
+    """Run the MCP server."""
+    parser = argparse.ArgumentParser(description="Wolf, Goat, Cabbage MCP Server")
+    parser.add_argument("--transport", choices=["stdio", "http"], default="stdio")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--log-mode",
+        choices=["off", "sync", "queue"],
+        default="queue",
+        help="Per-call tool logging ('off' disables it entirely)",
+    )
+    args = parser.parse_args(argv)
+
+    # stdout may carry the protocol, so tool chatter always goes to stderr.
+    configure_tool_logging(args.log_mode, stream=sys.stderr)
+
+    # Log server startup to stderr so it doesn't interfere with MCP protocol
+    print("Wolf, Goat, Cabbage MCP Server starting...", file=sys.stderr)
+    print("Available tools: get_current_state, move_across_river, move_sequence, check_if_solved, reset_puzzle", file=sys.stderr)
+
+    if args.transport == "http":
+        print(f"Listening on http://{args.host}:{args.port}/mcp", file=sys.stderr)
+        await serve_http(args.host, args.port)
+    else:
+        await serve_stdio()
+
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,408 @@
+#!/usr/bin/env python
+"""
+Move log - event-sourced, append-only binary history of a puzzle
+
+Every change of a LoggedPuzzleEnvironment is one event of one byte:
+
+    0b0000ccpp  move of PASSENGERS[pp] with result code cc (MOVE_OK,
+                MOVE_WRONG_BANK, MOVE_UNSAFE, or MOVE_UNKNOWN for a
+                passenger that does not exist); rejected moves are kept
+                so that an episode can be re-scored
+    0b010000pp  undo of an earlier move of PASSENGERS[pp]
+    0b011000pp  redo of an undone move of PASSENGERS[pp]
+    0b1000ssss  the state was set directly to bits ssss
+
+A log file is an 8-byte header (magic, format version, initial state)
+followed by the events, so it can be appended to without rewriting
+anything. The state after any event is a fold over the events from the
+initial state; every `snapshot_interval` events the state is kept as one
+byte, so `state_at(step)` replays at most one interval. Undo and redo are
+themselves events, which keeps the log append-only and auditable.
+Loading a log checks every event against the rules: a successful move the
+rules reject, or a state set or initial state that is not valid, raises
+ValueError instead of replaying into an impossible state.
+"""
+import copy
+import os
+import struct
+from collections import namedtuple
+
+from puzzle_environment import (
+    INITIAL_BITS,
+    MOVE_MASKS,
+    MOVE_OK,
+    PASSENGERS,
+    STATE_COUNT,
+    VALID_STATES,
+    BitPuzzleEnvironment,
+    apply_move_bits,
+    decode_state,
+    encode_state,
+    move_result,
+)
+
+MAGIC = b"PZML"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sBBH")
+
+SNAPSHOT_INTERVAL = 1024
+
+# Kód odmítnutého tahu s neexistujícím pasažérem (MOVE_* kódy jsou 0-2).
+MOVE_UNKNOWN = 3
+
+EVENT_MOVE = "move"
+EVENT_UNDO = "undo"
+EVENT_REDO = "redo"
+EVENT_SET = "set"
+
+_SET_FLAG = 0x80
+_CONTROL_FLAG = 0x40
+_REDO_FLAG = 0x20
+
+PASSENGER_INDEX = {passenger: index for index, passenger in enumerate(PASSENGERS)}
+
+MoveEvent = namedtuple("MoveEvent", ["kind", "passenger", "code", "bits"])
+MoveEvent.__doc__ = """
+Dekódovaná událost: druh (EVENT_*), pasažér (None u EVENT_SET a neznámého
+pasažéra), kód výsledku tahu (None mimo EVENT_MOVE) a stav po události.
+"""
+
+
+def encode_move(passenger, code):
+    """
+    Vrátí bajt události tahu.
+    """
+    index = PASSENGER_INDEX.get(passenger)
+    if index is None:
+        return MOVE_UNKNOWN << 2
+    return (code << 2) | index
+
+
+def _kind(event):
+    if event & _SET_FLAG:
+        if event & 0x70:
+            return None
+        return EVENT_SET
+    if event & _CONTROL_FLAG:
+        if event & 0x1C:
+            return None
+        return EVENT_REDO if event & _REDO_FLAG else EVENT_UNDO
+    if event & 0x30:
+        return None
+    return EVENT_MOVE
+
+
+def _next_bits(bits, event):
+    kind = _kind(event)
+    if kind is None:
+        return None
+    if kind == EVENT_SET:
+        bits = event & 0x0F
+        return bits if VALID_STATES[bits] else None
+    passenger = PASSENGERS[event & 0x03]
+    if kind == EVENT_MOVE:
+        if (event >> 2) & 0x03 != MOVE_OK:
+            return bits
+        # Úspěšný tah musí projít pravidly, jinak log nepochází z prostředí.
+        code, next_bits = apply_move_bits(bits, passenger)
+        return next_bits if code == MOVE_OK else None
+    return bits ^ MOVE_MASKS[passenger]
+
+
+def _check_state(bits, what="state"):
+    if not 0 <= bits < STATE_COUNT or not VALID_STATES[bits]:
+        raise ValueError(f"Invalid {what} {bits} in move log")
+
+
+# Přechodová tabulka replaye: _STEP[bits << 8 | událost] = stav po události
+# (None pro bajty, které nejsou platnou událostí, a pro úspěšné tahy nebo
+# nastavení stavu, které by vedly do neplatného stavu).
+_STEP = tuple(
+    _next_bits(bits, event) for bits in range(STATE_COUNT) for event in range(256)
+)
+
+
+def decode_event(event, bits):
+    """
+    Dekóduje bajt události aplikovaný na stav `bits` na MoveEvent.
+    """
+    kind = _kind(event)
+    if kind is None:
+        raise ValueError(f"Invalid move log event {event:#04x}")
+    next_bits = _STEP[bits << 8 | event]
+    if next_bits is None:
+        raise ValueError(f"Move log event {event:#04x} is not possible in state {bits}")
+    if kind == EVENT_SET:
+        return MoveEvent(kind, None, None, next_bits)
+    if kind == EVENT_MOVE:
+        code = (event >> 2) & 0x03
+        passenger = None if code == MOVE_UNKNOWN else PASSENGERS[event & 0x03]
+        return MoveEvent(kind, passenger, code, next_bits)
+    return MoveEvent(kind, PASSENGERS[event & 0x03], None, next_bits)
+
+
+class MoveLog:
+    """
+    Append-only záznam událostí hádanky s průběžnými snímky stavu.
+
+    Aktuální stav i zásobníky undo/redo jsou odvozené jen z událostí, takže
+    log načtený ze souboru vede ke stejnému stavu jako původní běh.
+
+    :param initial_bits: Počáteční stav.
+    :param snapshot_interval: Po kolika událostech uložit snímek stavu.
+    """
+
+    def __init__(self, initial_bits=INITIAL_BITS, snapshot_interval=SNAPSHOT_INTERVAL):
+        if snapshot_interval < 1:
+            raise ValueError("snapshot_interval must be at least 1")
+        _check_state(initial_bits, "initial state")
+        self.initial_bits = initial_bits
+        self.snapshot_interval = snapshot_interval
+        self.events = bytearray()
+        # snapshots[k] = stav po k * snapshot_interval událostech.
+        self.snapshots = bytearray([initial_bits])
+        self.bits = initial_bits
+        self._undo = bytearray()
+        self._redo = bytearray()
+        self._file = None
+
+    def __len__(self):
+        return len(self.events)
+
+    def __deepcopy__(self, memo):
+        # Kopie žije jen v paměti; soubor zůstává původnímu logu.
+        clone = copy.copy(self)
+        clone.events = bytearray(self.events)
+        clone.snapshots = bytearray(self.snapshots)
+        clone._undo = bytearray(self._undo)
+        clone._redo = bytearray(self._redo)
+        clone._file = None
+        return clone
+
+    def _append(self, event):
+        next_bits = _STEP[self.bits << 8 | event]
+        if next_bits is None:
+            if _kind(event) is None:
+                raise ValueError(f"Invalid move log event {event:#04x}")
+            raise ValueError(f"Move log event {event:#04x} is not possible in state {self.bits}")
+
+        if event & _SET_FLAG:
+            del self._undo[:]
+            del self._redo[:]
+        elif event & _CONTROL_FLAG:
+            source, target = (
+                (self._redo, self._undo) if event & _REDO_FLAG else (self._undo, self._redo)
+            )
+            if not source or source[-1] != event & 0x03:
+                raise ValueError(f"Event {event:#04x} does not match the undo/redo history")
+            target.append(source.pop())
+        elif (event >> 2) & 0x03 == MOVE_OK:
+            self._undo.append(event & 0x03)
+            del self._redo[:]
+
+        self.events.append(event)
+        self.bits = next_bits
+        if len(self.events) % self.snapshot_interval == 0:
+            self.snapshots.append(next_bits)
+        if self._file is not None:
+            self._file.write(bytes((event,)))
+
+    def record_move(self, passenger, code):
+        """
+        Zapíše pokus o tah s jeho výsledkem (kód MOVE_*).
+        """
+        self._append(encode_move(passenger, code))
+
+    def record_set(self, bits):
+        """
+        Zapíše přímé nastavení stavu; stav musí být platný jako počáteční stav logu.
+        """
+        _check_state(bits)
+        self._append(_SET_FLAG | bits)
+
+    @property
+    def can_undo(self):
+        return bool(self._undo)
+
+    @property
+    def can_redo(self):
+        return bool(self._redo)
+
+    def undo(self):
+        """
+        Vrátí poslední provedený tah. Vrací jeho pasažéra, nebo None, není-li co vracet.
+        """
+        if not self._undo:
+            return None
+        index = self._undo[-1]
+        self._append(_CONTROL_FLAG | index)
+        return PASSENGERS[index]
+
+    def redo(self):
+        """
+        Znovu provede naposledy vrácený tah. Vrací jeho pasažéra, nebo None.
+        """
+        if not self._redo:
+            return None
+        index = self._redo[-1]
+        self._append(_CONTROL_FLAG | _REDO_FLAG | index)
+        return PASSENGERS[index]
+
+    def state_at(self, step):
+        """
+        Vrátí stav po prvních `step` událostech (0 = počáteční stav).
+        Přehraje nejvýše snapshot_interval událostí od nejbližšího snímku.
+        """
+        if not 0 <= step <= len(self.events):
+            raise IndexError(f"step {step} is out of range 0..{len(self.events)}")
+        snapshot = step // self.snapshot_interval
+        bits = self.snapshots[snapshot]
+        for event in self.events[snapshot * self.snapshot_interval:step]:
+            bits = _STEP[bits << 8 | event]
+        return bits
+
+    def replay(self, step=None):
+        """
+        Vrátí nový log obsahující prvních `step` událostí, včetně odvozené
+        historie undo/redo - výchozí bod pro prostředí v daném kroku.
+        """
+        log = MoveLog(self.initial_bits, self.snapshot_interval)
+        for event in self.events[:step]:
+            log._append(event)
+        return log
+
+    def __iter__(self):
+        """
+        Prochází události jako MoveEvent (se stavem po každé z nich).
+        """
+        bits = self.initial_bits
+        for event in self.events:
+            decoded = decode_event(event, bits)
+            bits = decoded.bits
+            yield decoded
+
+    def to_bytes(self):
+        return HEADER.pack(MAGIC, FORMAT_VERSION, self.initial_bits, 0) + bytes(self.events)
+
+    @classmethod
+    def from_bytes(cls, data, snapshot_interval=SNAPSHOT_INTERVAL):
+        """
+        Načte log z bajtů (hlavička + události) a přehraje ho.
+        """
+        if len(data) < HEADER.size:
+            raise ValueError("Move log is shorter than its header")
+        magic, version, initial_bits, _ = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("Not a move log (bad magic)")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported move log version {version}")
+        log = cls(initial_bits, snapshot_interval)
+        for event in memoryview(data)[HEADER.size:]:
+            log._append(event)
+        return log
+
+    @classmethod
+    def open(cls, path, initial_bits=INITIAL_BITS, snapshot_interval=SNAPSHOT_INTERVAL):
+        """
+        Otevře log v souboru: existující načte, nový založí. Další události
+        se do souboru připisují (bufferovaně, zapíše je flush/close).
+        """
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, "rb") as f:
+                log = cls.from_bytes(f.read(), snapshot_interval)
+            log._file = open(path, "ab")
+        else:
+            log = cls(initial_bits, snapshot_interval)
+            log._file = open(path, "wb")
+            log._file.write(log.to_bytes())
+        return log
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class LoggedPuzzleEnvironment(BitPuzzleEnvironment):
+    """
+    Prostředí, jehož stav je odvozený z MoveLog - každý tah, vrácení
+    i přímé nastavení stavu je událost v logu.
+
+    Jako u AtomicPuzzleEnvironment vrací `state` při každém čtení nový
+    slovník; stav se mění jen tahy, undo/redo nebo přiřazením.
+
+    :param move_log: Log, ze kterého prostředí vychází (výchozí nový prázdný).
+    """
+
+    def __init__(self, move_log=None):
+        self.move_log = move_log if move_log is not None else MoveLog()
+
+    @property
+    def bits(self):
+        return self.move_log.bits
+
+    @bits.setter
+    def bits(self, value):
+        self.move_log.record_set(value)
+
+    @property
+    def state(self):
+        return decode_state(self.move_log.bits)
+
+    @state.setter
+    def state(self, value):
+        self.bits = encode_state(value)
+
+    def attempt_move(self, passenger: str):
+        """
+        Pokusí se provést tah a zapíše ho do logu (i když je odmítnut).
+        Vrací: (bool: úspěch, str: zpráva)
+        """
+        code, _ = apply_move_bits(self.move_log.bits, passenger)
+        self.move_log.record_move(passenger, code)
+        return move_result(code, passenger)
+
+    def attempt_moves(self, passengers, atomic=False):
+        """
+        Jako PuzzleEnvironment.attempt_moves; atomický návrat zapíše jako undo
+        provedených tahů, takže v logu zůstane celý průběh.
+        """
+        outcomes, _ = super(BitPuzzleEnvironment, self).attempt_moves(passengers)
+        if atomic and outcomes and not outcomes[-1][1]:
+            for _ in range(len(outcomes) - 1):
+                self.move_log.undo()
+            return outcomes, True
+        return outcomes, False
+
+    def undo(self):
+        """
+        Vrátí poslední provedený tah. Vrací True, pokud bylo co vracet.
+        """
+        return self.move_log.undo() is not None
+
+    def redo(self):
+        """
+        Znovu provede naposledy vrácený tah. Vrací True, pokud bylo co obnovit.
+        """
+        return self.move_log.redo() is not None
+
+    @classmethod
+    def at_step(cls, move_log, step=None):
+        """
+        Vrátí nové prostředí ve stavu po prvních `step` událostech logu.
+        """
+        return cls(move_log.replay(step))
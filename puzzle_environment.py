@@ -3,6 +3,198 @@
 Puzzle Environment - Wolf, Goat, Cabbage puzzle implementation
 """
 import copy
+import sys
+import threading
+from collections import namedtuple
+
+# Kompaktní bitová reprezentace světa hádanky:
+# bit i je nastaven, pokud je ITEMS[i] na pravém břehu,
+# bit BOAT_BIT je nastaven, pokud je loďka na pravém břehu.
+ITEMS = ("wolf", "goat", "cabbage")
+PASSENGERS = ITEMS + ("nothing",)
+ITEM_BITS = {item: 1 << index for index, item in enumerate(ITEMS)}
+ITEMS_MASK = (1 << len(ITEMS)) - 1
+BOAT_BIT = 1 << len(ITEMS)
+STATE_COUNT = 1 << (len(ITEMS) + 1)
+INITIAL_BITS = 0
+GOAL_BITS = ITEMS_MASK | BOAT_BIT
+
+# Dvojice, které nesmí zůstat na břehu bez převozníka.
+FORBIDDEN_MASKS = (
+    ITEM_BITS["wolf"] | ITEM_BITS["goat"],
+    ITEM_BITS["goat"] | ITEM_BITS["cabbage"],
+)
+
+# Tah je XOR maskou: loďka vždy mění břeh, pasažér s ní.
+MOVE_MASKS = {"nothing": BOAT_BIT}
+MOVE_MASKS.update({item: BOAT_BIT | bit for item, bit in ITEM_BITS.items()})
+
+# Výsledné kódy tahu sdílené bitovými enginy.
+MOVE_OK = 0
+MOVE_WRONG_BANK = 1
+MOVE_UNSAFE = 2
+
+MOVE_SUCCESS_TEMPLATE = "Převozník úspěšně převezl '{passenger}'."
+WRONG_BANK_TEMPLATE = "Pasažér '{passenger}' není na stejném břehu jako loďka."
+UNSAFE_MESSAGE = (
+    "Tento tah je neplatný, protože by vedl k porušení pravidel. Zkus jiný tah."
+)
+VERSION_CONFLICT_TEMPLATE = (
+    "Stav hádanky se mezitím změnil (očekávaná verze {expected}, aktuální {actual}). "
+    "Tah nebyl proveden, zjisti aktuální stav a zkus to znovu."
+)
+CONTENTION_MESSAGE = "Stav hádanky se mění příliš často, tah nebyl proveden. Zkus to znovu."
+
+
+def _compute_is_valid(bits):
+    # Bez dozoru je vždy ten břeh, na kterém loďka není.
+    if bits & BOAT_BIT:
+        unattended = ~bits & ITEMS_MASK
+    else:
+        unattended = bits & ITEMS_MASK
+    return not any((unattended & mask) == mask for mask in FORBIDDEN_MASKS)
+
+
+# Předpočítaná platnost všech stavů - kontrola pravidel je jen indexace.
+VALID_STATES = tuple(_compute_is_valid(bits) for bits in range(STATE_COUNT))
+
+
+def encode_state(state):
+    """
+    Převede slovníkový stav (left_bank, right_bank, boat_location) na bitovou masku.
+    """
+    bits = BOAT_BIT if state["boat_location"] == "right" else 0
+    for item in state["right_bank"]:
+        bits |= ITEM_BITS[item]
+    return bits
+
+
+def decode_state(bits):
+    """
+    Převede bitovou masku zpět na slovníkový stav ve formátu PuzzleEnvironment.state.
+    """
+    return {
+        "left_bank": {item for item, bit in ITEM_BITS.items() if not bits & bit},
+        "right_bank": {item for item, bit in ITEM_BITS.items() if bits & bit},
+        "boat_location": "right" if bits & BOAT_BIT else "left",
+    }
+
+
+def apply_move_bits(bits, passenger):
+    """
+    Provede tah nad bitovým stavem bez vedlejších efektů.
+    Vrací: (int: kód výsledku MOVE_*, int: nový stav nebo původní při chybě)
+    """
+    mask = MOVE_MASKS.get(passenger)
+    if mask is None:
+        return (MOVE_WRONG_BANK, bits)
+
+    # Pasažér musí být na stejném břehu jako loďka.
+    item_bit = mask & ITEMS_MASK
+    if item_bit and bool(bits & item_bit) != bool(bits & BOAT_BIT):
+        return (MOVE_WRONG_BANK, bits)
+
+    next_bits = bits ^ mask
+    if not VALID_STATES[next_bits]:
+        return (MOVE_UNSAFE, bits)
+    return (MOVE_OK, next_bits)
+
+
+def _describe_bits(bits):
+    left = ", ".join(
+        item for item in sorted(ITEMS) if not bits & ITEM_BITS[item]
+    ) or "prázdný"
+    right = ", ".join(
+        item for item in sorted(ITEMS) if bits & ITEM_BITS[item]
+    ) or "prázdný"
+    boat = "pravém" if bits & BOAT_BIT else "levém"
+    return (
+        f"Levý břeh: [{left}].\n"
+        f"Pravý břeh: [{right}].\n"
+        f"Loďka s převozníkem je na {boat} břehu."
+    )
+
+
+class PuzzleState:
+    """
+    Neměnný, hashovatelný stav hádanky.
+
+    Pro každý z STATE_COUNT stavů existuje jediná instance (PuzzleState.of),
+    takže stav lze levně použít jako klíč cache nebo prvek množiny navštívených
+    stavů. Břehy i lidsky čitelný popis jsou předpočítané, popis je internovaný.
+    """
+
+    __slots__ = ("bits", "left_bank", "right_bank", "boat_location", "description")
+
+    def __init__(self, bits):
+        init = object.__setattr__
+        init(self, "bits", bits)
+        init(self, "left_bank", frozenset(i for i in ITEMS if not bits & ITEM_BITS[i]))
+        init(self, "right_bank", frozenset(i for i in ITEMS if bits & ITEM_BITS[i]))
+        init(self, "boat_location", "right" if bits & BOAT_BIT else "left")
+        init(self, "description", sys.intern(_describe_bits(bits)))
+
+    @staticmethod
+    def of(state):
+        """
+        Vrátí instanci pro bitovou masku, slovníkový stav nebo PuzzleState.
+        """
+        if isinstance(state, PuzzleState):
+            return state
+        if isinstance(state, int):
+            return PUZZLE_STATES[state]
+        return PUZZLE_STATES[encode_state(state)]
+
+    def __setattr__(self, name, value):
+        raise AttributeError("PuzzleState is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("PuzzleState is immutable")
+
+    def __eq__(self, other):
+        if isinstance(other, PuzzleState):
+            return self.bits == other.bits
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.bits)
+
+    def __reduce__(self):
+        # Kopie i unpickling vrací internovanou instanci.
+        return (PuzzleState.of, (self.bits,))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self):
+        return f"PuzzleState(bits={self.bits:#06b})"
+
+    @property
+    def is_valid(self):
+        return VALID_STATES[self.bits]
+
+    @property
+    def is_solved(self):
+        return (self.bits & ITEMS_MASK) == ITEMS_MASK
+
+    def to_dict(self):
+        """
+        Vrátí nový slovník ve formátu PuzzleEnvironment.state.
+        """
+        return decode_state(self.bits)
+
+    def move(self, passenger):
+        """
+        Vrátí výsledek tahu: (kód MOVE_*, PuzzleState po tahu).
+        """
+        code, next_bits = apply_move_bits(self.bits, passenger)
+        return code, PUZZLE_STATES[next_bits]
+
+
+PUZZLE_STATES = tuple(PuzzleState(bits) for bits in range(STATE_COUNT))
 
 
 class PuzzleEnvironment:
@@ -17,18 +209,18 @@ class PuzzleEnvironment:
             "boat_location": "left",
         }
 
+    @property
+    def puzzle_state(self):
+        """
+        Aktuální stav jako neměnný PuzzleState.
+        """
+        return PUZZLE_STATES[encode_state(self.state)]
+
     def get_state_description(self):
         """
-        Vrátí lidsky čitelný popis aktuálního stavu.
+        Vrátí lidsky čitelný popis aktuálního stavu (předpočítaný).
         """
-        left = ", ".join(sorted(list(self.state["left_bank"]))) or "prázdný"
-        right = ", ".join(sorted(list(self.state["right_bank"]))) or "prázdný"
-        boat = "levém" if self.state["boat_location"] == "left" else "pravém"
-        return (
-            f"Levý břeh: [{left}].\n"
-            f"Pravý břeh: [{right}].\n"
-            f"Loďka s převozníkem je na {boat} břehu."
-        )
+        return self.puzzle_state.description
 
     def is_valid_state(self, state_to_check):
         """
@@ -74,7 +266,7 @@ class PuzzleEnvironment:
 
         # 1. Logistická kontrola
         if passenger != "nothing" and passenger not in self.state[current_location_key]:
-            return (False, f"Pasažér '{passenger}' není na stejném břehu jako loďka.")
+            return (False, WRONG_BANK_TEMPLATE.format(passenger=passenger))
 
         # 2. Simulace tahu
         potential_state = copy.deepcopy(self.state)
@@ -92,12 +284,286 @@ class PuzzleEnvironment:
         if self.is_valid_state(potential_state):
             # 4. Pokud je vše OK, POTVRDÍME změnu stavu
             self.state = potential_state
-            return (True, f"Převozník úspěšně převezl '{passenger}'.")
+            return (True, MOVE_SUCCESS_TEMPLATE.format(passenger=passenger))
         else:
-            return (
-                False,
-                "Tento tah je neplatný, protože by vedl k porušení pravidel. Zkus jiný tah.",
-            )
+            return (False, UNSAFE_MESSAGE)
+
+    def attempt_moves(self, passengers, atomic=False):
+        """
+        Provede posloupnost tahů, nejvýše do prvního neúspěšného.
+        Při `atomic=True` se po neúspěchu vrátí stav před první z nich.
+        Vrací: (list[(str: pasažér, bool: úspěch, str: zpráva)], bool: vráceno zpět)
+        """
+        snapshot = copy.deepcopy(self.state) if atomic else None
+        outcomes = []
+        for passenger in passengers:
+            success, message = self.attempt_move(passenger)
+            outcomes.append((passenger, success, message))
+            if not success:
+                if atomic:
+                    self.state = snapshot
+                    return outcomes, True
+                break
+        return outcomes, False
 
     def is_solved(self):
-        return len(self.state["left_bank"]) == 0 and len(self.state["right_bank"]) == 3
\ No newline at end of file
+        return len(self.state["left_bank"]) == 0 and len(self.state["right_bank"]) == 3
+
+
+def move_result(code, passenger):
+    """
+    Převede kód MOVE_* na výsledek attempt_move: (bool: úspěch, str: zpráva).
+    """
+    if code == MOVE_OK:
+        return (True, MOVE_SUCCESS_TEMPLATE.format(passenger=passenger))
+    if code == MOVE_WRONG_BANK:
+        return (False, WRONG_BANK_TEMPLATE.format(passenger=passenger))
+    return (False, UNSAFE_MESSAGE)
+
+
+def move_report(puzzle_env, passenger):
+    """
+    Provede jeden tah a sestaví odpověď nástroje 'move_across_river'.
+    """
+    success, message = puzzle_env.attempt_move(passenger)
+    if success:
+        return {
+            "status": "úspěch",
+            "popis": message,
+            "novy_stav": puzzle_env.get_state_description(),
+        }
+    return {"status": "chyba", "duvod": message}
+
+
+def move_sequence_report(puzzle_env, passengers, atomic=False):
+    """
+    Provede posloupnost tahů a sestaví odpověď nástroje 'move_sequence'
+    (výsledek každého kroku, neprovedené tahy a výsledný stav).
+    """
+    outcomes, rolled_back = puzzle_env.attempt_moves(passengers, atomic)
+
+    steps = []
+    for passenger, success, message in outcomes:
+        if success:
+            steps.append({"pasazer": passenger, "status": "úspěch", "popis": message})
+        else:
+            steps.append({"pasazer": passenger, "status": "chyba", "duvod": message})
+    applied = sum(1 for _, success, _ in outcomes if success)
+
+    return {
+        "status": "úspěch" if applied == len(passengers) else "chyba",
+        "kroky": steps,
+        "provedeno": 0 if rolled_back else applied,
+        "vraceno_zpet": rolled_back,
+        "neprovedeno": list(passengers[len(outcomes):]),
+        "novy_stav": puzzle_env.get_state_description(),
+    }
+
+
+class BitPuzzleEnvironment(PuzzleEnvironment):
+    """
+    Kompaktní varianta PuzzleEnvironment, která drží celý svět v jednom celém čísle.
+
+    Tahy jsou XOR masky a kontrola pravidel je vyhledání v předpočítané tabulce,
+    takže odpadá deepcopy stavu při každém tahu. Slovníkový `state` zůstává
+    k dispozici pro zpětnou kompatibilitu - sestaví se až při prvním přístupu
+    a případné úpravy v něm se před dalším tahem promítnou zpět do bitů.
+    """
+
+    def __init__(self):
+        self._bits = INITIAL_BITS
+        self._state_view = None
+
+    @property
+    def bits(self):
+        self._sync_from_view()
+        return self._bits
+
+    @bits.setter
+    def bits(self, value):
+        self._bits = value
+        self._state_view = None
+
+    @property
+    def state(self):
+        if self._state_view is None:
+            self._state_view = decode_state(self._bits)
+        return self._state_view
+
+    @state.setter
+    def state(self, value):
+        self._bits = encode_state(value)
+        self._state_view = value
+
+    def _sync_from_view(self):
+        # Volající mohl slovníkový pohled změnit na místě.
+        if self._state_view is not None:
+            self._bits = encode_state(self._state_view)
+
+    @property
+    def puzzle_state(self):
+        return PUZZLE_STATES[self.bits]
+
+    def get_state_description(self):
+        """
+        Vrátí lidsky čitelný popis aktuálního stavu (předpočítaný).
+        """
+        return PUZZLE_STATES[self.bits].description
+
+    def is_valid_state(self, state_to_check):
+        """
+        Zkontroluje, zda daný stav (bitová maska nebo slovník) neporušuje pravidla.
+        Vrací True, pokud je stav v pořádku.
+        """
+        if not isinstance(state_to_check, int):
+            state_to_check = encode_state(state_to_check)
+        return VALID_STATES[state_to_check]
+
+    def attempt_move(self, passenger: str):
+        """
+        Pokusí se provést tah. Pokud je tah platný, změní vnitřní stav.
+        Vrací: (bool: úspěch, str: zpráva)
+        """
+        code, next_bits = apply_move_bits(self.bits, passenger)
+
+        if code == MOVE_OK:
+            self.bits = next_bits
+        return move_result(code, passenger)
+
+    def attempt_moves(self, passengers, atomic=False):
+        """
+        Jako PuzzleEnvironment.attempt_moves; pro návrat stačí uschovat číslo stavu.
+        """
+        snapshot = self.bits
+        outcomes, _ = super().attempt_moves(passengers)
+        if atomic and outcomes and not outcomes[-1][1]:
+            self.bits = snapshot
+            return outcomes, True
+        return outcomes, False
+
+    def is_solved(self):
+        return (self.bits & ITEMS_MASK) == ITEMS_MASK
+
+
+# Neměnná hodnota stavu: číslo verze roste s každým zápisem, takže porovnání
+# verzí při compare-and-swap nemůže podlehnout problému ABA.
+VersionedState = namedtuple("VersionedState", ["version", "bits"])
+
+
+class AtomicPuzzleEnvironment(BitPuzzleEnvironment):
+    """
+    Varianta prostředí bezpečná pro souběžné použití z více vláken.
+
+    Celý stav je jedna neměnná hodnota VersionedState. Čtenáři jen převezmou
+    aktuální referenci a nikdy neblokují. Zapisovatel spočítá nový stav mimo
+    zámek a zapíše ho přes compare-and-swap; pod zámkem je jen porovnání verze
+    a přiřazení. Pokud mezitím zapsal někdo jiný, tah se spočítá znovu nad
+    novým stavem (nejvýše `max_retries` krát), nebo se při zadané
+    `expected_version` rovnou odmítne.
+
+    `state` vrací při každém čtení nový slovník - změny v něm se do prostředí
+    nepromítnou, stav lze měnit jen přiřazením nebo tahy.
+
+    :param max_retries: Kolikrát nejvýše tah zopakovat po konfliktu zápisů.
+    """
+
+    def __init__(self, max_retries=100):
+        self._current = VersionedState(0, INITIAL_BITS)
+        self._swap_lock = threading.Lock()
+        self.max_retries = max_retries
+        self.conflicts = 0
+
+    def __deepcopy__(self, memo):
+        clone = type(self)(self.max_retries)
+        clone._current = self._current
+        return clone
+
+    def snapshot(self):
+        """
+        Vrátí aktuální VersionedState (konzistentní dvojici verze a stavu).
+        """
+        return self._current
+
+    @property
+    def version(self):
+        return self._current.version
+
+    @property
+    def bits(self):
+        return self._current.bits
+
+    @bits.setter
+    def bits(self, value):
+        with self._swap_lock:
+            self._current = VersionedState(self._current.version + 1, value)
+
+    @property
+    def state(self):
+        return decode_state(self._current.bits)
+
+    @state.setter
+    def state(self, value):
+        self.bits = encode_state(value)
+
+    def compare_and_swap(self, expected, bits):
+        """
+        Zapíše `bits`, jen pokud je aktuální stav stále `expected`.
+        Vrací True při úspěchu, False při konfliktu.
+        """
+        with self._swap_lock:
+            if self._current.version != expected.version:
+                self.conflicts += 1
+                return False
+            self._current = VersionedState(expected.version + 1, bits)
+            return True
+
+    def _update(self, compute, expected_version=None, reject=lambda message: (False, message)):
+        """
+        Optimistická smyčka: `compute(bits)` vrátí (výsledek, nový stav nebo None
+        bez zápisu) a nový stav se zapíše přes compare-and-swap.
+        Vrací výsledek, nebo `reject(zpráva)`, pokud byl zápis odmítnut.
+        """
+        for _ in range(self.max_retries + 1):
+            current = self._current
+            if expected_version is not None and current.version != expected_version:
+                return reject(VERSION_CONFLICT_TEMPLATE.format(
+                    expected=expected_version, actual=current.version
+                ))
+            result, next_bits = compute(current.bits)
+            if next_bits is None or self.compare_and_swap(current, next_bits):
+                return result
+        return reject(CONTENTION_MESSAGE)
+
+    def attempt_move(self, passenger: str, expected_version=None):
+        """
+        Pokusí se provést tah atomicky vůči ostatním vláknům.
+        Se zadanou `expected_version` se tah provede jen nad touto verzí stavu.
+        Vrací: (bool: úspěch, str: zpráva)
+        """
+        def compute(bits):
+            code, next_bits = apply_move_bits(bits, passenger)
+            return move_result(code, passenger), (next_bits if code == MOVE_OK else None)
+
+        return self._update(compute, expected_version)
+
+    def attempt_moves(self, passengers, atomic=False):
+        """
+        Jako PuzzleEnvironment.attempt_moves. Při `atomic=True` se celá posloupnost
+        spočítá nad jedním stavem a zapíše jediným compare-and-swap, takže ji
+        jiné vlákno nemůže rozdělit ani vidět napůl provedenou.
+        """
+        if not atomic or not passengers:
+            return PuzzleEnvironment.attempt_moves(self, passengers)
+
+        def compute(bits):
+            outcomes = []
+            for passenger in passengers:
+                code, bits = apply_move_bits(bits, passenger)
+                outcomes.append((passenger, *move_result(code, passenger)))
+                if code != MOVE_OK:
+                    return (outcomes, True), None
+            return (outcomes, False), bits
+
+        return self._update(
+            compute, reject=lambda message: ([(passengers[0], False, message)], True)
+        )
@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+"""
+Puzzle Solver - exhaustive state graph of the Wolf, Goat, Cabbage puzzle
+"""
+from collections import deque
+
+from puzzle_environment import (
+    GOAL_BITS,
+    INITIAL_BITS,
+    ITEMS_MASK,
+    MOVE_OK,
+    PASSENGERS,
+    STATE_COUNT,
+    PuzzleState,
+    VALID_STATES,
+    apply_move_bits,
+    encode_state,
+)
+
+# Přechodová tabulka: TRANSITIONS[stav][index pasažéra] = (kód MOVE_*, nový stav).
+# Při odmítnutém tahu je nový stav roven původnímu.
+TRANSITIONS = tuple(
+    tuple(apply_move_bits(bits, passenger) for passenger in PASSENGERS)
+    for bits in range(STATE_COUNT)
+)
+
+PASSENGER_INDEX = {passenger: index for index, passenger in enumerate(PASSENGERS)}
+
+
+def _compute_distances():
+    # Zpětné BFS od cíle po hranách přechodové tabulky.
+    predecessors = [[] for _ in range(STATE_COUNT)]
+    for bits in range(STATE_COUNT):
+        if not VALID_STATES[bits]:
+            continue
+        for code, next_bits in TRANSITIONS[bits]:
+            if code == MOVE_OK:
+                predecessors[next_bits].append(bits)
+
+    distances = [None] * STATE_COUNT
+    distances[GOAL_BITS] = 0
+    queue = deque([GOAL_BITS])
+    while queue:
+        bits = queue.popleft()
+        for previous in predecessors[bits]:
+            if distances[previous] is None:
+                distances[previous] = distances[bits] + 1
+                queue.append(previous)
+    return tuple(distances)
+
+
+# Počet tahů do cíle pro každý stav (None = cíl je nedosažitelný).
+DISTANCE_TO_GOAL = _compute_distances()
+
+
+def _as_bits(state):
+    """
+    Přijme bitovou masku, PuzzleState, slovníkový stav nebo prostředí a vrátí bitovou masku.
+    """
+    if isinstance(state, int):
+        return state
+    if isinstance(state, PuzzleState):
+        return state.bits
+    if isinstance(state, dict):
+        return encode_state(state)
+    if hasattr(state, "bits"):
+        return state.bits
+    return encode_state(state.state)
+
+
+def transition(state, passenger):
+    """
+    Vrátí výsledek tahu z tabulky: (kód MOVE_*, nový stav).
+    """
+    index = PASSENGER_INDEX.get(passenger)
+    bits = _as_bits(state)
+    if index is None:
+        return apply_move_bits(bits, passenger)
+    return TRANSITIONS[bits][index]
+
+
+def distance_to_goal(state):
+    """
+    Vrátí nejmenší počet tahů do vyřešení, nebo None, pokud vyřešení není možné.
+    """
+    return DISTANCE_TO_GOAL[_as_bits(state)]
+
+
+def optimal_moves(state):
+    """
+    Vrátí seznam pasažérů, jejichž převezení vede nejkratší cestou k cíli.
+    """
+    bits = _as_bits(state)
+    distance = DISTANCE_TO_GOAL[bits]
+    if not distance:
+        return []
+    return [
+        passenger
+        for passenger, (code, next_bits) in zip(PASSENGERS, TRANSITIONS[bits])
+        if code == MOVE_OK and DISTANCE_TO_GOAL[next_bits] == distance - 1
+    ]
+
+
+def shortest_path(state=INITIAL_BITS):
+    """
+    Vrátí nejkratší posloupnost pasažérů vedoucí k vyřešení, nebo None.
+    """
+    bits = _as_bits(state)
+    if DISTANCE_TO_GOAL[bits] is None:
+        return None
+
+    path = []
+    while bits != GOAL_BITS:
+        passenger = optimal_moves(bits)[0]
+        path.append(passenger)
+        bits = TRANSITIONS[bits][PASSENGER_INDEX[passenger]][1]
+    return path
+
+
+def all_solutions(state=INITIAL_BITS, max_moves=None):
+    """
+    Postupně vrací všechna řešení, která žádný stav nenavštíví dvakrát.
+
+    :param state: Počáteční stav.
+    :param max_moves: Nejvyšší povolená délka řešení (None = bez omezení).
+    """
+    start = _as_bits(state)
+    path = []
+    visited = {start}
+
+    def search(bits):
+        if bits == GOAL_BITS:
+            yield list(path)
+            return
+        if max_moves is not None and len(path) >= max_moves:
+            return
+        for passenger, (code, next_bits) in zip(PASSENGERS, TRANSITIONS[bits]):
+            if code != MOVE_OK or next_bits in visited:
+                continue
+            if DISTANCE_TO_GOAL[next_bits] is None:
+                continue
+            visited.add(next_bits)
+            path.append(passenger)
+            yield from search(next_bits)
+            path.pop()
+            visited.remove(next_bits)
+
+    yield from search(start)
+
+
+def evaluate_moves(passengers, state=INITIAL_BITS):
+    """
+    Ohodnotí posloupnost tahů agenta bez simulace prostředí.
+
+    Vrací slovník s počtem provedených a odmítnutých tahů, informací
+    o vyřešení a počtem tahů navíc oproti optimálnímu řešení.
+    """
+    bits = _as_bits(state)
+    optimal = DISTANCE_TO_GOAL[bits]
+    accepted = 0
+    rejected = 0
+
+    for passenger in passengers:
+        code, bits = transition(bits, passenger)
+        if code == MOVE_OK:
+            accepted += 1
+        else:
+            rejected += 1
+
+    solved = (bits & ITEMS_MASK) == ITEMS_MASK
+    return {
+        "solved": solved,
+        "moves": accepted,
+        "invalid_moves": rejected,
+        "final_bits": bits,
+        "optimal_moves": optimal,
+        "excess_moves": accepted - optimal if solved and optimal is not None else None,
+        "distance_to_goal": DISTANCE_TO_GOAL[bits],
+    }
@@ -0,0 +1,309 @@
+#!/usr/bin/env python
+"""
+Results store - columnar on-disk storage of episode results for analytics
+
+A store is a directory of part files. Every ResultsWriter buffers episode
+results column by column and writes them as record batches into its own
+part, which is renamed into place only when the writer closes, so
+concurrent writers (evaluation workers, repeated runs) never clash and
+readers never see a half-written file.
+
+Formats:
+
+- "arrow":   Arrow IPC file; read back through a memory map, so queries
+             touch only the columns they use and build no Python objects
+             per episode (default when pyarrow is installed),
+- "parquet": compressed Parquet, better for long-term storage,
+- "columns": pure-Python fallback, one line of JSON column lists per
+             record batch; used automatically when pyarrow is missing.
+
+grouped_stats() aggregates a store by model and prompt (or any columns)
+with Arrow's hash aggregation; the fallback computes the same numbers in
+Python. Install the optional dependency with `pip install .[analytics]`.
+"""
+import glob
+import json
+import os
+import uuid
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover - závisí na prostředí
+    pa = None
+
+# Sloupce úložiště v pevném pořadí: jméno -> logický typ.
+RESULT_COLUMNS = {
+    "model": "string",
+    "prompt_name": "string",
+    "config_id": "string",
+    "episode": "int",
+    "solved": "bool",
+    "finished": "bool",
+    "steps": "int",
+    "tool_calls": "int",
+    "invalid_moves": "int",
+    "prompt_tokens": "int",
+    "completion_tokens": "int",
+    "wall_time": "float",
+    "error": "string",
+    # Binární log tahů epizody (move_log.MoveLog.to_bytes), pokud se zaznamenával.
+    "move_log": "binary",
+}
+
+STORE_FORMATS = ("arrow", "parquet", "columns")
+
+_EXTENSIONS = {"arrow": ".arrow", "parquet": ".parquet", "columns": ".columns.json"}
+
+# Agregace pro grouped_stats: výstupní jméno -> (sloupec, funkce).
+STAT_AGGREGATIONS = {
+    "solve_rate": ("solved", "mean"),
+    "avg_steps": ("steps", "mean"),
+    "avg_invalid_moves": ("invalid_moves", "mean"),
+    "avg_prompt_tokens": ("prompt_tokens", "mean"),
+    "avg_completion_tokens": ("completion_tokens", "mean"),
+    "avg_wall_time": ("wall_time", "mean"),
+    "max_wall_time": ("wall_time", "max"),
+}
+
+if pa is not None:
+    _ARROW_TYPES = {
+        "string": pa.string(),
+        "int": pa.int64(),
+        "bool": pa.bool_(),
+        "float": pa.float64(),
+        "binary": pa.binary(),
+    }
+    RESULT_SCHEMA = pa.schema(
+        [(name, _ARROW_TYPES[kind]) for name, kind in RESULT_COLUMNS.items()]
+    )
+
+
+def default_format():
+    return "arrow" if pa is not None else "columns"
+
+
+class ResultsWriter:
+    """
+    Zapisuje výsledky epizod do jedné nové části úložiště.
+
+    :param directory: Adresář úložiště (vytvoří se, pokud neexistuje).
+    :param format: "arrow", "parquet" nebo "columns" (výchozí podle dostupnosti pyarrow).
+    :param batch_size: Po kolika epizodách zapsat další dávku sloupců.
+    """
+
+    def __init__(self, directory, format=None, batch_size=1024):
+        format = format or default_format()
+        if format not in STORE_FORMATS:
+            raise ValueError(
+                f"Unknown store format '{format}'. Must be one of: {', '.join(STORE_FORMATS)}"
+            )
+        if format != "columns" and pa is None:
+            raise RuntimeError(f"Format '{format}' requires pyarrow (pip install .[analytics])")
+        os.makedirs(directory, exist_ok=True)
+        self.format = format
+        self.batch_size = batch_size
+        self.path = os.path.join(directory, f"part-{uuid.uuid4().hex}{_EXTENSIONS[format]}")
+        self._tmp_path = self.path + ".tmp"
+        self._columns = {name: [] for name in RESULT_COLUMNS}
+        self._pending = 0
+        self._sink = None
+        self.written = 0
+
+    def write(self, result, **fields):
+        """
+        Přidá výsledek epizody (slovník z run_episode nebo záznam evaluace).
+        `fields` doplní nebo přepíší hodnoty, např. prompt_name.
+        """
+        record = {**result, **fields}
+        move_log = record.get("move_log")
+        if isinstance(move_log, str):
+            record["move_log"] = bytes.fromhex(move_log)
+        for name, values in self._columns.items():
+            values.append(record.get(name))
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Zapíše nasbírané výsledky jako další dávku sloupců.
+        """
+        if not self._pending:
+            return
+        if self.format == "columns":
+            self._flush_columns()
+        else:
+            batch = pa.RecordBatch.from_pydict(self._columns, schema=RESULT_SCHEMA)
+            if self._sink is None:
+                if self.format == "arrow":
+                    self._sink = pa.ipc.new_file(self._tmp_path, RESULT_SCHEMA)
+                else:
+                    self._sink = pa.parquet.ParquetWriter(self._tmp_path, RESULT_SCHEMA)
+            self._sink.write_batch(batch)
+            self._columns = {name: [] for name in RESULT_COLUMNS}
+        self.written += self._pending
+        self._pending = 0
+
+    def _flush_columns(self):
+        # Záložní formát připisuje každou dávku jako jeden řádek JSON.
+        if self._sink is None:
+            self._sink = open(self._tmp_path, "w", encoding="utf-8")
+        columns = {}
+        for name, values in self._columns.items():
+            if RESULT_COLUMNS[name] == "binary":
+                values = [None if value is None else bytes(value).hex() for value in values]
+            columns[name] = values
+        self._sink.write(json.dumps({"columns": columns}, ensure_ascii=False) + "\n")
+        self._sink.flush()
+        self._columns = {name: [] for name in RESULT_COLUMNS}
+
+    def close(self):
+        """
+        Dopíše zbylé výsledky a zveřejní část pod konečným jménem.
+        """
+        self.flush()
+        if self._sink is None:
+            return
+        self._sink.close()
+        self._sink = None
+        os.replace(self._tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _parts(directory):
+    parts = []
+    for format, extension in _EXTENSIONS.items():
+        for path in glob.glob(os.path.join(directory, f"part-*{extension}")):
+            parts.append((format, path))
+    return sorted(parts, key=lambda part: part[1])
+
+
+def _read_columns_part(path, columns):
+    result = {name: [] for name in columns}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            data = json.loads(line)["columns"]
+            for name in columns:
+                values = data.get(name) or [None] * len(next(iter(data.values()), []))
+                if RESULT_COLUMNS[name] == "binary":
+                    values = [None if value is None else bytes.fromhex(value) for value in values]
+                result[name].extend(values)
+    return result
+
+
+def read_results(directory, columns=None):
+    """
+    Načte úložiště. S pyarrow vrací pyarrow.Table (části Arrow jsou jen
+    namapované do paměti), bez něj slovník jméno sloupce -> seznam hodnot.
+
+    :param columns: Sloupce, které načíst (výchozí všechny).
+    """
+    columns = list(columns or RESULT_COLUMNS)
+    unknown = [name for name in columns if name not in RESULT_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown result columns: {', '.join(unknown)}")
+    parts = _parts(directory)
+
+    if pa is None:
+        table = {name: [] for name in columns}
+        for format, path in parts:
+            if format != "columns":
+                raise RuntimeError(f"Reading '{path}' requires pyarrow")
+            for name, values in _read_columns_part(path, columns).items():
+                table[name].extend(values)
+        return table
+
+    schema = pa.schema([RESULT_SCHEMA.field(name) for name in columns])
+    tables = []
+    for format, path in parts:
+        if format == "arrow":
+            table = pa.ipc.open_file(pa.memory_map(path)).read_all().select(columns)
+        elif format == "parquet":
+            table = pa.parquet.read_table(path, columns=columns)
+        else:
+            table = pa.Table.from_pydict(_read_columns_part(path, columns), schema=schema)
+        tables.append(table)
+    if not tables:
+        return schema.empty_table()
+    return pa.concat_tables(tables)
+
+
+def grouped_stats(directory, by=("model", "prompt_name")):
+    """
+    Vrátí souhrnné statistiky úložiště seskupené podle sloupců `by`:
+    počet epizod, vyřešené, podíl vyřešených a průměry kroků, neplatných
+    tahů, tokenů a času. Výsledek je seznam slovníků seřazený podle skupin.
+    """
+    by = list(by)
+    needed = list(dict.fromkeys(by + [column for column, _ in STAT_AGGREGATIONS.values()]))
+    table = read_results(directory, needed)
+
+    if pa is None:
+        return _grouped_stats_python(table, by)
+
+    aggregations = [([], "count_all")] + [
+        (column, function) for column, function in dict.fromkeys(STAT_AGGREGATIONS.values())
+    ] + [("solved", "sum")]
+    grouped = table.group_by(by).aggregate(aggregations)
+    rows = []
+    for row in grouped.to_pylist():
+        stats = {name: row[name] for name in by}
+        stats["episodes"] = row["count_all"]
+        stats["solved"] = row["solved_sum"] or 0
+        for name, (column, function) in STAT_AGGREGATIONS.items():
+            stats[name] = row[f"{column}_{function}"]
+        rows.append(stats)
+    return sorted(rows, key=lambda stats: _sort_key(stats, by))
+
+
+def _grouped_stats_python(table, by):
+    groups = {}
+    count = len(next(iter(table.values()), []))
+    for index in range(count):
+        key = tuple(table[name][index] for name in by)
+        groups.setdefault(key, []).append(index)
+
+    rows = []
+    for key, indexes in groups.items():
+        stats = dict(zip(by, key))
+        stats["episodes"] = len(indexes)
+        stats["solved"] = sum(1 for i in indexes if table["solved"][i])
+        for name, (column, function) in STAT_AGGREGATIONS.items():
+            values = [table[column][i] for i in indexes if table[column][i] is not None]
+            if not values:
+                stats[name] = None
+            elif function == "mean":
+                stats[name] = sum(values) / len(values)
+            else:
+                stats[name] = max(values)
+        rows.append(stats)
+    return sorted(rows, key=lambda stats: _sort_key(stats, by))
+
+
+def _sort_key(stats, by):
+    # None (např. chybějící prompt_name) řadíme před ostatní hodnoty.
+    return tuple((stats[name] is not None, stats[name]) for name in by)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Grouped stats of a results store")
+    parser.add_argument("directory")
+    parser.add_argument("--by", default="model,prompt_name", help="Comma separated columns")
+    args = parser.parse_args(argv)
+    by = [name.strip() for name in args.by.split(",") if name.strip()]
+    for stats in grouped_stats(args.directory, by):
+        print(json.dumps(stats, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,347 @@
+#!/usr/bin/env python
+"""
+River Crossing - rule-driven engine for generalized river-crossing puzzles
+
+Items, constraints and boat capacity are plain data. They are compiled
+into bitmask tests, so checking a state costs a handful of integer
+operations regardless of how the puzzle was described, and solving uses
+A* with an admissible crossing-count bound so variants with dozens of
+items stay tractable.
+"""
+import heapq
+from itertools import combinations
+
+from puzzle_environment import MOVE_OK, MOVE_UNSAFE, MOVE_WRONG_BANK
+
+# Náklad loďky je mimo kapacitu nebo v ní chybí veslař.
+MOVE_INVALID_LOAD = 3
+
+
+class Conflict:
+    """
+    Položky `together` nesmí zůstat spolu na jednom místě, pokud tam
+    zároveň není žádná z položek `unless`.
+
+    :param together: Položky, které spolu nesmí zůstat.
+    :param unless: Položky, jejichž přítomnost konflikt ruší.
+    :param ferryman_protects: Zda konflikt ruší i přítomnost převozníka.
+    """
+
+    def __init__(self, together, unless=(), ferryman_protects=True):
+        self.together = tuple(together)
+        self.unless = tuple(unless)
+        self.ferryman_protects = ferryman_protects
+
+
+class Outnumber:
+    """
+    Položek skupiny `by` nesmí být na jednom místě víc než položek
+    skupiny `group`, pokud je tam z `group` alespoň jedna
+    (misionáři a kanibalové).
+
+    :param group: Ohrožená skupina.
+    :param by: Skupina, která nesmí mít přesilu.
+    :param ferryman_protects: Zda pravidlo ruší přítomnost převozníka.
+    """
+
+    def __init__(self, group, by, ferryman_protects=False):
+        self.group = tuple(group)
+        self.by = tuple(by)
+        self.ferryman_protects = ferryman_protects
+
+
+class RiverCrossingPuzzle:
+    """
+    Obecná hádanka o převozu přes řeku popsaná daty.
+
+    Stav je celé číslo: bit i je nastaven, pokud je items[i] na pravém
+    břehu, nejvyšší bit označuje loďku na pravém břehu.
+
+    :param items: Názvy převážených položek.
+    :param rules: Seznam pravidel Conflict / Outnumber.
+    :param capacity: Kolik položek se vejde do loďky.
+    :param ferryman: Zda loďku řídí převozník (může jet i prázdná).
+    :param rowers: Položky, které umí veslovat, pokud převozník není (None = všechny).
+    :param rules_apply_in_boat: Zda pravidla platí i pro posádku loďky.
+    """
+
+    def __init__(
+        self,
+        items,
+        rules=(),
+        capacity=1,
+        ferryman=True,
+        rowers=None,
+        rules_apply_in_boat=False,
+    ):
+        if len(set(items)) != len(items):
+            raise ValueError("Item names must be unique")
+        if capacity < 1:
+            raise ValueError("Boat capacity must be at least 1")
+
+        self.items = tuple(items)
+        self.capacity = capacity
+        self.ferryman = ferryman
+        self.item_bits = {item: 1 << index for index, item in enumerate(self.items)}
+        self.items_mask = (1 << len(self.items)) - 1
+        self.boat_bit = 1 << len(self.items)
+        self.initial_bits = 0
+        self.goal_bits = self.items_mask | self.boat_bit
+
+        self._rowers_mask = (
+            self.items_mask if rowers is None else self.encode_items(rowers)
+        )
+        self._compile_rules(rules)
+        self._rules_apply_in_boat = rules_apply_in_boat
+        self._valid_cache = {}
+
+    def encode_items(self, names):
+        """
+        Převede názvy položek na bitovou masku.
+        """
+        mask = 0
+        for name in names:
+            try:
+                mask |= self.item_bits[name]
+            except KeyError:
+                raise ValueError(f"Unknown item '{name}'") from None
+        return mask
+
+    def decode_items(self, mask):
+        """
+        Převede bitovou masku na n-tici názvů položek.
+        """
+        return tuple(item for item, bit in self.item_bits.items() if mask & bit)
+
+    def _compile_rules(self, rules):
+        # Každé pravidlo se převede na n-tici masek; pravidla, která převozník
+        # ruší, jsou zvlášť, aby se na hlídaném břehu vůbec nevyhodnocovala.
+        conflicts = ([], [])
+        outnumbers = ([], [])
+        for rule in rules:
+            protected = 1 if rule.ferryman_protects and self.ferryman else 0
+            if isinstance(rule, Conflict):
+                conflicts[protected].append(
+                    (self.encode_items(rule.together), self.encode_items(rule.unless))
+                )
+            elif isinstance(rule, Outnumber):
+                outnumbers[protected].append(
+                    (self.encode_items(rule.group), self.encode_items(rule.by))
+                )
+            else:
+                raise TypeError(f"Unsupported rule type: {type(rule).__name__}")
+
+        self._always_conflicts, self._unattended_conflicts = (
+            tuple(conflicts[0]),
+            tuple(conflicts[1]),
+        )
+        self._always_outnumbers, self._unattended_outnumbers = (
+            tuple(outnumbers[0]),
+            tuple(outnumbers[1]),
+        )
+
+    @staticmethod
+    def _violates(bank, conflicts, outnumbers):
+        for together, unless in conflicts:
+            if (bank & together) == together and not bank & unless:
+                return True
+        for group, by in outnumbers:
+            present = (bank & group).bit_count()
+            if present and (bank & by).bit_count() > present:
+                return True
+        return False
+
+    def _bank_ok(self, bank, attended):
+        if self._violates(bank, self._always_conflicts, self._always_outnumbers):
+            return False
+        if attended:
+            return True
+        return not self._violates(
+            bank, self._unattended_conflicts, self._unattended_outnumbers
+        )
+
+    def is_valid(self, bits):
+        """
+        Zkontroluje, zda stav neporušuje žádné pravidlo.
+        """
+        valid = self._valid_cache.get(bits)
+        if valid is None:
+            boat_right = bool(bits & self.boat_bit)
+            right = bits & self.items_mask
+            left = self.items_mask & ~bits
+            valid = self._bank_ok(left, self.ferryman and not boat_right) and (
+                self._bank_ok(right, self.ferryman and boat_right)
+            )
+            self._valid_cache[bits] = valid
+        return valid
+
+    def is_solved(self, bits):
+        return (bits & self.items_mask) == self.items_mask
+
+    def _load_ok(self, load):
+        size = load.bit_count()
+        if size > self.capacity:
+            return False
+        if not self.ferryman and not load & self._rowers_mask:
+            return False
+        if self._rules_apply_in_boat and not self._bank_ok(load, self.ferryman):
+            return False
+        return True
+
+    def apply(self, bits, load):
+        """
+        Provede tah bez vedlejších efektů.
+        Vrací: (int: kód výsledku, int: nový stav nebo původní při chybě)
+        """
+        if not self._load_ok(load):
+            return (MOVE_INVALID_LOAD, bits)
+
+        boat_side = bits if bits & self.boat_bit else ~bits
+        if (boat_side & load) != load:
+            return (MOVE_WRONG_BANK, bits)
+
+        next_bits = bits ^ (self.boat_bit | load)
+        if not self.is_valid(next_bits):
+            return (MOVE_UNSAFE, bits)
+        return (MOVE_OK, next_bits)
+
+    def moves(self, bits):
+        """
+        Postupně vrací všechny platné tahy ze stavu jako dvojice (náklad, nový stav).
+        """
+        boat_side = bits if bits & self.boat_bit else ~bits
+        present = [bit for bit in self.item_bits.values() if boat_side & bit]
+        smallest = 0 if self.ferryman else 1
+
+        for size in range(smallest, self.capacity + 1):
+            for combo in combinations(present, size):
+                load = sum(combo)
+                if not self._load_ok(load):
+                    continue
+                next_bits = bits ^ (self.boat_bit | load)
+                if self.is_valid(next_bits):
+                    yield load, next_bits
+
+    def lower_bound(self, bits):
+        """
+        Dolní odhad počtu tahů do cíle podle počtu položek na levém břehu.
+        """
+        remaining = (self.items_mask & ~bits).bit_count()
+        if not remaining:
+            return 0
+        boat_right = bool(bits & self.boat_bit)
+
+        if self.ferryman:
+            # Převozník se vrací sám, každá cesta tam odveze až `capacity` položek.
+            trips = -(-remaining // self.capacity)
+            return 2 * trips - (0 if boat_right else 1)
+
+        # Bez převozníka musí někdo loďku vrátit, takže okružní cesta
+        # přepraví nejvýše capacity - 1 položek.
+        if boat_right:
+            remaining += 1
+        net = max(self.capacity - 1, 1)
+        extra = max(remaining - self.capacity, 0)
+        return 2 * -(-extra // net) + 1 + (1 if boat_right else 0)
+
+    def solve(self, start=None):
+        """
+        Najde nejkratší řešení pomocí A* s přípustným odhadem lower_bound.
+        Vrací seznam nákladů (n-tic názvů položek) nebo None.
+        """
+        start = self.initial_bits if start is None else start
+        if not self.is_valid(start):
+            return None
+
+        parents = {start: None}
+        costs = {start: 0}
+        # Při shodě preferujeme stavy blíže cíli, aby A* neprocházel celé patro.
+        heap = [(self.lower_bound(start), self.lower_bound(start), start)]
+        while heap:
+            _, estimate, bits = heapq.heappop(heap)
+            if self.is_solved(bits):
+                path = []
+                while parents[bits] is not None:
+                    bits, load = parents[bits]
+                    path.append(self.decode_items(load))
+                path.reverse()
+                return path
+
+            cost = costs[bits] + 1
+            for load, next_bits in self.moves(bits):
+                if cost < costs.get(next_bits, cost + 1):
+                    costs[next_bits] = cost
+                    parents[next_bits] = (bits, load)
+                    estimate = self.lower_bound(next_bits)
+                    heapq.heappush(heap, (cost + estimate, estimate, next_bits))
+        return None
+
+    def describe(self, bits):
+        """
+        Vrátí lidsky čitelný popis stavu.
+        """
+        left = ", ".join(self.decode_items(self.items_mask & ~bits)) or "prázdný"
+        right = ", ".join(self.decode_items(bits & self.items_mask)) or "prázdný"
+        boat = "pravém" if bits & self.boat_bit else "levém"
+        return (
+            f"Levý břeh: [{left}].\n"
+            f"Pravý břeh: [{right}].\n"
+            f"Loďka je na {boat} břehu."
+        )
+
+
+def wolf_goat_cabbage():
+    """
+    Klasická hádanka se stejným rozložením bitů jako puzzle_environment.
+    """
+    return RiverCrossingPuzzle(
+        items=("wolf", "goat", "cabbage"),
+        rules=[Conflict(("wolf", "goat")), Conflict(("goat", "cabbage"))],
+    )
+
+
+def missionaries_and_cannibals(count=3, capacity=2):
+    """
+    Kanibalové nesmí mít na žádném břehu přesilu nad misionáři.
+    """
+    missionaries = [f"missionary{index}" for index in range(1, count + 1)]
+    cannibals = [f"cannibal{index}" for index in range(1, count + 1)]
+    return RiverCrossingPuzzle(
+        items=missionaries + cannibals,
+        rules=[Outnumber(missionaries, cannibals)],
+        capacity=capacity,
+        ferryman=False,
+    )
+
+
+def jealous_husbands(couples=3, capacity=2):
+    """
+    Žádná manželka nesmí být s cizím mužem bez přítomnosti svého manžela,
+    a to ani v loďce.
+    """
+    husbands = [f"husband{index}" for index in range(1, couples + 1)]
+    wives = [f"wife{index}" for index in range(1, couples + 1)]
+    rules = [
+        Conflict((wife, other), unless=(husband,), ferryman_protects=False)
+        for wife, husband in zip(wives, husbands)
+        for other in husbands
+        if other != husband
+    ]
+    return RiverCrossingPuzzle(
+        items=husbands + wives,
+        rules=rules,
+        capacity=capacity,
+        ferryman=False,
+        rules_apply_in_boat=True,
+    )
+
+
+def conflict_graph(items, edges, capacity=1):
+    """
+    Hádanka s převozníkem a libovolným grafem konfliktů mezi dvojicemi položek.
+    """
+    return RiverCrossingPuzzle(
+        items=items,
+        rules=[Conflict(edge) for edge in edges],
+        capacity=capacity,
+    )
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+"""
+Move speculation - precomputed move outcomes for the agent loop
+
+The puzzle has sixteen states, so while the model is still deciding, the
+harness can try all four passengers on clones of the current environment.
+`start()` runs the preparation on a background thread, overlapping the
+completion request; the agent loop joins it before dispatching tools. When
+the model then calls `move_across_river`, the move is applied through the
+environment's own `attempt_move` (so logs and versions stay consistent) and
+the prepared response is served instead of formatting it again.
+Speculations are kept per state, so a revisited state costs nothing.
+
+Independently of serving responses, the speculator knows the optimal next
+moves (puzzle_solver) of the state the model was looking at and counts how
+often the model's choice was one of them.
+"""
+import copy
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from puzzle_environment import PASSENGERS, encode_state, move_report
+from puzzle_solver import optimal_moves
+from tool_logging import get_tool_logger
+
+logger = get_tool_logger("speculation")
+
+# Pool sdílený všemi epizodami procesu; předpočet je krátký, vlákno na epizodu by bylo zbytečné.
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def submit(fn):
+    """
+    Spustí `fn` ve vlákně sdíleného poolu předpočtu a vrátí její future.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(thread_name_prefix="speculation")
+    return _executor.submit(fn)
+
+
+class _Speculation:
+    """
+    Předpočítané tahy z jednoho stavu: optimální tahy a odpověď nástroje
+    pro každého pasažéra.
+    """
+
+    __slots__ = ("optimal", "outcomes")
+
+    def __init__(self, optimal, outcomes):
+        self.optimal = optimal
+        self.outcomes = outcomes
+
+
+class MoveSpeculator:
+    """
+    Předpočítává výsledky tahů pro aktuální stav prostředí epizody.
+
+    :param puzzle_env: Prostředí, nad kterým agent hraje.
+    :param serve: Zda předpočítané tahy rovnou provádět. Bez toho se jen
+        počítá shoda s optimálním tahem a tah provede skutečný nástroj
+        (nutné, pokud prostředí spravuje MCP server).
+    """
+
+    def __init__(self, puzzle_env, serve=True):
+        self.puzzle_env = puzzle_env
+        self.serve = serve
+        self._speculations = {}
+        self.moves = 0
+        self.hits = 0
+        self.served = 0
+        self.optimal_choices = 0
+
+    def _bits(self):
+        puzzle_env = self.puzzle_env
+        if hasattr(puzzle_env, "bits"):
+            return puzzle_env.bits
+        return encode_state(puzzle_env.state)
+
+    def _speculate(self, bits):
+        outcomes = {}
+        for passenger in PASSENGERS:
+            clone = copy.deepcopy(self.puzzle_env)
+            outcomes[passenger] = json.dumps(move_report(clone, passenger), ensure_ascii=False)
+        speculation = _Speculation(optimal_moves(bits), outcomes)
+        self._speculations[bits] = speculation
+        return speculation
+
+    def prepare(self):
+        """
+        Předpočítá tahy pro aktuální stav (volá se, zatímco model přemýšlí).
+        """
+        bits = self._bits()
+        if bits not in self._speculations:
+            self._speculate(bits)
+
+    def start(self):
+        """
+        Spustí prepare ve vlákně, aby běžel souběžně s voláním modelu.
+        Před provedením tahů je nutné na vrácenou future počkat.
+        """
+        return submit(self.prepare)
+
+    def move(self, passenger):
+        """
+        Započte volbu agenta a vrátí předpočítanou odpověď nástroje
+        'move_across_river'. Vrací None, pokud má tah provést skutečný nástroj.
+        """
+        bits = self._bits()
+        speculation = self._speculations.get(bits)
+        if speculation is None:
+            speculation = self._speculate(bits)
+        else:
+            self.hits += 1
+
+        passenger = passenger.lower()
+        self.moves += 1
+        if passenger in speculation.optimal:
+            self.optimal_choices += 1
+
+        response = speculation.outcomes.get(passenger)
+        if not self.serve or response is None:
+            return None
+
+        logger.info(
+            "--- Tah '%s' obsloužen z předpočítaného výsledku. ---", passenger
+        )
+        # Tah provede prostředí samo (log tahů, verze stavu), předpočet šetří
+        # jen sestavení odpovědi s popisem stavu.
+        self.puzzle_env.attempt_move(passenger)
+        self.served += 1
+        return response
+
+    def stats(self):
+        """
+        Vrátí počty tahů, zásahů předpočtu a shodu s optimálním tahem.
+        """
+        return {
+            "speculated_moves": self.moves,
+            "speculation_hits": self.hits,
+            "speculation_served": self.served,
+            "optimal_choices": self.optimal_choices,
+            "optimal_choice_rate": (
+                self.optimal_choices / self.moves if self.moves else 0.0
+            ),
+        }
@@ -2,18 +2,16 @@
 import unittest
 import json
 import copy
-from unittest.mock import patch
 from puzzle_environment import PuzzleEnvironment
 from agent_tools import AgentToolbox
 
 
-@patch("builtins.print")
 class TestAgentToolbox(unittest.TestCase):
     def setUp(self):
         self.env = PuzzleEnvironment()
         self.toolbox = AgentToolbox(self.env)
 
-    def test_get_current_state(self, mocked_print):
+    def test_get_current_state(self):
         """
         Testuje, zda nástroj pro zjištění stavu vrací správný formát.
         """
@@ -26,7 +24,7 @@ class TestAgentToolbox(unittest.TestCase):
             "Nástroj get_current_state by měl vracet přesně to, co PuzzleEnvironment.get_state_description.",
         )
 
-    def test_successful_move(self, mocked_print):
+    def test_successful_move(self):
         """
         Testuje úspěšný a platný přesun.
         """
@@ -51,7 +49,7 @@ class TestAgentToolbox(unittest.TestCase):
             "Loďka by měla být na pravém břehu.",
         )
 
-    def test_invalid_move_due_to_rules(self, mocked_print):
+    def test_invalid_move_due_to_rules(self):
         """
         Testuje neúspěšný tah, který porušuje pravidla hry.
         """
@@ -79,7 +77,7 @@ class TestAgentToolbox(unittest.TestCase):
             "Stav prostředí by se po neplatném tahu neměl měnit.",
         )
 
-    def test_invalid_move_due_to_location(self, mocked_print):
+    def test_invalid_move_due_to_location(self):
         """
         Testuje logisticky nemožný tah (pasažér je na špatném břehu).
         """
@@ -120,7 +118,7 @@ class TestAgentToolbox(unittest.TestCase):
             "Stav prostředí by se po logisticky nemožném tahu neměl měnit.",
         )
 
-    def test_check_if_solved_when_not_solved(self, mocked_print):
+    def test_check_if_solved_when_not_solved(self):
         """
         Testuje nástroj check_if_solved ve výchozím (nevyřešeném) stavu.
         """
@@ -133,7 +131,7 @@ class TestAgentToolbox(unittest.TestCase):
         # Ověříme, že odpověď obsahuje i aktuální stav pro pomoc agentovi
         self.assertIn("Levý břeh:", result_string)
 
-    def test_check_if_solved_when_solved(self, mocked_print):
+    def test_check_if_solved_when_solved(self):
         """
         Testuje nástroj check_if_solved, když je hádanka ve vyřešeném stavu.
         """
@@ -151,6 +149,45 @@ class TestAgentToolbox(unittest.TestCase):
         self.assertIn("Potvrzeno", result_string)
         self.assertIn("je skutečně vyřešena", result_string)
 
+    def test_move_sequence_stops_at_first_failure(self):
+        """
+        Testuje, že neatomická posloupnost ponechá tahy před chybou.
+        """
+        result_data = json.loads(
+            self.toolbox.move_sequence(passengers=["goat", "wolf", "nothing"])
+        )
+
+        self.assertEqual(result_data["status"], "chyba")
+        self.assertEqual(result_data["provedeno"], 1)
+        self.assertFalse(result_data["vraceno_zpet"])
+        self.assertEqual(result_data["kroky"][1]["status"], "chyba")
+        self.assertEqual(result_data["neprovedeno"], ["nothing"])
+        self.assertEqual(self.env.state["right_bank"], {"goat"})
+        self.assertIn("goat", result_data["novy_stav"])
+
+    def test_move_sequence_solves_puzzle(self):
+        """
+        Testuje vyřešení celé hádanky jedním voláním.
+        """
+        moves = ["goat", "nothing", "wolf", "goat", "cabbage", "nothing", "goat"]
+        result_data = json.loads(self.toolbox.move_sequence(passengers=moves, atomic=True))
+
+        self.assertEqual(result_data["status"], "úspěch")
+        self.assertEqual(result_data["provedeno"], 7)
+        self.assertTrue(self.env.is_solved())
+
+    def test_move_sequence_rejects_non_string_items(self):
+        """
+        Testuje, že položky jiného typu než řetězec vrátí chybu a nic neprovedou.
+        """
+        for passengers in ([1], [None], ["goat", None], "goat", None):
+            with self.subTest(passengers=passengers):
+                result_data = json.loads(self.toolbox.move_sequence(passengers=passengers))
+
+                self.assertEqual(result_data["status"], "chyba")
+                self.assertIn("passengers", result_data["duvod"])
+                self.assertEqual(self.env.state["right_bank"], set())
+
 
 if __name__ == "__main__":
     unittest.main()
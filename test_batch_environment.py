@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+import random
+import unittest
+from puzzle_environment import PASSENGERS, PuzzleEnvironment
+
+try:
+    import numpy as np
+    from batch_environment import BatchPuzzleEnvironment, encode_actions
+except ImportError:
+    np = None
+
+
+@unittest.skipIf(np is None, "numpy není nainstalován")
+class TestBatchPuzzleEnvironment(unittest.TestCase):
+    def setUp(self):
+        self.batch = BatchPuzzleEnvironment(64)
+
+    def test_initial_state(self):
+        """
+        Testuje, že všechna prostředí začínají v počátečním stavu.
+        """
+        for index in range(len(self.batch)):
+            self.assertEqual(self.batch.get_state(index), PuzzleEnvironment().state)
+        self.assertFalse(self.batch.is_solved().any())
+
+    def test_matches_scalar_environment(self):
+        """
+        Testuje, že náhodné epizody dávají stejné výsledky jako PuzzleEnvironment.
+        """
+        rng = random.Random(42)
+        scalar_envs = [PuzzleEnvironment() for _ in range(len(self.batch))]
+
+        for _ in range(30):
+            passengers = [rng.choice(PASSENGERS) for _ in scalar_envs]
+            success, codes, solved = self.batch.step(passengers)
+
+            for index, (env, passenger) in enumerate(zip(scalar_envs, passengers)):
+                expected_success, _ = env.attempt_move(passenger)
+                self.assertEqual(bool(success[index]), expected_success)
+                self.assertEqual(bool(solved[index]), env.is_solved())
+                self.assertEqual(self.batch.get_state(index), env.state)
+            self.assertTrue(((codes == 0) == success).all())
+
+    def test_solution_solves_every_environment(self):
+        """
+        Testuje, že optimální řešení vyřeší všechna prostředí najednou.
+        """
+        for passenger in ["goat", "nothing", "wolf", "goat", "cabbage", "nothing", "goat"]:
+            success, _, solved = self.batch.step(
+                np.full(len(self.batch), PASSENGERS.index(passenger))
+            )
+            self.assertTrue(success.all())
+        self.assertTrue(solved.all())
+
+        self.batch.reset(np.arange(len(self.batch)) % 2 == 0)
+        self.assertEqual(int(self.batch.is_solved().sum()), len(self.batch) // 2)
+
+    def test_invalid_actions(self):
+        """
+        Testuje odmítnutí neplatných akcí.
+        """
+        with self.assertRaises(ValueError):
+            encode_actions(["dog"])
+        with self.assertRaises(ValueError):
+            self.batch.step(np.zeros(3, dtype=np.intp))
+        with self.assertRaises(ValueError):
+            self.batch.step(np.full(len(self.batch), len(PASSENGERS)))
+
+
+if __name__ == "__main__":
+    unittest.main()
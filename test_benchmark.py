@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+import io
+import json
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+import benchmark
+from agent_tools import AgentToolbox
+from puzzle_environment import PuzzleEnvironment
+from tool_logging import configure_tool_logging, stop_tool_logging, tool_logging_config
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_run_benchmarks(self):
+        """
+        Testuje, že rychlý běh vrátí statistiky pro vybrané benchmarky.
+        """
+        results = benchmark.run_benchmarks(
+            ["attempt_move", "mcp_call_tool"], repeat=1, scale=0.01
+        )
+
+        self.assertEqual(set(results), {"attempt_move", "mcp_call_tool"})
+        for stats in results.values():
+            self.assertGreater(stats["ns_per_op"], 0)
+            self.assertGreater(stats["ops_per_sec"], 0)
+
+    def test_tool_logging_is_restored(self):
+        """
+        Testuje, že benchmark po sobě vrátí nastavení hlášek nástrojů volajícího.
+        """
+        stream = io.StringIO()
+        configure_tool_logging("sync", stream=stream)
+        self.addCleanup(stop_tool_logging)
+
+        benchmark.run_benchmarks(["mcp_call_tool"], repeat=1, scale=0.01)
+
+        self.assertEqual(tool_logging_config()[:2], ("sync", stream))
+        AgentToolbox(PuzzleEnvironment()).get_current_state()
+        self.assertIn("get_current_state", stream.getvalue())
+
+    def test_all_benchmarks_registered(self):
+        """
+        Testuje, že sada pokrývá prostředí, nástroje, MCP i celou epizodu.
+        """
+        for name in (
+            "attempt_move",
+            "get_state_description",
+            "generate_tool_schema",
+            "mcp_call_tool",
+            "offline_episode",
+        ):
+            self.assertIn(name, benchmark.BENCHMARKS)
+
+    def test_compare_to_baseline(self):
+        """
+        Testuje rozpoznání regrese vůči baseline.
+        """
+        baseline = {"fast": {"ns_per_op": 100.0}, "slow": {"ns_per_op": 100.0}}
+        results = {"fast": {"ns_per_op": 110.0}, "slow": {"ns_per_op": 200.0}, "new": {"ns_per_op": 1.0}}
+
+        regressions = benchmark.compare_to_baseline(results, baseline, tolerance=0.25)
+
+        self.assertEqual([r["name"] for r in regressions], ["slow"])
+        self.assertAlmostEqual(regressions[0]["ratio"], 2.0)
+
+    def test_main_fails_on_regression(self):
+        """
+        Testuje, že CLI vrátí nenulový kód při regresi.
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "baseline.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"results": {"attempt_move": {"ns_per_op": 0.001}}}, f)
+
+            with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()) as err:
+                status = benchmark.main(
+                    ["--baseline", path, "--repeat", "1", "--scale", "0.01", "attempt_move"]
+                )
+
+        self.assertEqual(status, 1)
+        self.assertIn("REGRESSION attempt_move", err.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
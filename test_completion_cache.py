@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+import main
+from completion_cache import (
+    CachedBackend,
+    CompletionCache,
+    cache_key,
+    cached_backend_factory,
+    response_from_dict,
+    response_to_dict,
+)
+from llm_backends import OracleBackend, make_response, make_tool_call
+
+
+class CountingBackend:
+    """Falešný poskytovatel, který počítá skutečná volání."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def completion(self, model=None, messages=(), tools=None, **kwargs):
+        self.calls += 1
+        tool_call = make_tool_call(f"call_{self.calls}", "get_current_state", {})
+        return make_response(messages, tool_calls=[tool_call], model=model)
+
+    async def acompletion(self, **kwargs):
+        return self.completion(**kwargs)
+
+
+MESSAGES = [{"role": "system", "content": "prompt"}]
+
+
+class TestCompletionCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "cache.sqlite")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_key_covers_model_messages_tools_and_params(self):
+        """
+        Testuje, že klíč se mění s modelem, zprávami, nástroji i parametry.
+        """
+        base = cache_key("m", MESSAGES, [{"name": "a"}], temperature=0)
+        self.assertEqual(base, cache_key("m", list(MESSAGES), [{"name": "a"}], temperature=0))
+        self.assertNotEqual(base, cache_key("other", MESSAGES, [{"name": "a"}], temperature=0))
+        self.assertNotEqual(base, cache_key("m", MESSAGES * 2, [{"name": "a"}], temperature=0))
+        self.assertNotEqual(base, cache_key("m", MESSAGES, [{"name": "b"}], temperature=0))
+        self.assertNotEqual(base, cache_key("m", MESSAGES, [{"name": "a"}], temperature=1))
+
+    def test_response_roundtrip(self):
+        """
+        Testuje, že odpověď přežije převod na slovník a zpět i s voláním nástroje a usage.
+        """
+        tool_call = make_tool_call("call_1", "move_across_river", {"passenger": "goat"})
+        response = make_response(MESSAGES, tool_calls=[tool_call])
+        restored = response_from_dict(response_to_dict(response))
+
+        call = restored.choices[0].message.tool_calls[0]
+        self.assertEqual((call.id, call.function.name), ("call_1", "move_across_river"))
+        self.assertEqual(call.function.arguments, tool_call.function.arguments)
+        self.assertEqual(restored.usage.prompt_tokens, response.usage.prompt_tokens)
+        self.assertTrue(restored.cache_hit)
+
+    def test_hits_persist_across_instances(self):
+        """
+        Testuje, že druhý běh dostane odpověď z disku bez volání modelu.
+        """
+        provider = CountingBackend()
+        with CompletionCache(self.path) as cache:
+            backend = CachedBackend(provider, cache)
+            backend.completion(model="m", messages=MESSAGES, tools=None, temperature=0)
+            backend.completion(model="m", messages=MESSAGES, tools=None, temperature=0)
+            self.assertEqual(provider.calls, 1)
+            self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        with CompletionCache(self.path) as cache:
+            response = CachedBackend(provider, cache).completion(
+                model="m", messages=MESSAGES, tools=None, temperature=0
+            )
+            self.assertEqual(provider.calls, 1)
+            self.assertEqual(response.choices[0].message.tool_calls[0].id, "call_1")
+            self.assertEqual(cache.stats()["hit_rate"], 1.0)
+
+    def test_async_backend(self):
+        """
+        Testuje asynchronní cestu: temperature 0 se cachuje, ostatní volání ji obcházejí.
+        """
+        provider = CountingBackend()
+        with CompletionCache(":memory:") as cache:
+            backend = CachedBackend(provider, cache)
+
+            async def twice():
+                for _ in range(2):
+                    await backend.acompletion(model="m", messages=MESSAGES, tools=None, temperature=0)
+                    await backend.acompletion(model="m", messages=MESSAGES, tools=None)
+
+            asyncio.run(twice())
+        self.assertEqual(provider.calls, 3)
+        self.assertEqual(backend.bypassed, 2)
+
+    def test_sampled_responses_are_not_cached(self):
+        """
+        Testuje, že volání bez temperature 0 jde vždy na model, pokud se
+        determinismus výslovně nezapne.
+        """
+        provider = CountingBackend()
+        with CompletionCache(":memory:") as cache:
+            backend = CachedBackend(provider, cache)
+            for temperature in (None, 0.7, 0.7):
+                kwargs = {} if temperature is None else {"temperature": temperature}
+                backend.completion(model="m", messages=MESSAGES, tools=None, **kwargs)
+            self.assertEqual(provider.calls, 3)
+            self.assertEqual(backend.bypassed, 3)
+            self.assertEqual(cache.stats()["entries"], 0)
+
+            forced = CachedBackend(provider, cache, deterministic=True)
+            forced.completion(model="m", messages=MESSAGES, tools=None, temperature=0.7)
+            forced.completion(model="m", messages=MESSAGES, tools=None, temperature=0.7)
+            self.assertEqual(provider.calls, 4)
+
+        self.assertTrue(CachedBackend(OracleBackend(None), cache).deterministic)
+
+    def test_running_totals_match_table(self):
+        """
+        Testuje, že průběžný počet a velikost záznamů odpovídají tabulce
+        i po přepsání klíče, vyřazení a znovuotevření.
+        """
+        with CompletionCache(self.path, max_entries=5, max_bytes=3000) as cache:
+            for index in range(30):
+                content = "x" * (50 * (index % 7) + 1)
+                cache.put(str(index % 9), make_response(MESSAGES, content=content))
+                entries, size = cache._db.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions"
+                ).fetchone()
+                self.assertEqual((cache._entries, cache._size), (entries, size))
+                self.assertLessEqual(entries, 5)
+                self.assertLessEqual(size, 3000)
+        with CompletionCache(self.path) as cache:
+            stats = cache.stats()
+            self.assertEqual((cache._entries, cache._size), (stats["entries"], stats["bytes"]))
+
+    def test_lru_eviction_by_entries(self):
+        """
+        Testuje vyřazení nejdéle nepoužitého záznamu při překročení počtu.
+        """
+        with CompletionCache(self.path, max_entries=2) as cache:
+            response = make_response(MESSAGES, content="x")
+            with patch("completion_cache.time.time", side_effect=[1, 2, 3, 4]):
+                cache.put("a", response)
+                cache.put("b", response)
+                cache.get("a")
+                cache.put("c", response)
+
+            self.assertIsNotNone(cache.get("a"))
+            self.assertIsNone(cache.get("b"))
+            self.assertIsNotNone(cache.get("c"))
+            stats = cache.stats()
+            self.assertEqual(stats["entries"], 2)
+            self.assertEqual(stats["evictions"], 1)
+
+    def test_eviction_by_bytes(self):
+        """
+        Testuje vyřazování podle celkové velikosti odpovědí.
+        """
+        with CompletionCache(self.path, max_entries=None, max_bytes=1000) as cache:
+            for index in range(20):
+                cache.put(str(index), make_response(MESSAGES, content="x" * 100))
+            stats = cache.stats()
+        self.assertLessEqual(stats["bytes"], 1000)
+        self.assertGreater(stats["entries"], 0)
+        self.assertEqual(stats["entries"] + stats["evictions"], 20)
+
+
+@patch("builtins.print")
+class TestCachedEpisodes(unittest.TestCase):
+    def test_rerun_is_served_from_cache(self, mocked_print):
+        """
+        Testuje, že opakovaná epizoda nevolá model ani jednou.
+        """
+        backends = []
+
+        def factory(puzzle_env):
+            backends.append(OracleBackend(puzzle_env))
+            return backends[-1]
+
+        with CompletionCache(":memory:") as cache:
+            cached = cached_backend_factory(factory, cache)
+            first = main.run_episode("offline", 20, verbose=False, backend_factory=cached)
+            second = main.run_episode("offline", 20, verbose=False, backend_factory=cached)
+            stats = cache.stats()
+
+        self.assertTrue(first["solved"] and second["solved"])
+        self.assertEqual(backends[0].calls, first["steps"])
+        self.assertEqual(backends[1].calls, 0)
+        self.assertEqual(stats["hits"], second["steps"])
+        self.assertEqual(stats["misses"], first["steps"])
+
+    def test_sampled_episodes_are_independent(self, mocked_print):
+        """
+        Testuje, že epizody s nedeterministickým modelem nedostanou odpovědi
+        první epizody z cache.
+        """
+        providers = []
+
+        def factory(puzzle_env):
+            providers.append(CountingBackend())
+            return providers[-1]
+
+        with CompletionCache(":memory:") as cache:
+            cached = cached_backend_factory(factory, cache)
+            for _ in range(3):
+                main.run_episode("m", 2, verbose=False, backend_factory=cached)
+            stats = cache.stats()
+
+        self.assertEqual([provider.calls for provider in providers], [2, 2, 2])
+        self.assertEqual((stats["hits"], stats["misses"]), (0, 0))
+
+    def test_zero_temperature_episodes_hit(self, mocked_print):
+        """
+        Testuje, že epizody s temperature=0 pošlou teplotu modelu a opakované
+        běhy nedeterministického modelu dostanou odpovědi z cache.
+        """
+        providers = []
+
+        def factory(puzzle_env):
+            providers.append(CountingBackend())
+            return providers[-1]
+
+        with CompletionCache(":memory:") as cache:
+            cached = cached_backend_factory(factory, cache)
+            for _ in range(3):
+                main.run_episode("m", 2, verbose=False, backend_factory=cached, temperature=0)
+            stats = cache.stats()
+
+        self.assertEqual([provider.calls for provider in providers], [2, 0, 0])
+        self.assertEqual((stats["hits"], stats["misses"]), (4, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
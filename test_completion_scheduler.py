@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+import asyncio
+import random
+import time
+import unittest
+from unittest.mock import patch
+import main
+from completion_scheduler import (
+    CompletionScheduler,
+    CompletionTimeout,
+    ScheduledBackend,
+    TokenBucket,
+    is_retryable,
+    scheduled_backend_factory,
+)
+from llm_backends import FaultyBackend, LiteLLMBackend, OracleBackend, ProviderError, ScriptedBackend
+from puzzle_environment import PuzzleEnvironment
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _provider(plan=(), **kwargs):
+    """Lokální falešný poskytovatel: orákulum s naplánovanými poruchami."""
+    return FaultyBackend(OracleBackend(PuzzleEnvironment()), plan=plan, **kwargs)
+
+
+def _scheduler(**kwargs):
+    kwargs.setdefault("backoff_base", 0.001)
+    kwargs.setdefault("rng", random.Random(0))
+    return CompletionScheduler(**kwargs)
+
+
+REQUEST = {"model": "offline", "messages": [{"role": "system", "content": "x"}], "tools": None}
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_reserve_and_refill(self):
+        """
+        Testuje rezervaci tokenů nad kapacitu (vrací čekání) a jejich doplnění s časem.
+        """
+        clock = FakeClock()
+        bucket = TokenBucket(rate=10, capacity=2, clock=clock)
+        self.assertEqual(bucket.reserve(), 0.0)
+        self.assertEqual(bucket.reserve(), 0.0)
+        self.assertAlmostEqual(bucket.reserve(), 0.1)
+        self.assertAlmostEqual(bucket.reserve(), 0.2)
+        self.assertFalse(bucket.try_acquire())
+
+        clock.now = 1.0
+        self.assertTrue(bucket.try_acquire())
+
+    def test_invalid_rate(self):
+        """
+        Testuje odmítnutí nekladné rychlosti.
+        """
+        with self.assertRaises(ValueError):
+            TokenBucket(0)
+
+
+class TestCompletionScheduler(unittest.TestCase):
+    def test_retryable_errors(self):
+        """
+        Testuje rozlišení přechodných chyb (429, 5xx, timeout, spojení) od trvalých.
+        """
+        self.assertTrue(is_retryable(ProviderError(429)))
+        self.assertTrue(is_retryable(ProviderError(503)))
+        self.assertTrue(is_retryable(CompletionTimeout()))
+        self.assertTrue(is_retryable(ConnectionResetError()))
+        self.assertFalse(is_retryable(ProviderError(400)))
+        self.assertFalse(is_retryable(ValueError()))
+
+    def test_backoff_is_jittered_and_bounded(self):
+        """
+        Testuje, že backoff má jitter, nepřekročí maximum a respektuje retry_after.
+        """
+        scheduler = CompletionScheduler(backoff_base=1.0, backoff_max=4.0, rng=random.Random(1))
+        delays = [scheduler.backoff(attempt) for attempt in range(6) for _ in range(20)]
+        self.assertTrue(all(0 <= delay <= 4.0 for delay in delays))
+        self.assertGreater(len(set(delays)), 100)
+        self.assertEqual(scheduler.backoff(0, ProviderError(429, retry_after=7)), 7)
+
+    def test_async_retries_rate_limited_requests(self):
+        """
+        Testuje opakování po 429 až do úspěchu.
+        """
+        provider = _provider([429, 503])
+        scheduler = _scheduler()
+        response = asyncio.run(ScheduledBackend(provider, scheduler).acompletion(**REQUEST))
+
+        self.assertEqual(response.choices[0].message.tool_calls[0].function.name, "move_across_river")
+        self.assertEqual(provider.calls, 3)
+        self.assertEqual(scheduler.stats["retries"], 2)
+
+    def test_non_retryable_and_exhausted(self):
+        """
+        Testuje, že trvalá chyba se neopakuje a po vyčerpání pokusů se chyba propaguje.
+        """
+        scheduler = _scheduler(max_retries=2)
+        backend = ScheduledBackend(_provider([400]), scheduler)
+        with self.assertRaises(ProviderError) as error:
+            asyncio.run(backend.acompletion(**REQUEST))
+        self.assertEqual(error.exception.status_code, 400)
+
+        provider = _provider([429, 429, 429, 429])
+        with self.assertRaises(ProviderError):
+            ScheduledBackend(provider, scheduler).completion(**REQUEST)
+        self.assertEqual(provider.calls, 3)
+        self.assertEqual(scheduler.stats["failures"], 2)
+
+    def test_attempt_timeout(self):
+        """
+        Testuje, že zaseknutý pokus vyprší a další uspěje (async i sync).
+        """
+        for method in ("async", "sync"):
+            with self.subTest(method=method):
+                scheduler = _scheduler(timeout=0.05)
+                backend = ScheduledBackend(_provider([("delay", 1.0)]), scheduler)
+                started = time.monotonic()
+                if method == "async":
+                    asyncio.run(backend.acompletion(**REQUEST))
+                else:
+                    backend.completion(**REQUEST)
+                self.assertLess(time.monotonic() - started, 0.5)
+                self.assertEqual(scheduler.stats["timeouts"], 1)
+                scheduler.close()
+
+    def test_deadline(self):
+        """
+        Testuje, že celkový deadline ukončí opakování dřív než počet pokusů.
+        """
+        scheduler = _scheduler(timeout=0.05, deadline=0.12, max_retries=10)
+        backend = ScheduledBackend(_provider([("delay", 1.0)] * 10), scheduler)
+        started = time.monotonic()
+        with self.assertRaises(CompletionTimeout):
+            asyncio.run(backend.acompletion(**REQUEST))
+        self.assertLess(time.monotonic() - started, 0.5)
+
+    def test_hedged_request_wins(self):
+        """
+        Testuje, že pomalou odpověď předběhne záložní požadavek.
+        """
+        for method in ("async", "sync"):
+            with self.subTest(method=method):
+                scheduler = _scheduler(hedge_after=0.02)
+                provider = _provider([("delay", 0.5)])
+                backend = ScheduledBackend(provider, scheduler)
+                started = time.monotonic()
+                if method == "async":
+                    asyncio.run(backend.acompletion(**REQUEST))
+                else:
+                    backend.completion(**REQUEST)
+                self.assertLess(time.monotonic() - started, 0.3)
+                self.assertEqual(scheduler.stats["hedges"], 1)
+                self.assertEqual(scheduler.stats["hedges_won"], 1)
+                scheduler.close()
+
+    def test_stateful_backend_is_not_duplicated(self):
+        """
+        Testuje, že přehrávaný skript se nezálohuje a po vypršení neopakuje,
+        aby ho opuštěný pokus neposunul dvakrát.
+        """
+        for method in ("async", "sync"):
+            with self.subTest(method=method):
+                scheduler = _scheduler(hedge_after=0.02)
+                script = ScriptedBackend(["první", "druhá"])
+                backend = ScheduledBackend(FaultyBackend(script, plan=[("delay", 0.1)]), scheduler)
+                self.assertFalse(backend.idempotent)
+                if method == "async":
+                    response = asyncio.run(backend.acompletion(**REQUEST))
+                else:
+                    response = backend.completion(**REQUEST)
+                self.assertEqual(response.choices[0].message.content, "první")
+                self.assertEqual(script.calls, 1)
+                self.assertEqual(scheduler.stats["hedges"], 0)
+                scheduler.close()
+
+        scheduler = _scheduler(timeout=0.05)
+        script = ScriptedBackend(["první", "druhá"])
+        backend = ScheduledBackend(FaultyBackend(script, plan=[("delay", 0.2)]), scheduler)
+        with self.assertRaises(CompletionTimeout):
+            backend.completion(**REQUEST)
+        self.assertEqual(scheduler.stats["retries"], 0)
+        time.sleep(0.25)
+        # Opuštěný pokus doběhl jen jednou, skript je posunutý o jediný krok.
+        self.assertEqual(script.calls, 1)
+        scheduler.close()
+
+        self.assertTrue(ScheduledBackend(_provider(), scheduler).idempotent)
+        self.assertTrue(ScheduledBackend(LiteLLMBackend(), scheduler).idempotent)
+
+    def test_shared_rate_limit(self):
+        """
+        Testuje, že souběžné požadavky sdílí jeden limit rychlosti.
+        """
+        scheduler = _scheduler(rate_limit=50, burst=1)
+        backend = ScheduledBackend(_provider(), scheduler)
+
+        async def burst():
+            await asyncio.gather(*(backend.acompletion(**REQUEST) for _ in range(10)))
+
+        started = time.monotonic()
+        asyncio.run(burst())
+        self.assertGreaterEqual(time.monotonic() - started, 0.15)
+        self.assertGreater(scheduler.stats["rate_limit_wait"], 0)
+
+
+@patch("builtins.print")
+class TestScheduledEpisodes(unittest.TestCase):
+    def test_episodes_survive_unreliable_provider(self, mocked_print):
+        """
+        Testuje souběžné epizody proti poskytovateli s chybami a pomalými odpověďmi.
+        """
+        scheduler = _scheduler(timeout=0.2, max_retries=8, hedge_after=0.02)
+        seeds = iter(range(100))
+        factory = scheduled_backend_factory(
+            lambda puzzle_env: FaultyBackend(
+                OracleBackend(puzzle_env), failure_rate=0.2, tail_rate=0.1,
+                tail_latency=0.5, seed=next(seeds),
+            ),
+            scheduler,
+        )
+        results = asyncio.run(
+            main.run_episodes_async(5, 5, model="offline", max_steps=20, backend_factory=factory)
+        )
+
+        self.assertTrue(all(r["solved"] for r in results), results)
+        self.assertGreater(scheduler.stats["retries"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+import json
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+import main
+from conversation_context import ConversationContext, compact_state_summary
+from llm_backends import create_backend_factory
+from puzzle_environment import PuzzleEnvironment
+
+
+def _exchange(index, passenger="goat"):
+    assistant = SimpleNamespace(role="assistant", content=None, tool_calls=[f"call_{index}"])
+    tool = {
+        "tool_call_id": f"call_{index}",
+        "role": "tool",
+        "name": "move_across_river",
+        "content": json.dumps(
+            {"status": "úspěch", "popis": passenger, "novy_stav": "Levý břeh: [...]" * 5},
+            ensure_ascii=False,
+        ),
+    }
+    return assistant, [tool]
+
+
+class TestConversationContext(unittest.TestCase):
+    def test_without_window_keeps_full_history(self):
+        """
+        Testuje, že bez omezení se posílá celá historie beze změny.
+        """
+        context = ConversationContext("prompt")
+        for index in range(3):
+            context.add_exchange(*_exchange(index))
+        messages = context.messages()
+
+        self.assertEqual(len(messages), 7)
+        self.assertEqual(messages[0], {"role": "system", "content": "prompt"})
+        self.assertIn("novy_stav", messages[2]["content"])
+        self.assertEqual(context.saved_tokens, 0)
+
+    def test_window_keeps_last_exchanges(self):
+        """
+        Testuje ponechání posledních K výměn, shrnutí stavu a úsporu tokenů.
+        """
+        context = ConversationContext("prompt", max_exchanges=2, state_summary=lambda: "STAV")
+        for index in range(5):
+            context.add_exchange(*_exchange(index))
+        messages = context.messages()
+
+        self.assertEqual(len(messages), 6)
+        self.assertEqual(messages[1]["role"], "system")
+        self.assertIn("STAV", messages[1]["content"])
+        self.assertIn("(3)", messages[1]["content"])
+        # Volání nástroje a jeho výsledek zůstávají pohromadě.
+        self.assertEqual(messages[2].tool_calls, ["call_3"])
+        self.assertEqual(messages[3]["tool_call_id"], "call_3")
+        # Plný stav nese jen poslední výměna.
+        self.assertNotIn("novy_stav", messages[3]["content"])
+        self.assertIn("novy_stav", messages[5]["content"])
+
+        stats = context.stats()
+        self.assertEqual(stats["context_dropped_exchanges"], 3)
+        self.assertGreater(stats["context_tokens_saved"], 0)
+        self.assertEqual(
+            stats["context_full_tokens"] - stats["context_sent_tokens"],
+            stats["context_tokens_saved"],
+        )
+
+    def test_invalid_window(self):
+        """
+        Testuje odmítnutí okna bez jediné výměny.
+        """
+        with self.assertRaises(ValueError):
+            ConversationContext("prompt", max_exchanges=0)
+
+    def test_compact_state_summary(self):
+        """
+        Testuje jednořádkové shrnutí stavu pro zkrácenou konverzaci.
+        """
+        env = PuzzleEnvironment()
+        env.attempt_move("goat")
+        self.assertEqual(
+            compact_state_summary(env),
+            "Aktuální stav: levý břeh [cabbage, wolf], pravý břeh [goat], loďka vpravo.",
+        )
+
+
+@patch("builtins.print")
+class TestCompactedEpisode(unittest.TestCase):
+    def test_oracle_episode_with_window(self, mocked_print):
+        """
+        Testuje, že agent s omezeným kontextem hádanku vyřeší a ušetří tokeny.
+        """
+        factory = create_backend_factory("oracle")
+        full = main.run_episode("offline", 20, verbose=False, backend_factory=factory)
+        compact = main.run_episode(
+            "offline", 20, verbose=False, backend_factory=factory, context_window=2
+        )
+
+        self.assertTrue(compact["solved"])
+        self.assertEqual(compact["steps"], full["steps"])
+        self.assertEqual(full["context_tokens_saved"], 0)
+        self.assertGreater(compact["context_tokens_saved"], 0)
+        self.assertLess(compact["prompt_tokens"], full["prompt_tokens"])
+
+
+if __name__ == "__main__":
+    unittest.main()
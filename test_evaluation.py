@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+import json
+import os
+import tempfile
+import unittest
+import evaluation
+
+
+class TestEvaluation(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.tmp.name, "results.jsonl")
+        self.jobs = evaluation.build_jobs(
+            ["offline"], {"default": "Vyřeš hádanku."}, [5, 20], [False, True], 2
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _records(self):
+        with open(self.output, encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def test_build_jobs(self):
+        """
+        Testuje rozvinutí mřížky konfigurací na epizody.
+        """
+        self.assertEqual(len(self.jobs), 8)
+        self.assertEqual(len({job["config_id"] for job in self.jobs}), 4)
+
+    def test_sweep_streams_results(self):
+        """
+        Testuje, že každá epizoda skončí jako jeden řádek JSONL s výsledky.
+        """
+        finished = evaluation.run_sweep(self.jobs, self.output, workers=2, backend="oracle")
+        records = self._records()
+
+        self.assertEqual(finished, 8)
+        self.assertEqual(len(records), 8)
+        for record in records:
+            self.assertIsNone(record["error"])
+            self.assertEqual(record["solved"], record["max_steps"] == 20)
+            self.assertGreater(record["prompt_tokens"], 0)
+
+    def test_sweep_resumes(self):
+        """
+        Testuje, že opakované spuštění doběhne jen chybějící epizody
+        a ignoruje neúplný řádek po pádu.
+        """
+        evaluation.run_sweep(self.jobs[:3], self.output, workers=1, backend="oracle")
+        with open(self.output, "a", encoding="utf-8") as f:
+            f.write('{"config_id": "offline|def')
+
+        finished = evaluation.run_sweep(self.jobs, self.output, workers=2, backend="oracle")
+
+        self.assertEqual(finished, 5)
+        self.assertEqual(len(evaluation.load_completed(self.output)), 8)
+
+    def test_sweep_writes_results_store(self):
+        """
+        Testuje zápis epizod i s logy tahů do sloupcového úložiště.
+        """
+        from move_log import MoveLog
+        from puzzle_environment import GOAL_BITS
+        from results_store import ResultsWriter, grouped_stats, read_results
+
+        store_dir = os.path.join(self.tmp.name, "store")
+        with ResultsWriter(store_dir, format="columns") as store:
+            evaluation.run_sweep(self.jobs, self.output, workers=2, backend="oracle", store=store)
+
+        stats = grouped_stats(store_dir, by=["model"])
+        self.assertEqual(stats[0]["episodes"], 8)
+        self.assertEqual(stats[0]["solved"], 4)
+        table = read_results(store_dir, ["solved", "move_log"])
+        if not isinstance(table, dict):
+            # S pyarrow se vrací pyarrow.Table.
+            table = table.to_pydict()
+        for solved, data in zip(table["solved"], table["move_log"]):
+            self.assertEqual(MoveLog.from_bytes(data).bits == GOAL_BITS, solved)
+
+    def test_sweep_retries_errored_episodes(self):
+        """
+        Testuje, že obnovení zopakuje epizody zapsané s chybou a jejich
+        původní záznamy odstraní.
+        """
+        evaluation.run_sweep(self.jobs[:3], self.output, workers=1, backend="unknown")
+        self.assertTrue(all(record["error"] for record in self._records()))
+        self.assertEqual(evaluation.load_completed(self.output), set())
+
+        finished = evaluation.run_sweep(self.jobs, self.output, workers=2, backend="oracle")
+
+        records = self._records()
+        self.assertEqual(finished, 8)
+        self.assertEqual(len(records), 8)
+        self.assertTrue(all(record["error"] is None for record in records))
+        self.assertEqual(len(evaluation.load_completed(self.output)), 8)
+
+    def test_worker_errors_are_recorded(self):
+        """
+        Testuje, že chyba v epizodě se zapíše jako záznam s chybou.
+        """
+        record = evaluation.run_job(self.jobs[0], backend="unknown")
+
+        self.assertFalse(record["solved"])
+        self.assertIn("ValueError", record["error"])
+
+
+if __name__ == "__main__":
+    unittest.main()
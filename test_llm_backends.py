@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+import asyncio
+import json
+import time
+import unittest
+from unittest.mock import patch
+import main
+from llm_backends import (
+    OfflineBackend,
+    OracleBackend,
+    ScriptedBackend,
+    create_backend_factory,
+    parse_transcript,
+)
+from puzzle_environment import PuzzleEnvironment
+
+
+class TestLLMBackends(unittest.TestCase):
+    def test_parse_transcript(self):
+        """
+        Testuje načtení kroků agenta z log.txt.
+        """
+        steps = parse_transcript("log.txt")
+
+        self.assertEqual(len(steps), 10)
+        self.assertEqual(steps[0], [("get_current_state", {})])
+        self.assertEqual(steps[1], [("move_across_river", {"passenger": "goat"})])
+        self.assertEqual(steps[8], [("check_if_solved", {})])
+        self.assertIsInstance(steps[9], str)
+
+    def test_oracle_emits_optimal_move(self):
+        """
+        Testuje, že orákulum navrhne optimální tah a uvede spotřebu tokenů.
+        """
+        backend = OracleBackend(PuzzleEnvironment())
+        response = backend.completion(model="offline", messages=[{"role": "system", "content": "x"}])
+
+        tool_call = response.choices[0].message.tool_calls[0]
+        self.assertEqual(tool_call.function.name, "move_across_river")
+        self.assertEqual(json.loads(tool_call.function.arguments), {"passenger": "goat"})
+        self.assertGreater(response.usage.total_tokens, 0)
+
+    def test_scripted_backend_latency(self):
+        """
+        Testuje umělou latenci synchronního i asynchronního volání.
+        """
+        backend = ScriptedBackend(["Hotovo."], latency=0.02)
+
+        started = time.perf_counter()
+        backend.completion(messages=[])
+        self.assertGreaterEqual(time.perf_counter() - started, 0.02)
+
+        response = asyncio.run(backend.acompletion(messages=[]))
+        self.assertEqual(response.choices[0].message.content, "Skript je vyčerpán.")
+
+    def test_offline_backend_is_abstract(self):
+        """
+        Testuje, že základ offline backendů nejde vytvořit bez next_response.
+        """
+        with self.assertRaises(TypeError):
+            OfflineBackend()
+
+    def test_unknown_backend(self):
+        """
+        Testuje odmítnutí neznámého backendu.
+        """
+        with self.assertRaises(ValueError):
+            create_backend_factory("gpt-offline")
+
+
+@patch("builtins.print")
+class TestOfflineEpisodes(unittest.TestCase):
+    def test_oracle_episode(self, mocked_print):
+        """
+        Testuje celou epizodu s orákulem bez sítě.
+        """
+        result = main.run_episode(
+            "offline", 20, backend_factory=create_backend_factory("oracle")
+        )
+        self.assertTrue(result["solved"])
+        self.assertEqual(result["steps"], 9)
+
+    def test_oracle_batch_episode(self, mocked_print):
+        """
+        Testuje, že s move_sequence stačí na vyřešení jedno volání tahu.
+        """
+        for use_mcp in (False, True):
+            with self.subTest(use_mcp=use_mcp):
+                result = main.run_episode(
+                    "offline", 20, use_mcp=use_mcp,
+                    backend_factory=create_backend_factory("oracle-batch"),
+                )
+                self.assertTrue(result["solved"])
+                self.assertEqual(result["steps"], 3)
+                self.assertEqual(result["invalid_moves"], 0)
+
+    def test_replay_episodes_async(self, mocked_print):
+        """
+        Testuje souběžné přehrání záznamu z log.txt přes MCP i přímé nástroje.
+        """
+        factory = create_backend_factory("replay", transcript_path="log.txt")
+        for use_mcp in (False, True):
+            with self.subTest(use_mcp=use_mcp):
+                results = asyncio.run(
+                    main.run_episodes_async(
+                        5, 5, model="offline", max_steps=20,
+                        use_mcp=use_mcp, backend_factory=factory,
+                    )
+                )
+                self.assertTrue(all(r["solved"] for r in results))
+                self.assertTrue(all(r["steps"] == 10 for r in results))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,369 @@
+#!/usr/bin/env python
+import asyncio
+import copy
+import json
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+import main
+import puzzle_solver
+from llm_backends import OracleBackend
+from move_log import MoveLog
+from puzzle_environment import GOAL_BITS
+from speculation import MoveSpeculator
+
+
+def _response(tool_name=None, arguments=None, content=None, call_id="call_0"):
+    tool_calls = None
+    if tool_name is not None:
+        tool_calls = [
+            SimpleNamespace(
+                id=call_id,
+                function=SimpleNamespace(
+                    name=tool_name, arguments=json.dumps(arguments or {})
+                ),
+            )
+        ]
+    message = SimpleNamespace(role="assistant", content=content, tool_calls=tool_calls)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def _scripted_completion(moves, prefix=()):
+    """
+    Vrátí funkci, která podle počtu odpovědí nástrojů v konverzaci přehraje
+    volání z `prefix` (dvojice jméno nástroje, argumenty), zadané tahy,
+    ověří vyřešení a ukončí práci.
+    """
+    script = list(prefix) + [("move_across_river", {"passenger": move}) for move in moves]
+    script.append(("check_if_solved", {}))
+
+    def fake_completion(model, messages, tools, tool_choice):
+        done = sum(1 for m in messages if isinstance(m, dict) and m["role"] == "tool")
+        if done < len(script):
+            name, arguments = script[done]
+            return _response(name, arguments, call_id=f"call_{done}")
+        return _response(content="Hotovo.")
+
+    return fake_completion
+
+
+@patch("builtins.print")
+class TestAgentLoop(unittest.TestCase):
+    def test_run_episode_solves_with_optimal_moves(self, mocked_print):
+        """
+        Testuje synchronní smyčku se skriptovaným modelem.
+        """
+        fake = _scripted_completion(puzzle_solver.shortest_path())
+        with patch("main.completion", side_effect=fake):
+            result = main.run_episode("fake-model", 20)
+
+        self.assertTrue(result["solved"])
+        self.assertTrue(result["finished"])
+        self.assertEqual(result["steps"], 9)
+        self.assertEqual(result["tool_calls"], 8)
+        self.assertEqual(result["invalid_moves"], 0)
+
+    def test_run_episode_counts_invalid_moves(self, mocked_print):
+        """
+        Testuje počítání odmítnutých tahů a vyčerpání kroků.
+        """
+        fake = _scripted_completion(["wolf", "wolf", "wolf"])
+        with patch("main.completion", side_effect=fake):
+            result = main.run_episode("fake-model", 2, verbose=False)
+
+        self.assertFalse(result["solved"])
+        self.assertFalse(result["finished"])
+        self.assertEqual(result["invalid_moves"], 2)
+
+    def test_run_episode_speculates_moves(self, mocked_print):
+        """
+        Testuje předpočet tahů a měření shody agenta s optimálním tahem.
+        """
+        moves = ["goat", "goat"] + puzzle_solver.shortest_path()
+        fake = _scripted_completion(moves)
+        with patch("main.completion", side_effect=fake):
+            result = main.run_episode("fake-model", 20, verbose=False, speculate=True)
+
+        self.assertTrue(result["solved"])
+        self.assertEqual(result["speculated_moves"], 9)
+        self.assertEqual(result["speculation_served"], 9)
+        # Vrácení kozy zpět na levý břeh optimální není.
+        self.assertEqual(result["optimal_choices"], 8)
+
+        summary = main.summarize_results([result])
+        self.assertAlmostEqual(summary["optimal_choice_rate"], 8 / 9)
+
+    def test_speculation_overlaps_completion(self, mocked_print):
+        """
+        Testuje, že předpočet běží souběžně s voláním modelu: předpočet čeká,
+        až volání začne, takže při postupném běhu by vypršel.
+        """
+        completion_started = threading.Event()
+        overlapped = []
+        prepare = MoveSpeculator.prepare
+
+        def waiting_prepare(speculator):
+            overlapped.append(completion_started.wait(timeout=5))
+            prepare(speculator)
+
+        fake = _scripted_completion(puzzle_solver.shortest_path())
+
+        def started_completion(**kwargs):
+            completion_started.set()
+            return fake(**kwargs)
+
+        with patch("main.completion", side_effect=started_completion), patch.object(
+            MoveSpeculator, "prepare", waiting_prepare
+        ):
+            result = main.run_episode("fake-model", 20, verbose=False, speculate=True, trace=True)
+
+        self.assertTrue(result["solved"])
+        self.assertTrue(overlapped and all(overlapped))
+        self.assertEqual(result["speculation_hits"], 7)
+        self.assertEqual(result["trace"]["spans"]["speculate"]["count"], result["steps"])
+
+    def test_speculation_over_mcp_only_evaluates(self, mocked_print):
+        """
+        Testuje, že u MCP tahy provádí server a předpočet jen měří shodu.
+        """
+        fake = _scripted_completion(puzzle_solver.shortest_path())
+        with patch("main.completion", side_effect=fake):
+            result = main.run_episode(
+                "fake-model", 20, use_mcp=True, mcp_transport="memory",
+                verbose=False, speculate=True,
+            )
+
+        self.assertTrue(result["solved"])
+        self.assertEqual(result["speculation_served"], 0)
+        self.assertEqual(result["optimal_choice_rate"], 1.0)
+
+    def test_parallel_tool_calls_keep_order(self, mocked_print):
+        """
+        Testuje více volání nástrojů v jedné odpovědi: čtení souběžně,
+        tahy v pořadí a zprávy nástrojů v pořadí tool_call_id.
+        """
+        names_and_args = [("get_current_state", {}), ("check_if_solved", {})]
+        names_and_args += [("move_across_river", {"passenger": p}) for p in puzzle_solver.shortest_path()]
+        names_and_args += [("get_current_state", {}), ("check_if_solved", {})]
+        tool_calls = [
+            SimpleNamespace(
+                id=f"call_{index}",
+                function=SimpleNamespace(name=name, arguments=json.dumps(arguments)),
+            )
+            for index, (name, arguments) in enumerate(names_and_args)
+        ]
+        turns = [
+            SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(
+                role="assistant", content=None, tool_calls=tool_calls))]),
+            _response(content="Hotovo."),
+        ]
+        with patch("main.completion", side_effect=turns) as mocked_completion:
+            result = main.run_episode("fake-model", 5, verbose=False, tool_workers=4)
+
+        self.assertTrue(result["solved"])
+        self.assertEqual(result["tool_calls"], len(tool_calls))
+        self.assertEqual(result["invalid_moves"], 0)
+        messages = mocked_completion.call_args.kwargs["messages"]
+        tool_messages = [m for m in messages if isinstance(m, dict) and m["role"] == "tool"]
+        self.assertEqual(
+            [m["tool_call_id"] for m in tool_messages], [call.id for call in tool_calls]
+        )
+        self.assertIn("Levý břeh: [cabbage, goat, wolf]", tool_messages[0]["content"])
+        self.assertIn("Pravý břeh: [cabbage, goat, wolf]", tool_messages[-2]["content"])
+        self.assertIn("Potvrzeno", tool_messages[-1]["content"])
+
+    def test_run_episode_records_moves(self, mocked_print):
+        """
+        Testuje, že epizoda se záznamem tahů vrátí log, ze kterého jde stav zrekonstruovat.
+        """
+        moves = ["wolf"] + puzzle_solver.shortest_path()
+        fake = _scripted_completion(moves)
+        with patch("main.completion", side_effect=fake):
+            result = main.run_episode("fake-model", 20, verbose=False, record_moves=True, speculate=True)
+
+        log = MoveLog.from_bytes(result["move_log"])
+        self.assertEqual([event.passenger for event in log], moves)
+        self.assertEqual(sum(event.code != 0 for event in log), result["invalid_moves"])
+        self.assertEqual(log.bits, GOAL_BITS)
+        # Obsloužené tahy jdou přes attempt_move prostředí, takže je log zachytí.
+        self.assertEqual(result["speculation_served"], len(moves))
+
+    def test_run_episode_over_memory_mcp(self, mocked_print):
+        """
+        Testuje epizodu, jejíž nástroje jdou přes MCP protokol v rámci procesu.
+        """
+        fake = _scripted_completion(puzzle_solver.shortest_path())
+        with patch("main.completion", side_effect=fake):
+            result = main.run_episode(
+                "fake-model", 20, use_mcp=True, mcp_transport="memory", verbose=False
+            )
+
+        self.assertTrue(result["solved"])
+        self.assertEqual(result["tool_calls"], 8)
+        self.assertEqual(result["invalid_moves"], 0)
+
+    def test_mcp_reset_is_followed(self, mocked_print):
+        """
+        Testuje, že harness po reset_puzzle čte nové prostředí serveru
+        (vyhodnocení, spekulace i orákulum), ne to původní.
+        """
+        prefix = [("move_across_river", {"passenger": "goat"}), ("reset_puzzle", {})]
+        fake = _scripted_completion(puzzle_solver.shortest_path(), prefix)
+        for transport in ("direct", "memory"):
+            with self.subTest(transport=transport):
+                with patch("main.completion", side_effect=fake):
+                    result = main.run_episode(
+                        "fake-model", 20, use_mcp=True, mcp_transport=transport,
+                        verbose=False, speculate=True,
+                    )
+                self.assertTrue(result["solved"])
+                # Po resetu jsou všechny tahy nejkratší cesty opět optimální.
+                self.assertEqual(result["optimal_choices"], 8)
+
+        schemas, tools, puzzle_env, close = main.open_tool_interface(use_mcp=True)
+        oracle = OracleBackend(puzzle_env)
+        tools["move_across_river"](passenger="goat")
+        tools["reset_puzzle"]()
+        tool_call = oracle.next_response([]).choices[0].message.tool_calls[0]
+        self.assertEqual(json.loads(tool_call.function.arguments), {"passenger": "goat"})
+        self.assertNotIn("goat", copy.deepcopy(puzzle_env).state["right_bank"])
+        close()
+
+    def test_memory_tool_interface(self, mocked_print):
+        """
+        Testuje, že paměťové rozhraní skrývá session_id a sdílí stav s prostředím.
+        """
+        schemas, tools, puzzle_env, close = main.open_tool_interface(
+            use_mcp=True, mcp_transport="memory"
+        )
+        try:
+            for schema in schemas:
+                self.assertNotIn("session_id", schema["function"]["parameters"]["properties"])
+            tools["move_across_river"](passenger="goat")
+            self.assertIn("goat", puzzle_env.state["right_bank"])
+        finally:
+            close()
+
+    def test_unknown_mcp_transport(self, mocked_print):
+        """
+        Testuje odmítnutí neznámého transportu.
+        """
+        with self.assertRaises(ValueError):
+            main.create_tool_interface(use_mcp=True, mcp_transport="pigeon")
+
+    def test_run_episodes_async_runs_concurrently(self, mocked_print):
+        """
+        Testuje, že epizody běží souběžně a každá má vlastní prostředí.
+        """
+        fake = _scripted_completion(puzzle_solver.shortest_path())
+        active = 0
+        peak = 0
+
+        async def fake_acompletion(**kwargs):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.001)
+            active -= 1
+            return fake(**kwargs)
+
+        with patch("main.acompletion", side_effect=fake_acompletion):
+            results = asyncio.run(
+                main.run_episodes_async(12, 4, model="fake-model", max_steps=20)
+            )
+
+        self.assertEqual([r["episode"] for r in results], list(range(12)))
+        self.assertTrue(all(r["solved"] for r in results))
+        self.assertEqual(peak, 4)
+
+        summary = main.summarize_results(results)
+        self.assertEqual(summary["episodes"], 12)
+        self.assertEqual(summary["solve_rate"], 1.0)
+
+    def test_async_memory_mcp_does_not_block_loop(self, mocked_print):
+        """
+        Testuje, že asynchronní epizody volají paměťový MCP server korutinami
+        v běžícím loopu, bez blokujícího klienta.
+        """
+        fake = _scripted_completion(puzzle_solver.shortest_path(), [("reset_puzzle", {})])
+
+        async def fake_acompletion(**kwargs):
+            await asyncio.sleep(0)
+            return fake(**kwargs)
+
+        with patch("main.acompletion", side_effect=fake_acompletion), patch(
+            "main.BlockingMCPClient", side_effect=AssertionError("blocking client")
+        ):
+            results = asyncio.run(
+                main.run_episodes_async(
+                    3, 3, model="fake-model", max_steps=20, use_mcp=True, mcp_transport="memory"
+                )
+            )
+
+        self.assertTrue(all(r["solved"] and r["error"] is None for r in results))
+        self.assertEqual([r["tool_calls"] for r in results], [9, 9, 9])
+
+    def test_async_tool_workers_gather_pure_calls(self, mocked_print):
+        """
+        Testuje, že asynchronní epizoda s tool_workers > 1 čeká čtení jedné
+        odpovědi souběžně a vnořené spany mají rodiče ve svém volání.
+        """
+        names_and_args = [("get_current_state", {}), ("check_if_solved", {})]
+        names_and_args += [("move_across_river", {"passenger": p}) for p in puzzle_solver.shortest_path()]
+        tool_calls = [
+            SimpleNamespace(
+                id=f"call_{index}",
+                function=SimpleNamespace(name=name, arguments=json.dumps(arguments)),
+            )
+            for index, (name, arguments) in enumerate(names_and_args)
+        ]
+        turns = [
+            SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(
+                role="assistant", content=None, tool_calls=tool_calls))]),
+            _response(content="Hotovo."),
+        ]
+        spans = []
+        exporter = SimpleNamespace(export=spans.append)
+
+        with patch("main.acompletion", side_effect=turns) as mocked_completion:
+            result = asyncio.run(main.run_episode_async(
+                "fake-model", 5, use_mcp=True, mcp_transport="memory",
+                trace_exporter=exporter, tool_workers=2,
+            ))
+
+        self.assertIsNone(result["error"])
+        self.assertTrue(result["solved"])
+        messages = mocked_completion.call_args.kwargs["messages"]
+        tool_messages = [m for m in messages if isinstance(m, dict) and m["role"] == "tool"]
+        self.assertEqual(
+            [m["tool_call_id"] for m in tool_messages], [call.id for call in tool_calls]
+        )
+        self.assertIn("Levý břeh: [cabbage, goat, wolf]", tool_messages[0]["content"])
+
+        dispatches = {
+            span.attributes["gen_ai.tool.call.id"]: span
+            for span in spans if span.name == "dispatch"
+        }
+        first, second = dispatches["call_0"], dispatches["call_1"]
+        self.assertLess(second.start_time_unix_nano, first.end_time_unix_nano)
+        dispatch_ids = {span.span_id for span in dispatches.values()}
+        nested = [span for span in spans if span.name in ("parse", "tool")]
+        self.assertEqual(len(nested), 2 * len(tool_calls))
+        self.assertTrue(all(span.parent_span_id in dispatch_ids for span in nested))
+        step_ids = {span.span_id for span in spans if span.name == "step"}
+        self.assertTrue(all(span.parent_span_id in step_ids for span in dispatches.values()))
+
+    def test_async_episode_records_errors(self, mocked_print):
+        """
+        Testuje, že chyba modelu ukončí jen danou epizodu.
+        """
+        with patch("main.acompletion", side_effect=RuntimeError("boom")):
+            result = asyncio.run(main.run_episode_async("fake-model", 5))
+
+        self.assertEqual(result["error"], "RuntimeError: boom")
+        self.assertFalse(result["solved"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+import json
+import unittest
+from mcp_client import BlockingMCPClient, http_session, stdio_session
+from mcp_server import HTTPServerThread, PuzzleSessionTable
+
+
+class TestHTTPTransport(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.sessions = PuzzleSessionTable()
+        cls.server = HTTPServerThread(sessions=cls.sessions).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def _client(self):
+        return BlockingMCPClient(lambda: http_session(self.server.url))
+
+    def test_list_tools(self):
+        """
+        Testuje výpis nástrojů přes HTTP.
+        """
+        with self._client() as client:
+            names = {tool["name"] for tool in client.list_tools()}
+        self.assertEqual(
+            names,
+            {"get_current_state", "move_across_river", "move_sequence", "check_if_solved", "reset_puzzle"},
+        )
+
+    def test_connections_share_server_not_state(self):
+        """
+        Testuje, že jeden server obslouží více spojení s oddělenými hádankami.
+        """
+        with self._client() as first, self._client() as second:
+            result = first.call_tool("move_across_river", {"passenger": "goat"})
+            self.assertEqual(json.loads(result["content"][0]["text"])["status"], "úspěch")
+
+            state = second.call_tool("get_current_state", {})["content"][0]["text"]
+            self.assertIn("Levý břeh: [cabbage, goat, wolf]", state)
+
+            # Opakovaná volání jdou přes stejné perzistentní spojení.
+            for _ in range(3):
+                state = first.call_tool("get_current_state", {})["content"][0]["text"]
+            self.assertIn("Pravý břeh: [goat]", state)
+
+    def test_explicit_session_id(self):
+        """
+        Testuje sdílení relace mezi spojeními přes session_id.
+        """
+        with self._client() as first:
+            first.call_tool("move_across_river", {"passenger": "goat", "session_id": "shared"})
+        with self._client() as second:
+            state = second.call_tool("get_current_state", {"session_id": "shared"})
+
+        self.assertIn("Pravý břeh: [goat]", state["content"][0]["text"])
+        self.assertIn("shared", self.sessions)
+
+
+class TestStdioTransport(unittest.TestCase):
+    def test_stdio_roundtrip(self):
+        """
+        Testuje volání nástroje přes server spuštěný jako podproces.
+        """
+        with BlockingMCPClient(stdio_session) as client:
+            result = client.call_tool("move_across_river", {"passenger": "goat"})
+        self.assertEqual(json.loads(result["content"][0]["text"])["status"], "úspěch")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,16 +1,37 @@
 #!/usr/bin/env python
+import asyncio
 import unittest
 import json
-from unittest.mock import patch
-from mcp_server import PuzzleMCPServer, create_mcp_server
+from mcp.shared.memory import create_connected_server_and_client_session
+from agent_tools import AgentToolbox
+from mcp_server import (
+    PuzzleMCPServer,
+    PuzzleSessionTable,
+    create_mcp_server,
+    mcp_tool,
+    setup_mcp_server,
+)
+from puzzle_environment import PuzzleEnvironment
+
+
+class CountingMCPServer(PuzzleMCPServer):
+    """Server s nástrojem navíc - registrace bez zásahu do dispatcheru."""
+
+    @mcp_tool(
+        "count_moves",
+        "Vrátí zadaný počet opakovaný textem.",
+        properties={"times": {"type": "integer"}, "label": {"type": "string"}},
+        required=("times",),
+    )
+    def _count_moves(self, times, label="tah"):
+        return " ".join([label] * times)
 
 
-@patch("builtins.print")
 class TestMCPServer(unittest.TestCase):
     def setUp(self):
         self.server = create_mcp_server()
 
-    def test_server_creation(self, mocked_print):
+    def test_server_creation(self):
         """
         Testuje vytvoření MCP serveru a základní inicializaci.
         """
@@ -18,16 +39,16 @@ class TestMCPServer(unittest.TestCase):
         self.assertIsNotNone(self.server.puzzle_env)
         self.assertIsInstance(self.server._tools, dict)
 
-    def test_get_tools(self, mocked_print):
+    def test_get_tools(self):
         """
         Testuje získání seznamu dostupných nástrojů.
         """
         tools = self.server.get_tools()
         self.assertIsInstance(tools, list)
-        self.assertEqual(len(tools), 4)
+        self.assertEqual(len(tools), 5)
         
         tool_names = [tool['name'] for tool in tools]
-        expected_tools = ["get_current_state", "move_across_river", "check_if_solved", "reset_puzzle"]
+        expected_tools = ["get_current_state", "move_across_river", "move_sequence", "check_if_solved", "reset_puzzle"]
         
         for expected_tool in expected_tools:
             self.assertIn(expected_tool, tool_names)
@@ -38,7 +59,7 @@ class TestMCPServer(unittest.TestCase):
         self.assertIn('description', first_tool)
         self.assertIn('inputSchema', first_tool)
 
-    def test_get_current_state_tool(self, mocked_print):
+    def test_get_current_state_tool(self):
         """
         Testuje nástroj pro získání aktuálního stavu.
         """
@@ -55,7 +76,7 @@ class TestMCPServer(unittest.TestCase):
         self.assertIn('Pravý břeh', text)
         self.assertIn('Loďka', text)
 
-    def test_move_across_river_success(self, mocked_print):
+    def test_move_across_river_success(self):
         """
         Testuje úspěšný přesun přes řeku.
         """
@@ -72,7 +93,7 @@ class TestMCPServer(unittest.TestCase):
         self.assertIn('popis', response_data)
         self.assertIn('novy_stav', response_data)
 
-    def test_move_across_river_invalid_passenger(self, mocked_print):
+    def test_move_across_river_invalid_passenger(self):
         """
         Testuje přesun s neplatným pasažérem.
         """
@@ -84,7 +105,7 @@ class TestMCPServer(unittest.TestCase):
         error_text = result['content'][0]['text']
         self.assertIn('Invalid passenger', error_text)
 
-    def test_move_across_river_missing_passenger(self, mocked_print):
+    def test_move_across_river_missing_passenger(self):
         """
         Testuje přesun bez zadání pasažéra.
         """
@@ -96,7 +117,7 @@ class TestMCPServer(unittest.TestCase):
         error_text = result['content'][0]['text']
         self.assertIn("Parameter 'passenger' is required", error_text)
 
-    def test_check_if_solved_not_solved(self, mocked_print):
+    def test_check_if_solved_not_solved(self):
         """
         Testuje kontrolu vyřešení v nevyřešeném stavu.
         """
@@ -109,7 +130,7 @@ class TestMCPServer(unittest.TestCase):
         self.assertIn('Negativní', text)
         self.assertIn('není vyřešena', text)
 
-    def test_check_if_solved_when_solved(self, mocked_print):
+    def test_check_if_solved_when_solved(self):
         """
         Testuje kontrolu vyřešení ve vyřešeném stavu.
         """
@@ -129,7 +150,7 @@ class TestMCPServer(unittest.TestCase):
         self.assertIn('Potvrzeno', text)
         self.assertIn('skutečně vyřešena', text)
 
-    def test_reset_puzzle(self, mocked_print):
+    def test_reset_puzzle(self):
         """
         Testuje resetování hádanky.
         """
@@ -151,7 +172,46 @@ class TestMCPServer(unittest.TestCase):
         self.assertEqual(self.server.puzzle_env.state["right_bank"], set())
         self.assertEqual(self.server.puzzle_env.state["boat_location"], "left")
 
-    def test_unknown_tool(self, mocked_print):
+    def test_move_sequence(self):
+        """
+        Testuje provedení několika tahů jedním voláním.
+        """
+        result = self.server.call_tool(
+            "move_sequence", {"passengers": ["goat", "nothing", "Wolf"]}
+        )
+        self.assertNotIn('isError', result)
+
+        response_data = json.loads(result['content'][0]['text'])
+        self.assertEqual(response_data['status'], 'úspěch')
+        self.assertEqual(response_data['provedeno'], 3)
+        self.assertEqual([step['pasazer'] for step in response_data['kroky']], ["goat", "nothing", "wolf"])
+        self.assertEqual(self.server.puzzle_env.state["right_bank"], {"goat", "wolf"})
+
+    def test_move_sequence_atomic_rollback(self):
+        """
+        Testuje, že atomická posloupnost s chybou nezmění stav.
+        """
+        result = self.server.call_tool(
+            "move_sequence", {"passengers": ["goat", "wolf", "nothing"], "atomic": True}
+        )
+        response_data = json.loads(result['content'][0]['text'])
+
+        self.assertEqual(response_data['status'], 'chyba')
+        self.assertTrue(response_data['vraceno_zpet'])
+        self.assertEqual(response_data['provedeno'], 0)
+        self.assertEqual(response_data['neprovedeno'], ["nothing"])
+        self.assertEqual(self.server.puzzle_env.state["left_bank"], {"wolf", "goat", "cabbage"})
+
+    def test_move_sequence_invalid_arguments(self):
+        """
+        Testuje odmítnutí neplatné posloupnosti ještě před prvním tahem.
+        """
+        for arguments in ({"passengers": "goat"}, {"passengers": ["goat", "dragon"]}, {}):
+            result = self.server.call_tool("move_sequence", arguments)
+            self.assertTrue(result.get('isError', False))
+        self.assertEqual(self.server.puzzle_env.state["right_bank"], set())
+
+    def test_unknown_tool(self):
         """
         Testuje volání neexistujícího nástroje.
         """
@@ -163,7 +223,7 @@ class TestMCPServer(unittest.TestCase):
         error_text = result['content'][0]['text']
         self.assertIn("Unknown tool 'unknown_tool'", error_text)
 
-    def test_tool_schemas(self, mocked_print):
+    def test_tool_schemas(self):
         """
         Testuje správnost schémat nástrojů.
         """
@@ -189,7 +249,7 @@ class TestMCPServer(unittest.TestCase):
             {"wolf", "goat", "cabbage", "nothing"}
         )
 
-    def test_multiple_moves_sequence(self, mocked_print):
+    def test_multiple_moves_sequence(self):
         """
         Testuje sekvenci několika tahů pro ověření správné funkce.
         """
@@ -212,6 +272,179 @@ class TestMCPServer(unittest.TestCase):
         # Vlk by měl být na pravé straně, koza na levé - ověříme, že se stav změnil
         self.assertIn('wolf', state_text.lower())
 
+    def test_move_responses_match_toolbox(self):
+        """
+        Testuje, že MCP i přímý nástroj vracejí pro tah stejnou odpověď.
+        """
+        toolbox = AgentToolbox(PuzzleEnvironment())
+        for passenger in ["wolf", "goat", "goat", "nothing", "Cabbage"]:
+            result = self.server.call_tool("move_across_river", {"passenger": passenger})
+            self.assertEqual(result["content"][0]["text"], toolbox.move_across_river(passenger))
+
+
+class TestToolDispatchTable(unittest.TestCase):
+    def test_listing_is_shared_between_instances(self):
+        """
+        Testuje, že get_tools nevytváří schémata při každém volání znovu.
+        """
+        first = create_mcp_server().get_tools()
+        second = create_mcp_server().get_tools()
+        self.assertEqual(first, second)
+        for a, b in zip(first, second):
+            self.assertIs(a, b)
+
+    def test_subclass_registers_new_tool(self):
+        """
+        Testuje přidání nástroje v podtřídě dekorátorem mcp_tool.
+        """
+        server = CountingMCPServer()
+        names = [tool["name"] for tool in server.get_tools()]
+        self.assertEqual(names[-1], "count_moves")
+        self.assertEqual(len(names), 6)
+        self.assertNotIn("count_moves", PuzzleMCPServer._tools)
+
+        result = server.call_tool("count_moves", {"times": 2, "label": "x"})
+        self.assertEqual(result["content"][0]["text"], "x x")
+        result = server.call_tool("count_moves", {"times": 1})
+        self.assertEqual(result["content"][0]["text"], "tah")
+
+    def test_unknown_arguments_are_rejected(self):
+        """
+        Testuje, že nedeklarované argumenty vrátí chybu místo tichého zahození.
+        """
+        server = CountingMCPServer()
+        result = server.call_tool("count_moves", {"times": 1, "ignored": True})
+        self.assertTrue(result["isError"])
+        self.assertIn("Unknown parameter(s): ignored", result["content"][0]["text"])
+
+        result = server.call_tool("get_current_state", {"verbose": True})
+        self.assertTrue(result["isError"])
+        result = server.call_tool("move_across_river", {"passenger": "goat", "cargo": "wolf"})
+        self.assertTrue(result["isError"])
+        self.assertEqual(server.puzzle_env.state["right_bank"], set())
+
+    def test_argument_types_are_checked(self):
+        """
+        Testuje kontrolu typů argumentů podle předem zpracovaného schématu.
+        """
+        server = CountingMCPServer()
+        for arguments in (
+            {"times": "2"},
+            {"times": True},
+            {"times": 1, "label": 3},
+            # Explicitní null je špatný typ, ne vynechaný argument.
+            {"times": None},
+            {"times": 1, "label": None},
+        ):
+            result = server.call_tool("count_moves", arguments)
+            self.assertTrue(result["isError"])
+            self.assertIn("must be of type", result["content"][0]["text"])
+
+        result = server.call_tool("move_across_river", {"passenger": 42})
+        self.assertTrue(result["isError"])
+        self.assertIn("Parameter 'passenger' must be of type string", result["content"][0]["text"])
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestPuzzleSessionTable(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.sessions = PuzzleSessionTable(max_sessions=3, idle_timeout=60, clock=self.clock)
+
+    def test_sessions_are_isolated(self):
+        """
+        Testuje, že každá relace má vlastní hádanku.
+        """
+        first = self.sessions.get("a")
+        second = self.sessions.get("b")
+
+        self.assertIsNot(first.puzzle_env, second.puzzle_env)
+        self.assertIs(self.sessions.get("a"), first)
+        self.assertIs(self.sessions.lookup("b"), second)
+        self.assertIsNone(self.sessions.lookup("missing"))
+        self.assertNotIn("missing", self.sessions)
+
+    def test_lru_bound(self):
+        """
+        Testuje, že při překročení limitu vypadne nejdéle nepoužitá relace.
+        """
+        for session_id in ("a", "b", "c"):
+            self.sessions.get(session_id)
+        self.sessions.get("a")
+        self.sessions.get("d")
+
+        self.assertEqual(len(self.sessions), 3)
+        self.assertNotIn("b", self.sessions)
+        self.assertIn("a", self.sessions)
+
+    def test_idle_eviction(self):
+        """
+        Testuje vyřazení neaktivních relací.
+        """
+        self.sessions.get("a")
+        self.clock.now = 30
+        self.sessions.get("b")
+        self.clock.now = 70
+
+        self.assertEqual(self.sessions.evict_idle(), 1)
+        self.assertNotIn("a", self.sessions)
+        self.assertIn("b", self.sessions)
+
+        self.assertTrue(self.sessions.close("b"))
+        self.assertFalse(self.sessions.close("b"))
+        self.assertEqual(len(self.sessions), 0)
+
+
+class TestMultiSessionProtocol(unittest.TestCase):
+    def test_session_scoped_calls(self):
+        """
+        Testuje přes MCP protokol, že relace a spojení mají oddělené hádanky.
+        """
+        sessions = PuzzleSessionTable()
+        server = setup_mcp_server(sessions)
+
+        async def scenario():
+            async with create_connected_server_and_client_session(server) as client:
+                tools = await client.list_tools()
+                for tool in tools.tools:
+                    self.assertIn("session_id", tool.inputSchema["properties"])
+
+                await client.call_tool("move_across_river", {"passenger": "goat", "session_id": "alice"})
+                await client.call_tool("move_across_river", {"passenger": "goat"})
+
+            async with create_connected_server_and_client_session(server) as client:
+                result = await client.call_tool("get_current_state", {})
+                return result.content[0].text
+
+        text = asyncio.run(scenario())
+
+        self.assertIn("Levý břeh: [cabbage, goat, wolf]", text)
+        self.assertEqual(sessions.lookup("alice").puzzle_env.state["right_bank"], {"goat"})
+        self.assertEqual(len(sessions), 3)
+
+    def test_list_tools_is_built_once(self):
+        """
+        Testuje opakovaný výpis nástrojů z předem sestavených objektů Tool.
+        """
+        server = setup_mcp_server(PuzzleSessionTable())
+
+        async def scenario():
+            async with create_connected_server_and_client_session(server) as client:
+                first = await client.list_tools()
+                second = await client.list_tools()
+                return first.tools, second.tools
+
+        first, second = asyncio.run(scenario())
+        self.assertEqual([tool.name for tool in first], [tool.name for tool in second])
+        self.assertEqual(len(first), 5)
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
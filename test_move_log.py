@@ -0,0 +1,281 @@
+#!/usr/bin/env python
+import copy
+import os
+import random
+import tempfile
+import unittest
+
+import puzzle_solver
+from move_log import (
+    EVENT_MOVE,
+    EVENT_REDO,
+    EVENT_SET,
+    EVENT_UNDO,
+    FORMAT_VERSION,
+    HEADER,
+    MAGIC,
+    MOVE_UNKNOWN,
+    LoggedPuzzleEnvironment,
+    MoveLog,
+)
+from puzzle_environment import (
+    GOAL_BITS,
+    INITIAL_BITS,
+    MOVE_MASKS,
+    MOVE_OK,
+    MOVE_UNSAFE,
+    MOVE_WRONG_BANK,
+    PASSENGERS,
+    STATE_COUNT,
+    BitPuzzleEnvironment,
+)
+
+
+def _random_log(seed, length, snapshot_interval=16):
+    """
+    Vrátí prostředí s logem náhodných tahů, undo, redo a občasných nastavení stavu.
+    """
+    rng = random.Random(seed)
+    env = LoggedPuzzleEnvironment(MoveLog(snapshot_interval=snapshot_interval))
+    while len(env.move_log) < length:
+        roll = rng.random()
+        if roll < 0.1:
+            env.undo()
+        elif roll < 0.15:
+            env.redo()
+        elif roll < 0.16:
+            env.bits = INITIAL_BITS
+        else:
+            env.attempt_move(rng.choice(PASSENGERS + ("dog",)))
+    return env
+
+
+class TestMoveLog(unittest.TestCase):
+    def test_one_byte_per_move(self):
+        """
+        Testuje velikost logu: hlavička a jeden bajt na každý tah.
+        """
+        env = LoggedPuzzleEnvironment()
+        for passenger in puzzle_solver.shortest_path():
+            env.attempt_move(passenger)
+        env.attempt_move("wolf")
+
+        self.assertTrue(env.is_solved())
+        self.assertEqual(len(env.move_log), 8)
+        self.assertEqual(len(env.move_log.to_bytes()), HEADER.size + 8)
+
+    def test_events_record_rejections(self):
+        """
+        Testuje, že log drží i odmítnuté tahy s důvodem.
+        """
+        env = LoggedPuzzleEnvironment()
+        env.attempt_move("wolf")
+        env.attempt_move("goat")
+        env.attempt_move("cabbage")
+        env.attempt_move("dog")
+
+        events = list(env.move_log)
+        self.assertEqual(
+            [(e.kind, e.passenger, e.code) for e in events],
+            [
+                (EVENT_MOVE, "wolf", MOVE_UNSAFE),
+                (EVENT_MOVE, "goat", MOVE_OK),
+                (EVENT_MOVE, "cabbage", MOVE_WRONG_BANK),
+                (EVENT_MOVE, None, MOVE_UNKNOWN),
+            ],
+        )
+        self.assertEqual([e.bits for e in events], [INITIAL_BITS] + [MOVE_MASKS["goat"]] * 3)
+
+    def test_undo_redo(self):
+        """
+        Testuje undo a redo jako události logu, které vracejí stav.
+        """
+        env = LoggedPuzzleEnvironment()
+        env.attempt_move("goat")
+        env.attempt_move("nothing")
+        after_two = env.bits
+
+        self.assertTrue(env.undo())
+        self.assertEqual(env.bits, MOVE_MASKS["goat"])
+        self.assertTrue(env.undo())
+        self.assertEqual(env.bits, INITIAL_BITS)
+        self.assertFalse(env.undo())
+
+        self.assertTrue(env.redo())
+        self.assertTrue(env.redo())
+        self.assertEqual(env.bits, after_two)
+        self.assertFalse(env.redo())
+
+        # Nový tah zahodí možnost redo, stejně jako přímé nastavení stavu historii.
+        env.undo()
+        env.attempt_move("nothing")
+        self.assertFalse(env.move_log.can_redo)
+        env.bits = INITIAL_BITS
+        self.assertFalse(env.move_log.can_undo)
+
+        kinds = [event.kind for event in env.move_log]
+        self.assertEqual(
+            kinds,
+            [EVENT_MOVE, EVENT_MOVE, EVENT_UNDO, EVENT_UNDO, EVENT_REDO, EVENT_REDO,
+             EVENT_UNDO, EVENT_MOVE, EVENT_SET],
+        )
+
+    def test_atomic_rollback_is_logged_as_undo(self):
+        """
+        Testuje, že vrácení atomické posloupnosti se zapíše jako undo provedených tahů.
+        """
+        env = LoggedPuzzleEnvironment()
+        outcomes, rolled_back = env.attempt_moves(["goat", "nothing", "goat", "goat"], atomic=True)
+        self.assertTrue(rolled_back)
+        self.assertEqual(env.bits, INITIAL_BITS)
+        self.assertEqual(
+            [event.kind for event in env.move_log][-2:], [EVENT_UNDO, EVENT_UNDO]
+        )
+
+    def test_state_at_matches_full_replay(self):
+        """
+        Testuje skok na libovolný krok přes snímky proti přehrání od začátku.
+        """
+        env = _random_log(seed=1, length=500)
+        log = env.move_log
+        self.assertEqual(len(log.snapshots), len(log) // log.snapshot_interval + 1)
+
+        states = [log.initial_bits] + [event.bits for event in log]
+        for step in range(len(log) + 1):
+            self.assertEqual(log.state_at(step), states[step])
+        with self.assertRaises(IndexError):
+            log.state_at(len(log) + 1)
+
+    def test_replay_restores_history(self):
+        """
+        Testuje, že prostředí z logu v daném kroku má i stejnou historii undo/redo.
+        """
+        env = _random_log(seed=2, length=300)
+        for step in (0, 1, 77, 150, 300):
+            replayed = LoggedPuzzleEnvironment.at_step(env.move_log, step)
+            self.assertEqual(replayed.bits, env.move_log.state_at(step))
+        replayed = LoggedPuzzleEnvironment.at_step(env.move_log)
+        self.assertEqual(replayed.move_log._undo, env.move_log._undo)
+        self.assertEqual(replayed.move_log._redo, env.move_log._redo)
+
+    def test_logged_environment_matches_bit_environment(self):
+        """
+        Testuje, že zaznamenávané prostředí hraje stejně jako bitové.
+        """
+        rng = random.Random(3)
+        logged = LoggedPuzzleEnvironment()
+        reference = BitPuzzleEnvironment()
+        for _ in range(500):
+            passenger = rng.choice(PASSENGERS)
+            self.assertEqual(logged.attempt_move(passenger), reference.attempt_move(passenger))
+            self.assertEqual(logged.state, reference.state)
+            self.assertEqual(logged.get_state_description(), reference.get_state_description())
+
+    def test_bytes_roundtrip(self):
+        """
+        Testuje, že převod do bajtů a zpět zachová události i stav.
+        """
+        env = _random_log(seed=4, length=200)
+        data = env.move_log.to_bytes()
+        loaded = MoveLog.from_bytes(data)
+        self.assertEqual(loaded.events, env.move_log.events)
+        self.assertEqual(loaded.bits, env.bits)
+        self.assertEqual(loaded.to_bytes(), data)
+
+    def test_invalid_data(self):
+        """
+        Testuje odmítnutí poškozených dat: krátká hlavička, cizí magic, neplatné události a počáteční stav.
+        """
+        with self.assertRaises(ValueError):
+            MoveLog.from_bytes(b"PZ")
+        with self.assertRaises(ValueError):
+            MoveLog.from_bytes(b"XXXX" + bytes(4))
+        valid = MoveLog().to_bytes()
+        with self.assertRaises(ValueError):
+            MoveLog.from_bytes(valid + bytes([0xFF]))
+        with self.assertRaises(ValueError):
+            # Undo bez předchozího tahu.
+            MoveLog.from_bytes(valid + bytes([0x41]))
+        # Počáteční stav mimo rozsah a nebezpečný stav (koza s vlkem bez farmáře).
+        unsafe = (MOVE_MASKS["goat"] | MOVE_MASKS["wolf"]) ^ MOVE_MASKS["nothing"]
+        for initial_bits in (STATE_COUNT, 0xFF, unsafe):
+            with self.subTest(initial_bits=initial_bits):
+                with self.assertRaisesRegex(ValueError, "initial state"):
+                    MoveLog.from_bytes(HEADER.pack(MAGIC, FORMAT_VERSION, initial_bits, 0))
+
+    def test_forged_events_are_rejected(self):
+        """
+        Testuje, že úspěšný tah porušující pravidla a nastavení neplatného
+        stavu se nenačtou ani nezapíšou.
+        """
+        valid = MoveLog().to_bytes()
+        ok = MOVE_OK << 2
+        wolf, goat = PASSENGERS.index("wolf"), PASSENGERS.index("goat")
+        unsafe = (MOVE_MASKS["goat"] | MOVE_MASKS["wolf"]) ^ MOVE_MASKS["nothing"]
+        forged = {
+            # Vlk jako první tah nechá kozu se zelím.
+            "unsafe": bytes([ok | wolf]),
+            # Po převozu kozy je loďka vpravo, vlk vlevo.
+            "wrong bank": bytes([ok | goat, ok | wolf]),
+            "unsafe set": bytes([0x80 | unsafe]),
+        }
+        for name, events in forged.items():
+            with self.subTest(name):
+                with self.assertRaisesRegex(ValueError, "not possible"):
+                    MoveLog.from_bytes(valid + events)
+
+        log = MoveLog()
+        with self.assertRaisesRegex(ValueError, "Invalid state"):
+            log.record_set(unsafe)
+        with self.assertRaises(ValueError):
+            log.record_set(STATE_COUNT)
+        self.assertEqual((len(log), log.bits), (0, INITIAL_BITS))
+
+    def test_file_is_append_only(self):
+        """
+        Testuje zápis do souboru, opětovné otevření a připisování dalších tahů.
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "episode.pzml")
+            with MoveLog.open(path) as log:
+                env = LoggedPuzzleEnvironment(log)
+                env.attempt_move("goat")
+                env.attempt_move("nothing")
+            first = open(path, "rb").read()
+            self.assertEqual(len(first), HEADER.size + 2)
+
+            with MoveLog.open(path) as log:
+                env = LoggedPuzzleEnvironment(log)
+                self.assertEqual(env.bits, MOVE_MASKS["goat"] ^ MOVE_MASKS["nothing"])
+                env.undo()
+            second = open(path, "rb").read()
+            self.assertEqual(second[: len(first)], first)
+            self.assertEqual(MoveLog.from_bytes(second).bits, MOVE_MASKS["goat"])
+
+    def test_deepcopy_detaches_file(self):
+        """
+        Testuje, že kopie prostředí nezapisuje do souboru původního logu.
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "episode.pzml")
+            with MoveLog.open(path) as log:
+                env = LoggedPuzzleEnvironment(log)
+                clone = copy.deepcopy(env)
+                clone.attempt_move("goat")
+                self.assertEqual(len(log), 0)
+                self.assertIsNone(clone.move_log._file)
+            self.assertEqual(os.path.getsize(path), HEADER.size)
+
+    def test_solution_replays_to_goal(self):
+        """
+        Testuje, že přehrání optimálního řešení skončí v cílovém stavu.
+        """
+        env = LoggedPuzzleEnvironment()
+        for passenger in puzzle_solver.shortest_path():
+            env.attempt_move(passenger)
+        self.assertEqual(env.move_log.state_at(len(env.move_log)), GOAL_BITS)
+        self.assertEqual(env.move_log.state_at(0), INITIAL_BITS)
+
+
+if __name__ == "__main__":
+    unittest.main()
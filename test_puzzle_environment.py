@@ -1,6 +1,24 @@
 #!/usr/bin/env python
+import copy
+import random
+import sys
+import threading
 import unittest
-from puzzle_environment import PuzzleEnvironment
+from puzzle_environment import (
+    AtomicPuzzleEnvironment,
+    BitPuzzleEnvironment,
+    GOAL_BITS,
+    INITIAL_BITS,
+    MOVE_MASKS,
+    PASSENGERS,
+    PUZZLE_STATES,
+    PuzzleEnvironment,
+    PuzzleState,
+    STATE_COUNT,
+    VALID_STATES,
+    decode_state,
+    encode_state,
+)
 
 
 class TestPuzzleEnvironment(unittest.TestCase):
@@ -181,6 +199,329 @@ class TestPuzzleEnvironment(unittest.TestCase):
         self.assertFalse(success)
         self.assertIn("není na stejném břehu", message)
 
+    def test_attempt_moves(self):
+        """
+        Testuje posloupnost tahů - do první chyby, nebo atomicky vše či nic.
+        """
+        outcomes, rolled_back = self.env.attempt_moves(["goat", "wolf", "nothing"])
+        self.assertFalse(rolled_back)
+        self.assertEqual([success for _, success, _ in outcomes], [True, False])
+        self.assertEqual(self.env.state["right_bank"], {"goat"})
+
+        outcomes, rolled_back = self.env.attempt_moves(["nothing", "wolf", "cabbage"], atomic=True)
+        self.assertTrue(rolled_back)
+        self.assertEqual(len(outcomes), 3)
+        self.assertEqual(self.env.state["right_bank"], {"goat"})
+        self.assertEqual(self.env.state["boat_location"], "right")
+
+        outcomes, rolled_back = self.env.attempt_moves(
+            ["nothing", "wolf", "goat", "cabbage", "nothing", "goat"], atomic=True
+        )
+        self.assertFalse(rolled_back)
+        self.assertTrue(self.env.is_solved())
+
+
+class TestBitPuzzleEnvironment(TestPuzzleEnvironment):
+    """
+    Bitová varianta musí projít všemi testy původního prostředí.
+    """
+
+    def setUp(self):
+        self.env = BitPuzzleEnvironment()
+
+    def test_encode_decode_roundtrip(self):
+        """
+        Testuje, že převod mezi slovníkem a bitovou maskou je bezeztrátový.
+        """
+        for bits in range(STATE_COUNT):
+            self.assertEqual(encode_state(decode_state(bits)), bits)
+
+    def test_matches_dict_environment(self):
+        """
+        Testuje, že pro všechny stavy a pasažéry dává stejné výsledky jako PuzzleEnvironment.
+        """
+        for bits in range(STATE_COUNT):
+            for passenger in ("wolf", "goat", "cabbage", "nothing", "dog"):
+                with self.subTest(bits=bits, passenger=passenger):
+                    reference = PuzzleEnvironment()
+                    reference.state = decode_state(bits)
+                    self.env.bits = bits
+
+                    self.assertEqual(
+                        self.env.is_valid_state(bits),
+                        reference.is_valid_state(reference.state),
+                    )
+                    self.assertEqual(
+                        self.env.attempt_move(passenger),
+                        reference.attempt_move(passenger),
+                    )
+                    self.assertEqual(self.env.state, reference.state)
+                    self.assertEqual(
+                        self.env.get_state_description(),
+                        reference.get_state_description(),
+                    )
+                    self.assertEqual(self.env.is_solved(), reference.is_solved())
+
+    def test_state_view_is_lazy(self):
+        """
+        Testuje, že slovníkový pohled se nestaví, dokud o něj nikdo nepožádá.
+        """
+        self.env.attempt_move("goat")
+        self.assertIsNone(self.env._state_view)
+        self.assertEqual(self.env.state["right_bank"], {"goat"})
+
+
+class TestPuzzleState(unittest.TestCase):
+    def test_interned_instances(self):
+        """
+        Testuje, že každý stav má jedinou instanci i přes různé vstupy.
+        """
+        for bits in range(STATE_COUNT):
+            state = PuzzleState.of(bits)
+            self.assertIs(PuzzleState.of(decode_state(bits)), state)
+            self.assertIs(PuzzleState.of(state), state)
+            self.assertIs(copy.deepcopy(state), state)
+        self.assertEqual(len(set(PUZZLE_STATES)), STATE_COUNT)
+
+    def test_hashable_and_immutable(self):
+        """
+        Testuje, že stav jde použít jako klíč a nejde změnit.
+        """
+        visited = {PuzzleState.of(INITIAL_BITS): "start"}
+        self.assertEqual(visited[PuzzleEnvironment().puzzle_state], "start")
+        state = PuzzleState.of(GOAL_BITS)
+        with self.assertRaises(AttributeError):
+            state.bits = INITIAL_BITS
+        with self.assertRaises(AttributeError):
+            state.extra = 1
+        with self.assertRaises(AttributeError):
+            del state.description
+
+    def test_fields_match_dict_state(self):
+        """
+        Testuje, že předpočítané břehy a popis odpovídají slovníkovému stavu.
+        """
+        for bits in range(STATE_COUNT):
+            with self.subTest(bits=bits):
+                state = PuzzleState.of(bits)
+                as_dict = decode_state(bits)
+                self.assertEqual(state.to_dict(), as_dict)
+                self.assertEqual(state.left_bank, as_dict["left_bank"])
+                self.assertEqual(state.right_bank, as_dict["right_bank"])
+                self.assertEqual(state.boat_location, as_dict["boat_location"])
+                self.assertEqual(state.is_valid, VALID_STATES[bits])
+                self.assertIs(sys.intern(state.description), state.description)
+
+    def test_description_format(self):
+        """
+        Testuje předpočítaný popis stavu.
+        """
+        self.assertEqual(
+            PuzzleState.of(MOVE_MASKS["goat"]).description,
+            "Levý břeh: [cabbage, wolf].\n"
+            "Pravý břeh: [goat].\n"
+            "Loďka s převozníkem je na pravém břehu.",
+        )
+
+    def test_move(self):
+        """
+        Testuje tah nad neměnným stavem a příznak vyřešení.
+        """
+        code, state = PuzzleState.of(INITIAL_BITS).move("goat")
+        self.assertEqual(code, 0)
+        self.assertIs(state, PuzzleState.of(MOVE_MASKS["goat"]))
+        self.assertFalse(PuzzleState.of(INITIAL_BITS).is_solved)
+        self.assertTrue(PuzzleState.of(GOAL_BITS).is_solved)
+
+
+class TestAtomicPuzzleEnvironment(TestBitPuzzleEnvironment):
+    """
+    Souběžná varianta musí projít testy bitového prostředí; jen `state`
+    vrací kopii, takže se nedá měnit na místě.
+    """
+
+    def setUp(self):
+        self.env = AtomicPuzzleEnvironment()
+
+    def test_attempt_move(self):
+        """
+        Testuje tahy s kontrolou pravidel nad bitovým stavem přiřazeným přes state i bits.
+        """
+        success, message = self.env.attempt_move("goat")
+        self.assertTrue(success)
+        self.assertIn("goat", self.env.state["right_bank"])
+
+        self.env.state = decode_state(INITIAL_BITS)
+        success, message = self.env.attempt_move("wolf")
+        self.assertFalse(success)
+        self.assertIn("neplatný", message)
+
+        self.env.bits = MOVE_MASKS["nothing"]  # Přesuneme loďku
+        success, message = self.env.attempt_move("wolf")
+        self.assertFalse(success)
+        self.assertIn("není na stejném břehu", message)
+        self.assertEqual(self.env.bits, MOVE_MASKS["nothing"])
+
+    def test_state_view_is_lazy(self):
+        """
+        Testuje, že úprava vráceného slovníku stav prostředí nezmění.
+        """
+        self.env.state["right_bank"].add("goat")
+        self.assertEqual(self.env.bits, INITIAL_BITS)
+
+    def test_versions(self):
+        """
+        Testuje číslování verzí a odmítnutí tahu nad zastaralou verzí.
+        """
+        self.assertEqual(self.env.version, 0)
+        self.env.attempt_move("goat")
+        self.assertEqual(self.env.version, 1)
+        # Odmítnutý tah stav nemění, verze zůstává.
+        self.env.attempt_move("wolf")
+        self.assertEqual(self.env.version, 1)
+
+        success, message = self.env.attempt_move("nothing", expected_version=0)
+        self.assertFalse(success)
+        self.assertIn("očekávaná verze 0, aktuální 1", message)
+        self.assertTrue(self.env.attempt_move("nothing", expected_version=1)[0])
+
+    def test_compare_and_swap(self):
+        """
+        Testuje, že zápis ze zastaralého snímku selže a započítá se jako konflikt.
+        """
+        snapshot = self.env.snapshot()
+        self.env.attempt_move("goat")
+        self.assertFalse(self.env.compare_and_swap(snapshot, GOAL_BITS))
+        self.assertEqual(self.env.conflicts, 1)
+        self.assertTrue(self.env.compare_and_swap(self.env.snapshot(), GOAL_BITS))
+        self.assertTrue(self.env.is_solved())
+
+    def test_deepcopy(self):
+        """
+        Testuje, že kopie prostředí je na originálu nezávislá.
+        """
+        self.env.attempt_move("goat")
+        clone = copy.deepcopy(self.env)
+        clone.attempt_move("nothing")
+        self.assertEqual(self.env.snapshot().bits, MOVE_MASKS["goat"])
+        self.assertNotEqual(clone.bits, self.env.bits)
+
+
+class TestAtomicPuzzleEnvironmentStress(unittest.TestCase):
+    """
+    Zátěžové testy: mnoho vláken nad jedním prostředím.
+    """
+
+    def setUp(self):
+        # Častější přepínání vláken vyvolá víc konfliktů zápisů.
+        self.switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+
+    def tearDown(self):
+        sys.setswitchinterval(self.switch_interval)
+
+    def _run_threads(self, targets):
+        threads = [threading.Thread(target=target) for target in targets]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def test_concurrent_moves_are_linearizable(self):
+        """
+        Testuje, že se žádný tah neztratí: tahy jsou XOR masky, takže výsledný
+        stav musí odpovídat XOR všech úspěšných tahů a verze jejich počtu.
+        Čtenáři přitom nikdy nesmí vidět neplatný stav ani klesající verzi.
+        """
+        env = AtomicPuzzleEnvironment(max_retries=10_000)
+        writers, moves_per_writer = 8, 2000
+        successes = [[] for _ in range(writers)]
+        rejected = []
+        reader_errors = []
+        done = threading.Event()
+
+        def writer(index):
+            rng = random.Random(index)
+            for _ in range(moves_per_writer):
+                passenger = rng.choice(PASSENGERS)
+                success, message = env.attempt_move(passenger)
+                if success:
+                    successes[index].append(passenger)
+                elif "příliš často" in message:
+                    rejected.append(message)
+
+        def reader():
+            last_version = -1
+            while not done.is_set():
+                snapshot = env.snapshot()
+                if not VALID_STATES[snapshot.bits]:
+                    reader_errors.append(f"invalid state {snapshot.bits}")
+                if snapshot.version < last_version:
+                    reader_errors.append("version went backwards")
+                last_version = snapshot.version
+
+        readers = [threading.Thread(target=reader) for _ in range(4)]
+        for thread in readers:
+            thread.start()
+        try:
+            self._run_threads([lambda i=i: writer(i) for i in range(writers)])
+        finally:
+            done.set()
+            for thread in readers:
+                thread.join()
+
+        applied = [passenger for moves in successes for passenger in moves]
+        expected_bits = INITIAL_BITS
+        for passenger in applied:
+            expected_bits ^= MOVE_MASKS[passenger]
+        self.assertEqual(reader_errors, [])
+        self.assertEqual(rejected, [])
+        self.assertEqual(env.version, len(applied))
+        self.assertEqual(env.bits, expected_bits)
+
+    def test_expected_version_admits_one_writer(self):
+        """
+        Testuje, že ze souběžných tahů nad stejnou verzí projde právě jeden.
+        """
+        env = AtomicPuzzleEnvironment()
+        contenders = 8
+        for _ in range(50):
+            env.bits = INITIAL_BITS
+            version = env.version
+            barrier = threading.Barrier(contenders)
+            results = []
+
+            def contender():
+                barrier.wait()
+                results.append(env.attempt_move("goat", expected_version=version)[0])
+
+            self._run_threads([contender] * contenders)
+            self.assertEqual(results.count(True), 1)
+            self.assertEqual(env.bits, MOVE_MASKS["goat"])
+
+    def test_atomic_sequence_is_never_seen_half_done(self):
+        """
+        Testuje, že čtenář nikdy neuvidí rozpracovanou atomickou posloupnost.
+        """
+        env = AtomicPuzzleEnvironment()
+        solution = ["goat", "nothing", "wolf", "goat", "cabbage", "nothing", "goat"]
+        observed = set()
+        done = threading.Event()
+
+        def writer():
+            for _ in range(500):
+                outcomes, rolled_back = env.attempt_moves(solution, atomic=True)
+                assert not rolled_back
+                env.bits = INITIAL_BITS
+            done.set()
+
+        def reader():
+            while not done.is_set():
+                observed.add(env.bits)
+
+        self._run_threads([writer, reader, reader])
+        self.assertLessEqual(observed, {INITIAL_BITS, GOAL_BITS})
+
 
 if __name__ == "__main__":
     unittest.main()
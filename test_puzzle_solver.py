@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+import unittest
+from puzzle_environment import (
+    GOAL_BITS,
+    INITIAL_BITS,
+    MOVE_OK,
+    MOVE_UNSAFE,
+    MOVE_WRONG_BANK,
+    PASSENGERS,
+    STATE_COUNT,
+    BitPuzzleEnvironment,
+    PuzzleEnvironment,
+    PuzzleState,
+    decode_state,
+)
+import puzzle_solver
+
+
+class TestPuzzleSolver(unittest.TestCase):
+    def test_transition_table_matches_environment(self):
+        """
+        Testuje, že přechodová tabulka odpovídá PuzzleEnvironment.attempt_move.
+        """
+        for bits in range(STATE_COUNT):
+            for passenger in PASSENGERS:
+                with self.subTest(bits=bits, passenger=passenger):
+                    env = PuzzleEnvironment()
+                    env.state = decode_state(bits)
+                    success, _ = env.attempt_move(passenger)
+
+                    code, next_bits = puzzle_solver.transition(bits, passenger)
+                    self.assertEqual(code == MOVE_OK, success)
+                    self.assertEqual(decode_state(next_bits), env.state)
+
+    def test_rejection_reasons(self):
+        """
+        Testuje, že tabulka rozlišuje důvody odmítnutí tahu.
+        """
+        self.assertEqual(
+            puzzle_solver.transition(INITIAL_BITS, "wolf")[0], MOVE_UNSAFE
+        )
+        goat_across = puzzle_solver.transition(INITIAL_BITS, "goat")[1]
+        self.assertEqual(
+            puzzle_solver.transition(goat_across, "wolf")[0], MOVE_WRONG_BANK
+        )
+
+    def test_distance_to_goal(self):
+        """
+        Testuje vzdálenost do cíle pro známé stavy.
+        """
+        self.assertEqual(puzzle_solver.distance_to_goal(INITIAL_BITS), 7)
+        self.assertEqual(puzzle_solver.distance_to_goal(GOAL_BITS), 0)
+        self.assertEqual(puzzle_solver.distance_to_goal(PuzzleEnvironment()), 7)
+        self.assertEqual(puzzle_solver.distance_to_goal(BitPuzzleEnvironment()), 7)
+        self.assertEqual(puzzle_solver.distance_to_goal(PuzzleState.of(GOAL_BITS)), 0)
+
+    def test_shortest_path_solves_puzzle(self):
+        """
+        Testuje, že nejkratší cesta skutečně vyřeší hádanku.
+        """
+        path = puzzle_solver.shortest_path()
+        self.assertEqual(len(path), 7)
+
+        env = PuzzleEnvironment()
+        for passenger in path:
+            success, _ = env.attempt_move(passenger)
+            self.assertTrue(success)
+        self.assertTrue(env.is_solved())
+
+    def test_all_solutions(self):
+        """
+        Testuje výčet řešení - klasická hádanka má dvě nejkratší řešení.
+        """
+        shortest = list(puzzle_solver.all_solutions(max_moves=7))
+        self.assertEqual(len(shortest), 2)
+        self.assertIn(puzzle_solver.shortest_path(), shortest)
+        for solution in puzzle_solver.all_solutions():
+            self.assertTrue(puzzle_solver.evaluate_moves(solution)["solved"])
+
+    def test_optimal_moves(self):
+        """
+        Testuje, že z počátečního stavu je optimální pouze převézt kozu.
+        """
+        self.assertEqual(puzzle_solver.optimal_moves(INITIAL_BITS), ["goat"])
+        self.assertEqual(puzzle_solver.optimal_moves(GOAL_BITS), [])
+
+    def test_evaluate_moves(self):
+        """
+        Testuje hodnocení posloupnosti tahů agenta.
+        """
+        moves = ["wolf", "goat"] + puzzle_solver.shortest_path(
+            puzzle_solver.transition(INITIAL_BITS, "goat")[1]
+        )
+        result = puzzle_solver.evaluate_moves(moves)
+
+        self.assertTrue(result["solved"])
+        self.assertEqual(result["invalid_moves"], 1)
+        self.assertEqual(result["moves"], 7)
+        self.assertEqual(result["excess_moves"], 0)
+        self.assertEqual(result["distance_to_goal"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import results_store
+from move_log import LoggedPuzzleEnvironment, MoveLog
+from results_store import ResultsWriter, grouped_stats, read_results
+
+
+def _results():
+    """
+    Vrátí výsledky epizod dvou modelů a dvou promptů.
+    """
+    results = []
+    for index in range(12):
+        env = LoggedPuzzleEnvironment()
+        for passenger in ("goat", "nothing", "wolf")[: index % 4]:
+            env.attempt_move(passenger)
+        results.append(
+            {
+                "model": "alpha" if index % 2 else "beta",
+                "prompt_name": "short" if index % 3 else "long",
+                "episode": index,
+                "solved": index % 4 == 0,
+                "finished": True,
+                "steps": index,
+                "tool_calls": index + 1,
+                "invalid_moves": index % 3,
+                "prompt_tokens": 100 * index,
+                "completion_tokens": 10 * index,
+                "wall_time": 0.5 * index,
+                "error": None,
+                "move_log": env.move_log.to_bytes(),
+                # Pole mimo schéma se nezapisují.
+                "speculated_moves": 3,
+            }
+        )
+    return results
+
+
+def _expected_stats(results):
+    groups = {}
+    for result in results:
+        groups.setdefault((result["model"], result["prompt_name"]), []).append(result)
+    expected = []
+    for (model, prompt_name), group in sorted(groups.items()):
+        count = len(group)
+        expected.append(
+            {
+                "model": model,
+                "prompt_name": prompt_name,
+                "episodes": count,
+                "solved": sum(r["solved"] for r in group),
+                "solve_rate": sum(r["solved"] for r in group) / count,
+                "avg_steps": sum(r["steps"] for r in group) / count,
+                "avg_invalid_moves": sum(r["invalid_moves"] for r in group) / count,
+                "avg_prompt_tokens": sum(r["prompt_tokens"] for r in group) / count,
+                "avg_completion_tokens": sum(r["completion_tokens"] for r in group) / count,
+                "avg_wall_time": sum(r["wall_time"] for r in group) / count,
+                "max_wall_time": max(r["wall_time"] for r in group),
+            }
+        )
+    return expected
+
+
+class TestResultsStoreFallback(unittest.TestCase):
+    """
+    Čistě pythonový formát, který funguje i bez pyarrow.
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.directory = os.path.join(self.tmp.name, "store")
+        self.patcher = patch.object(results_store, "pa", None)
+        self.patcher.start()
+        self.addCleanup(self.patcher.stop)
+
+    def test_default_format_without_pyarrow(self):
+        """
+        Testuje, že bez pyarrow je výchozí záložní formát a ostatní formáty se odmítnou.
+        """
+        self.assertEqual(results_store.default_format(), "columns")
+        with self.assertRaises(RuntimeError):
+            ResultsWriter(self.directory, format="arrow")
+        with self.assertRaises(ValueError):
+            ResultsWriter(self.directory, format="csv")
+
+    def test_grouped_stats(self):
+        """
+        Testuje souhrnné statistiky přes víc částí a dávek.
+        """
+        results = _results()
+        with ResultsWriter(self.directory, batch_size=5) as writer:
+            for result in results[:7]:
+                writer.write(result)
+        with ResultsWriter(self.directory) as writer:
+            for result in results[7:]:
+                writer.write(result)
+
+        stats = grouped_stats(self.directory)
+        expected = _expected_stats(results)
+        self.assertEqual(len(stats), len(expected))
+        for row, expected_row in zip(stats, expected):
+            for key, value in expected_row.items():
+                self.assertAlmostEqual(row[key], value, msg=key)
+
+    def test_read_results_columns(self):
+        """
+        Testuje čtení vybraných sloupců včetně binárních logů tahů.
+        """
+        results = _results()
+        with ResultsWriter(self.directory) as writer:
+            for result in results:
+                writer.write(result)
+
+        table = read_results(self.directory, ["episode", "move_log"])
+        self.assertEqual(set(table), {"episode", "move_log"})
+        self.assertEqual(table["episode"], list(range(12)))
+        logs = [MoveLog.from_bytes(data) for data in table["move_log"]]
+        self.assertEqual([len(log) for log in logs], [index % 4 for index in range(12)])
+        with self.assertRaises(ValueError):
+            read_results(self.directory, ["nonexistent"])
+
+    def test_part_is_published_on_close(self):
+        """
+        Testuje, že čtenář nevidí rozepsanou část a že prázdný zapisovač nic nevytvoří.
+        """
+        writer = ResultsWriter(self.directory, batch_size=2)
+        for result in _results()[:3]:
+            writer.write(result)
+        self.assertEqual(read_results(self.directory)["episode"], [])
+        writer.close()
+        self.assertEqual(read_results(self.directory)["episode"], [0, 1, 2])
+
+        with ResultsWriter(self.directory):
+            pass
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+
+    def test_batches_are_appended(self):
+        """
+        Testuje, že každá dávka se připíše jako jeden řádek a nic se nepřepisuje.
+        """
+        writer = ResultsWriter(self.directory, batch_size=2)
+        for result in _results()[:5]:
+            writer.write(result)
+        with open(writer._tmp_path, encoding="utf-8") as f:
+            lines = f.readlines()
+        self.assertEqual(len(lines), 2)
+        writer.close()
+        with open(writer.path, encoding="utf-8") as f:
+            self.assertEqual(f.readlines()[:2], lines)
+        self.assertEqual(read_results(self.directory)["episode"], [0, 1, 2, 3, 4])
+
+    def test_extra_fields_and_hex_move_log(self):
+        """
+        Testuje doplnění polí a log tahů jako hex (záznamy z evaluace).
+        """
+        data = MoveLog().to_bytes()
+        with ResultsWriter(self.directory) as writer:
+            writer.write({"solved": True, "move_log": data.hex()}, model="alpha")
+        table = read_results(self.directory, ["model", "solved", "move_log", "steps"])
+        self.assertEqual(
+            table, {"model": ["alpha"], "solved": [True], "move_log": [data], "steps": [None]}
+        )
+
+    def test_cli(self):
+        """
+        Testuje výpis statistik z příkazové řádky.
+        """
+        with ResultsWriter(self.directory) as writer:
+            for result in _results():
+                writer.write(result)
+        with patch("builtins.print") as mock_print:
+            self.assertEqual(results_store.main([self.directory, "--by", "model"]), 0)
+        rows = [json.loads(call.args[0]) for call in mock_print.call_args_list]
+        self.assertEqual([row["model"] for row in rows], ["alpha", "beta"])
+        self.assertEqual(sum(row["episodes"] for row in rows), 12)
+
+
+@unittest.skipIf(results_store.pa is None, "pyarrow není nainstalované")
+class TestResultsStoreArrow(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.directory = os.path.join(self.tmp.name, "store")
+
+    def _write(self, results, format, batch_size=1024):
+        with ResultsWriter(self.directory, format=format, batch_size=batch_size) as writer:
+            for result in results:
+                writer.write(result)
+        return writer
+
+    def test_formats_agree(self):
+        """
+        Testuje, že všechny formáty dávají stejné statistiky i při mixu částí.
+        """
+        results = _results()
+        expected = _expected_stats(results)
+        self._write(results[:4], "arrow", batch_size=3)
+        self._write(results[4:8], "parquet", batch_size=3)
+        self._write(results[8:], "columns")
+
+        stats = grouped_stats(self.directory)
+        self.assertEqual(len(stats), len(expected))
+        for row, expected_row in zip(stats, expected):
+            for key, value in expected_row.items():
+                self.assertAlmostEqual(row[key], value, msg=key)
+
+    def test_read_results_is_table(self):
+        """
+        Testuje, že s pyarrow vrací čtení tabulku s vybranými sloupci.
+        """
+        results = _results()
+        writer = self._write(results, "arrow", batch_size=5)
+        self.assertTrue(writer.path.endswith(".arrow"))
+
+        table = read_results(self.directory, ["episode", "solved", "move_log"])
+        self.assertEqual(table.column_names, ["episode", "solved", "move_log"])
+        self.assertEqual(table.num_rows, 12)
+        self.assertEqual(table.column("episode").to_pylist(), list(range(12)))
+        self.assertEqual(
+            table.column("move_log").to_pylist(), [r["move_log"] for r in results]
+        )
+
+    def test_empty_store(self):
+        """
+        Testuje čtení a statistiky prázdného úložiště.
+        """
+        self.assertEqual(read_results(self.directory, ["model"]).num_rows, 0)
+        self.assertEqual(grouped_stats(self.directory), [])
+
+    def test_missing_group_values(self):
+        """
+        Testuje seskupení podle sloupce bez hodnot (např. main.py nezná prompt_name).
+        """
+        results = _results()
+        for result in results:
+            del result["prompt_name"]
+        self._write(results, "arrow")
+        stats = grouped_stats(self.directory)
+        self.assertEqual([(row["model"], row["prompt_name"]) for row in stats],
+                         [("alpha", None), ("beta", None)])
+
+
+if __name__ == "__main__":
+    unittest.main()
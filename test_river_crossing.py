@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+import unittest
+from puzzle_environment import (
+    MOVE_OK,
+    MOVE_UNSAFE,
+    MOVE_WRONG_BANK,
+    PASSENGERS,
+    STATE_COUNT,
+    VALID_STATES,
+)
+import puzzle_solver
+from river_crossing import (
+    MOVE_INVALID_LOAD,
+    Conflict,
+    RiverCrossingPuzzle,
+    conflict_graph,
+    jealous_husbands,
+    missionaries_and_cannibals,
+    wolf_goat_cabbage,
+)
+
+
+class TestRiverCrossingPuzzle(unittest.TestCase):
+    def test_wolf_goat_cabbage_matches_environment(self):
+        """
+        Testuje, že klasická varianta odpovídá pravidlům PuzzleEnvironment.
+        """
+        puzzle = wolf_goat_cabbage()
+        for bits in range(STATE_COUNT):
+            with self.subTest(bits=bits):
+                self.assertEqual(puzzle.is_valid(bits), VALID_STATES[bits])
+                for passenger in PASSENGERS:
+                    load = puzzle.encode_items(
+                        [] if passenger == "nothing" else [passenger]
+                    )
+                    self.assertEqual(
+                        puzzle.apply(bits, load),
+                        puzzle_solver.transition(bits, passenger),
+                    )
+
+    def test_shortest_solutions(self):
+        """
+        Testuje délky nejkratších řešení známých variant.
+        """
+        self.assertEqual(len(wolf_goat_cabbage().solve()), 7)
+        self.assertEqual(len(missionaries_and_cannibals().solve()), 11)
+        self.assertEqual(len(jealous_husbands().solve()), 11)
+
+    def test_solution_is_replayable(self):
+        """
+        Testuje, že nalezené řešení projde přes apply až do cíle.
+        """
+        puzzle = missionaries_and_cannibals()
+        bits = puzzle.initial_bits
+        for load in puzzle.solve():
+            code, bits = puzzle.apply(bits, puzzle.encode_items(load))
+            self.assertEqual(code, MOVE_OK)
+        self.assertTrue(puzzle.is_solved(bits))
+
+    def test_move_rejections(self):
+        """
+        Testuje důvody odmítnutí tahu.
+        """
+        puzzle = missionaries_and_cannibals()
+        start = puzzle.initial_bits
+
+        self.assertEqual(puzzle.apply(start, 0)[0], MOVE_INVALID_LOAD)
+        three = puzzle.encode_items(["cannibal1", "cannibal2", "cannibal3"])
+        self.assertEqual(puzzle.apply(start, three)[0], MOVE_INVALID_LOAD)
+        two_missionaries = puzzle.encode_items(["missionary1", "missionary2"])
+        self.assertEqual(puzzle.apply(start, two_missionaries)[0], MOVE_UNSAFE)
+
+        _, across = puzzle.apply(start, puzzle.encode_items(["cannibal1"]))
+        self.assertEqual(
+            puzzle.apply(across, puzzle.encode_items(["cannibal2"]))[0],
+            MOVE_WRONG_BANK,
+        )
+
+    def test_rules_in_boat(self):
+        """
+        Testuje, že u žárlivých manželů platí pravidla i v loďce.
+        """
+        puzzle = jealous_husbands()
+        load = puzzle.encode_items(["wife1", "husband2"])
+        self.assertEqual(puzzle.apply(puzzle.initial_bits, load)[0], MOVE_INVALID_LOAD)
+
+    def test_unsolvable_conflict_graph(self):
+        """
+        Testuje, že trojúhelník konfliktů s loďkou pro jednoho nemá řešení.
+        """
+        puzzle = conflict_graph(["a", "b", "c"], [("a", "b"), ("b", "c"), ("a", "c")])
+        self.assertIsNone(puzzle.solve())
+
+    def test_larger_conflict_graph(self):
+        """
+        Testuje řešení varianty s desítkami položek a řídkým grafem konfliktů.
+        """
+        items = [f"item{index}" for index in range(24)]
+        edges = [("item0", "item1")]
+        puzzle = conflict_graph(items, edges, capacity=4)
+        solution = puzzle.solve()
+
+        self.assertIsNotNone(solution)
+        bits = puzzle.initial_bits
+        for load in solution:
+            code, bits = puzzle.apply(bits, puzzle.encode_items(load))
+            self.assertEqual(code, MOVE_OK)
+        self.assertTrue(puzzle.is_solved(bits))
+
+    def test_invalid_definitions(self):
+        """
+        Testuje odmítnutí chybně zadané hádanky.
+        """
+        with self.assertRaises(ValueError):
+            RiverCrossingPuzzle(items=("a", "a"))
+        with self.assertRaises(ValueError):
+            RiverCrossingPuzzle(items=("a",), capacity=0)
+        with self.assertRaises(ValueError):
+            RiverCrossingPuzzle(items=("a",), rules=[Conflict(("a", "b"))])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,18 @@
 #!/usr/bin/env python
+import os
+import tempfile
 import unittest
-from typing import Literal
-from agent_tools import generate_tool_schema
+from typing import List, Literal
+from unittest.mock import patch
+import agent_tools
+from agent_tools import (
+    AgentToolbox,
+    dump_tool_schemas,
+    generate_tool_schema,
+    get_tool_schema,
+    load_tool_schemas,
+)
+from puzzle_environment import PuzzleEnvironment
 
 
 class TestGenerateToolSchema(unittest.TestCase):
@@ -94,6 +105,111 @@ class TestGenerateToolSchema(unittest.TestCase):
         generated_schema = generate_tool_schema(dummy_with_literal)
         self.assertDictEqual(generated_schema, expected_schema)
 
+    def test_function_with_list_parameter(self):
+        """
+        Testuje převod seznamu na pole a nepovinný parametr s výchozí hodnotou.
+        """
+
+        def dummy_with_list(passengers: List[Literal["wolf", "goat"]], atomic: bool = False):
+            """
+            Funkce se seznamem.
+
+            :param passengers: Pasažéři v pořadí.
+            :param atomic: Vše nebo nic.
+            """
+            pass
+
+        properties = generate_tool_schema(dummy_with_list)["function"]["parameters"]
+        self.assertDictEqual(
+            properties["properties"],
+            {
+                "passengers": {
+                    "type": "array",
+                    "description": "Pasažéři v pořadí.",
+                    "items": {"type": "string", "enum": ["wolf", "goat"]},
+                },
+                "atomic": {"type": "boolean", "description": "Vše nebo nic."},
+            },
+        )
+        self.assertEqual(properties["required"], ["passengers"])
+
+
+class TestToolSchemaRegistry(unittest.TestCase):
+    def setUp(self):
+        agent_tools._schema_cache.clear()
+        agent_tools._precomputed_schemas.clear()
+
+    def tearDown(self):
+        agent_tools._schema_cache.clear()
+        agent_tools._precomputed_schemas.clear()
+
+    def test_cache_shared_between_instances(self):
+        """
+        Testuje, že introspekce proběhne jen jednou pro všechny instance AgentToolbox.
+        """
+        first = AgentToolbox(PuzzleEnvironment()).move_across_river
+        second = AgentToolbox(PuzzleEnvironment()).move_across_river
+
+        with patch(
+            "agent_tools.generate_tool_schema", wraps=generate_tool_schema
+        ) as generator:
+            schema = get_tool_schema(first)
+            self.assertIs(get_tool_schema(second), schema)
+            self.assertEqual(generator.call_count, 1)
+
+        self.assertDictEqual(schema, generate_tool_schema(first))
+        self.assertNotIn("self", schema["function"]["parameters"]["properties"])
+
+    def test_unbound_method_first_does_not_leak_self(self):
+        """
+        Testuje, že schéma nezávisí na tom, zda první přišla funkce třídy,
+        nebo vázaná metoda.
+        """
+        bound = AgentToolbox(PuzzleEnvironment()).move_across_river
+        expected = generate_tool_schema(bound)
+
+        schema = get_tool_schema(AgentToolbox.move_across_river)
+        self.assertIs(get_tool_schema(bound), schema)
+        self.assertEqual(schema, expected)
+        self.assertNotIn("self", schema["function"]["parameters"]["properties"])
+
+    def test_dump_and_load_skip_introspection(self):
+        """
+        Testuje, že načtený artefakt úplně nahradí introspekci.
+        """
+        tools = AgentToolbox(PuzzleEnvironment()).get_tools()
+        expected = [generate_tool_schema(func) for func in tools]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "tool_schemas.json")
+            dump_tool_schemas(tools, path)
+            agent_tools._schema_cache.clear()
+            load_tool_schemas(path)
+
+            with patch("agent_tools.generate_tool_schema") as generator:
+                loaded = [get_tool_schema(func) for func in tools]
+                generator.assert_not_called()
+
+        self.assertEqual(loaded, expected)
+
+    def test_stale_artifact_is_regenerated(self):
+        """
+        Testuje, že záznam pro změněnou funkci se z artefaktu nepoužije.
+        """
+
+        def dummy(name: str):
+            """Původní popis."""
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "tool_schemas.json")
+            dump_tool_schemas([dummy], path)
+            agent_tools._schema_cache.clear()
+            load_tool_schemas(path)
+
+        dummy.__doc__ = "Nový popis."
+        schema = get_tool_schema(dummy)
+        self.assertEqual(schema["function"]["description"], "Nový popis.")
+
 
 if __name__ == "__main__":
     unittest.main()
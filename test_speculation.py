@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+import json
+import unittest
+
+import puzzle_solver
+from agent_tools import AgentToolbox
+from move_log import LoggedPuzzleEnvironment
+from puzzle_environment import AtomicPuzzleEnvironment, BitPuzzleEnvironment, PuzzleEnvironment
+from speculation import MoveSpeculator
+
+
+class TestMoveSpeculator(unittest.TestCase):
+    def test_served_responses_match_toolbox(self):
+        """
+        Testuje, že předpočítané odpovědi i stavy jsou stejné jako od nástroje.
+        """
+        for passengers in (["goat", "nothing", "wolf"], ["wolf", "cabbage", "goat"]):
+            for env_class in (PuzzleEnvironment, BitPuzzleEnvironment):
+                speculated_env = env_class()
+                speculator = MoveSpeculator(speculated_env)
+                reference_env = env_class()
+                toolbox = AgentToolbox(reference_env)
+                for passenger in passengers:
+                    speculator.prepare()
+                    self.assertEqual(
+                        speculator.move(passenger), toolbox.move_across_river(passenger)
+                    )
+                    self.assertEqual(speculated_env.state, reference_env.state)
+
+    def test_prepare_does_not_touch_environment(self):
+        """
+        Testuje, že předpočet pracuje jen na kopiích prostředí.
+        """
+        puzzle_env = PuzzleEnvironment()
+        before = puzzle_env.get_state_description()
+        MoveSpeculator(puzzle_env).prepare()
+        self.assertEqual(puzzle_env.get_state_description(), before)
+
+    def test_optimal_choice_rate_for_optimal_path(self):
+        """
+        Testuje, že nejkratší řešení má shodu s optimem 100 %.
+        """
+        puzzle_env = BitPuzzleEnvironment()
+        speculator = MoveSpeculator(puzzle_env)
+        for passenger in puzzle_solver.shortest_path():
+            speculator.prepare()
+            speculator.move(passenger)
+
+        self.assertTrue(puzzle_env.is_solved())
+        stats = speculator.stats()
+        self.assertEqual(stats["speculated_moves"], 7)
+        self.assertEqual(stats["speculation_hits"], 7)
+        self.assertEqual(stats["speculation_served"], 7)
+        self.assertEqual(stats["optimal_choice_rate"], 1.0)
+
+    def test_suboptimal_and_rejected_moves(self):
+        """
+        Testuje započtení neoptimální volby a odmítnutého tahu bez změny stavu.
+        """
+        puzzle_env = PuzzleEnvironment()
+        speculator = MoveSpeculator(puzzle_env)
+
+        response = json.loads(speculator.move("wolf"))
+        self.assertEqual(response["status"], "chyba")
+        self.assertEqual(puzzle_env.state["boat_location"], "left")
+
+        speculator.move("Goat")
+        self.assertIn("goat", puzzle_env.state["right_bank"])
+
+        stats = speculator.stats()
+        self.assertEqual(stats["speculated_moves"], 2)
+        # Odmítnutý tah stav nezměnil, druhý tah už předpočet našel.
+        self.assertEqual(stats["speculation_hits"], 1)
+        self.assertEqual(stats["optimal_choices"], 1)
+        self.assertEqual(stats["optimal_choice_rate"], 0.5)
+
+    def test_evaluate_only_mode(self):
+        """
+        Testuje režim bez obsluhy tahů - jen měření shody s optimem.
+        """
+        puzzle_env = PuzzleEnvironment()
+        speculator = MoveSpeculator(puzzle_env, serve=False)
+        self.assertIsNone(speculator.move("goat"))
+        self.assertEqual(puzzle_env.state["boat_location"], "left")
+        self.assertEqual(speculator.stats()["optimal_choices"], 1)
+
+    def test_unknown_passenger_falls_back_to_tool(self):
+        """
+        Testuje, že neznámý pasažér se předá skutečnému nástroji.
+        """
+        speculator = MoveSpeculator(PuzzleEnvironment())
+        self.assertIsNone(speculator.move("dragon"))
+        self.assertEqual(speculator.stats()["optimal_choices"], 0)
+
+    def test_served_moves_go_through_environment(self):
+        """
+        Testuje, že obsloužený tah provede prostředí (verze stavu, log tahů).
+        """
+        atomic_env = AtomicPuzzleEnvironment()
+        speculator = MoveSpeculator(atomic_env)
+        speculator.prepare()
+        speculator.move("goat")
+        speculator.move("goat")
+        self.assertEqual(atomic_env.version, 2)
+
+        logged_env = LoggedPuzzleEnvironment()
+        speculator = MoveSpeculator(logged_env)
+        for passenger in ["wolf"] + puzzle_solver.shortest_path():
+            speculator.prepare()
+            speculator.move(passenger)
+        self.assertTrue(logged_env.is_solved())
+        self.assertEqual(len(logged_env.move_log), 8)
+        self.assertEqual(speculator.stats()["speculation_served"], 8)
+
+    def test_start_runs_in_background(self):
+        """
+        Testuje, že start připraví spekulace ve vlákně a vrátí future.
+        """
+        puzzle_env = BitPuzzleEnvironment()
+        speculator = MoveSpeculator(puzzle_env)
+        speculator.start().result(timeout=5)
+        self.assertIn(puzzle_env.bits, speculator._speculations)
+
+
+if __name__ == "__main__":
+    unittest.main()
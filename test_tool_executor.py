@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+import asyncio
+import threading
+import time
+import unittest
+
+from tool_executor import ToolExecutor
+
+
+class TestToolExecutor(unittest.TestCase):
+    def test_batches(self):
+        """
+        Testuje dělení na dávky: souvislá čtení spolu, každý tah zvlášť.
+        """
+        executor = ToolExecutor()
+        names = [
+            "get_current_state",
+            "check_if_solved",
+            "move_across_river",
+            "move_across_river",
+            "get_current_state",
+            "move_sequence",
+            "check_if_solved",
+            "get_current_state",
+        ]
+        self.assertEqual(
+            executor.batches(names), [[0, 1], [2], [3], [4], [5], [6, 7]]
+        )
+        self.assertEqual(executor.batches([]), [])
+
+    def test_pure_calls_run_concurrently(self):
+        """
+        Testuje, že čtení jedné dávky běží současně (bariéra by jinak vypršela).
+        """
+        executor = ToolExecutor(max_workers=3)
+        barrier = threading.Barrier(3, timeout=5)
+
+        def dispatch(index):
+            barrier.wait()
+            return index * 10
+
+        try:
+            results = executor.run(["get_current_state"] * 3, dispatch)
+        finally:
+            executor.close()
+        self.assertEqual(results, [0, 10, 20])
+        self.assertEqual(executor.parallel_batches, 1)
+
+    def test_mutations_are_ordered_barriers(self):
+        """
+        Testuje, že tahy běží postupně a čtení vidí stav po předchozích tazích.
+        """
+        executor = ToolExecutor(max_workers=4)
+        names = [
+            "get_current_state",
+            "move_across_river",
+            "get_current_state",
+            "get_current_state",
+            "move_across_river",
+            "check_if_solved",
+        ]
+        state = {"moves": 0}
+        active = 0
+        overlap = []
+        lock = threading.Lock()
+
+        def dispatch(index):
+            nonlocal active
+            with lock:
+                active += 1
+                if names[index] == "move_across_river" and active > 1:
+                    overlap.append(index)
+            if names[index] == "move_across_river":
+                time.sleep(0.01)
+                state["moves"] += 1
+            seen = state["moves"]
+            with lock:
+                active -= 1
+            return (index, seen)
+
+        try:
+            results = executor.run(names, dispatch)
+        finally:
+            executor.close()
+
+        self.assertEqual(results, [(0, 0), (1, 1), (2, 1), (3, 1), (4, 2), (5, 2)])
+        self.assertEqual(overlap, [])
+
+    def test_sequential_by_default(self):
+        """
+        Testuje, že s jedním workerem běží vše postupně ve vlákně volajícího.
+        """
+        executor = ToolExecutor()
+        threads = executor.run(
+            ["get_current_state", "check_if_solved"],
+            lambda index: threading.current_thread(),
+        )
+        self.assertEqual(threads, [threading.current_thread()] * 2)
+        self.assertEqual(executor.parallel_batches, 0)
+
+    def test_error_stops_later_batches(self):
+        """
+        Testuje, že výjimka volání zastaví provádění dalších dávek.
+        """
+        executor = ToolExecutor(max_workers=2)
+        calls = []
+
+        def dispatch(index):
+            calls.append(index)
+            if index == 1:
+                raise RuntimeError("boom")
+            return index
+
+        try:
+            with self.assertRaises(RuntimeError):
+                executor.run(["get_current_state", "get_current_state", "move_across_river"], dispatch)
+        finally:
+            executor.close()
+        self.assertNotIn(2, calls)
+
+    def test_async_pure_calls_are_gathered(self):
+        """
+        Testuje asynchronní variantu: čtení jedné dávky se čekají současně
+        (jinak by první volání na událost čekalo marně), tahy postupně.
+        """
+        executor = ToolExecutor(max_workers=2)
+        names = ["get_current_state", "check_if_solved", "move_across_river", "get_current_state"]
+        order = []
+
+        async def run():
+            both_started = asyncio.Event()
+            started = []
+
+            async def dispatch(index):
+                order.append(index)
+                if index < 2:
+                    started.append(index)
+                    if len(started) == 2:
+                        both_started.set()
+                    await asyncio.wait_for(both_started.wait(), timeout=5)
+                return index * 10
+
+            return await executor.arun(names, dispatch)
+
+        self.assertEqual(asyncio.run(run()), [0, 10, 20, 30])
+        self.assertEqual(order, [0, 1, 2, 3])
+        self.assertEqual(executor.parallel_batches, 1)
+
+    def test_invalid_workers(self):
+        """
+        Testuje odmítnutí nulového počtu workerů.
+        """
+        with self.assertRaises(ValueError):
+            ToolExecutor(max_workers=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
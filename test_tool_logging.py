@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+import io
+import logging
+import unittest
+from agent_tools import AgentToolbox
+from mcp_server import create_mcp_server
+from puzzle_environment import PuzzleEnvironment
+from tool_logging import configure_tool_logging, get_tool_logger, stop_tool_logging
+
+
+class TestToolLogging(unittest.TestCase):
+    def tearDown(self):
+        stop_tool_logging()
+
+    def test_tools_log_instead_of_print(self):
+        """
+        Testuje, že nástroje hlásí volání přes logger a ne na stdout.
+        """
+        toolbox = AgentToolbox(PuzzleEnvironment())
+        with self.assertLogs("puzzle.tools", level="INFO") as logs:
+            toolbox.move_across_river("goat")
+        self.assertEqual(
+            logs.output,
+            ["INFO:puzzle.tools:--- Nástroj 'move_across_river' byl zavolán s pasažérem: 'goat' ---"],
+        )
+
+        with self.assertLogs("puzzle.mcp", level="INFO") as logs:
+            create_mcp_server().call_tool("get_current_state", {})
+        self.assertIn("get_current_state", logs.output[0])
+
+    def test_unconfigured_is_silent(self):
+        """
+        Testuje, že bez nastavení se INFO hlášky vůbec nezpracují.
+        """
+        self.assertFalse(get_tool_logger("tools").isEnabledFor(logging.INFO))
+
+    def test_sync_mode(self):
+        """
+        Testuje přímý výpis hlášek do zadaného streamu.
+        """
+        stream = io.StringIO()
+        configure_tool_logging("sync", stream=stream)
+        AgentToolbox(PuzzleEnvironment()).get_current_state()
+        self.assertEqual(stream.getvalue(), "--- Nástroj 'get_current_state' byl zavolán. ---\n")
+
+    def test_queue_mode(self):
+        """
+        Testuje zápis přes frontu - vše je ve streamu po zastavení listeneru.
+        """
+        stream = io.StringIO()
+        configure_tool_logging("queue", stream=stream)
+        toolbox = AgentToolbox(PuzzleEnvironment())
+        for _ in range(100):
+            toolbox.check_if_solved()
+        stop_tool_logging()
+        self.assertEqual(stream.getvalue().count("check_if_solved"), 100)
+
+    def test_off_mode(self):
+        """
+        Testuje vypnutí hlášek; varování nástrojů zůstávají povolená.
+        """
+        stream = io.StringIO()
+        configure_tool_logging("sync", stream=stream)
+        configure_tool_logging("off")
+        AgentToolbox(PuzzleEnvironment()).get_current_state()
+        self.assertEqual(stream.getvalue(), "")
+        logger = get_tool_logger("tools")
+        self.assertFalse(logger.isEnabledFor(logging.INFO))
+        self.assertTrue(logger.isEnabledFor(logging.WARNING))
+
+    def test_unknown_mode(self):
+        """
+        Testuje odmítnutí neznámého režimu.
+        """
+        with self.assertRaises(ValueError):
+            configure_tool_logging("loud")
+
+
+if __name__ == "__main__":
+    unittest.main()
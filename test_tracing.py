@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+import main
+from llm_backends import create_backend_factory
+from tracing import NULL_TRACER, JsonlSpanExporter, Tracer, format_summary
+
+
+class TestTracer(unittest.TestCase):
+    def test_nested_spans(self):
+        """
+        Testuje zanoření spanů a sdílené trace_id.
+        """
+        tracer = Tracer()
+        with tracer.span("step", step=1) as step:
+            with tracer.span("completion") as completion:
+                completion.set(**{"gen_ai.usage.input_tokens": 10})
+
+        self.assertEqual([span.name for span in tracer.spans], ["completion", "step"])
+        self.assertEqual(completion.parent_span_id, step.span_id)
+        self.assertIsNone(step.parent_span_id)
+        self.assertEqual(completion.trace_id, step.trace_id)
+        self.assertEqual(len(step.trace_id), 32)
+        self.assertEqual(len(step.span_id), 16)
+        self.assertGreaterEqual(step.end_time_unix_nano, completion.end_time_unix_nano)
+
+        summary = tracer.summary()
+        self.assertEqual(summary["spans"]["step"]["count"], 1)
+        self.assertEqual(summary["input_tokens"], 10)
+        self.assertIn("completion", format_summary(summary))
+
+    def test_error_status(self):
+        """
+        Testuje, že výjimka span uzavře s chybovým stavem a projde dál.
+        """
+        tracer = Tracer()
+        with self.assertRaises(KeyError):
+            with tracer.span("tool"):
+                raise KeyError("missing")
+
+        self.assertEqual(tracer.spans[0].status["code"], "ERROR")
+        self.assertEqual(tracer.summary()["spans"]["tool"]["errors"], 1)
+        self.assertEqual(tracer._stack, [])
+
+    def test_span_in_worker_thread(self):
+        """
+        Testuje, že span z jiného vlákna nezasáhne do zásobníku a dostane
+        rodiče přes parent_span_id.
+        """
+        tracer = Tracer()
+        seen = []
+
+        def work(parent_span_id):
+            seen.append(tracer.current_span_id())
+            with tracer.span("dispatch", parent_span_id):
+                pass
+
+        with tracer.span("step") as step:
+            worker = threading.Thread(target=work, args=(step.span_id,))
+            worker.start()
+            worker.join()
+            self.assertEqual(tracer.current_span_id(), step.span_id)
+
+        self.assertEqual(seen, [None])
+        dispatch = tracer.spans[0]
+        self.assertEqual(dispatch.name, "dispatch")
+        self.assertEqual(dispatch.parent_span_id, step.span_id)
+
+    def test_jsonl_exporter(self):
+        """
+        Testuje zápis spanů jako JSONL záznamů.
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "trace.jsonl")
+            with JsonlSpanExporter(path) as exporter:
+                tracer = Tracer(exporter)
+                with tracer.span("episode"):
+                    with tracer.span("step", step=1):
+                        pass
+            with open(path, encoding="utf-8") as f:
+                records = [json.loads(line) for line in f]
+
+        self.assertEqual([r["name"] for r in records], ["step", "episode"])
+        self.assertEqual(records[0]["attributes"], {"step": 1})
+        self.assertEqual(records[0]["parent_span_id"], records[1]["span_id"])
+
+    def test_null_tracer(self):
+        """
+        Testuje, že výchozí tracer nic neměří a nevrací souhrn.
+        """
+        with NULL_TRACER.span("step") as span:
+            span.set(ignored=True)
+        self.assertIsNone(NULL_TRACER.summary())
+
+
+@patch("builtins.print")
+class TestTracedEpisode(unittest.TestCase):
+    def test_episode_spans(self, mocked_print):
+        """
+        Testuje spany celé epizody a tokeny z odpovědí modelu.
+        """
+        result = main.run_episode(
+            "offline", 20, backend_factory=create_backend_factory("oracle"), trace=True
+        )
+        spans = result["trace"]["spans"]
+
+        self.assertEqual(spans["episode"]["count"], 1)
+        self.assertEqual(spans["step"]["count"], result["steps"])
+        self.assertEqual(spans["completion"]["count"], result["steps"])
+        for name in ("dispatch", "parse", "tool"):
+            self.assertEqual(spans[name]["count"], result["tool_calls"])
+        self.assertEqual(result["trace"]["input_tokens"], result["prompt_tokens"])
+        self.assertEqual(result["trace"]["output_tokens"], result["completion_tokens"])
+
+    def test_untraced_episode(self, mocked_print):
+        """
+        Testuje, že epizoda bez měření nemá ve výsledku souhrn spanů.
+        """
+        result = main.run_episode(
+            "offline", 20, verbose=False, backend_factory=create_backend_factory("oracle")
+        )
+        self.assertNotIn("trace", result)
+
+    def test_async_episodes_have_separate_traces(self, mocked_print):
+        """
+        Testuje, že souběžné epizody sdílí exportér, ale ne trace_id.
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "trace.jsonl")
+            with JsonlSpanExporter(path) as exporter:
+                results = asyncio.run(
+                    main.run_episodes_async(
+                        3, 3, model="offline", max_steps=20,
+                        backend_factory=create_backend_factory("oracle", latency=0.001),
+                        trace_exporter=exporter,
+                    )
+                )
+            with open(path, encoding="utf-8") as f:
+                records = [json.loads(line) for line in f]
+
+        trace_ids = {r["trace"]["trace_id"] for r in results}
+        self.assertEqual(len(trace_ids), 3)
+        self.assertEqual({r["trace_id"] for r in records}, trace_ids)
+        spans = {r["span_id"]: r for r in records}
+        for record in records:
+            if record["parent_span_id"] is not None:
+                self.assertEqual(spans[record["parent_span_id"]]["trace_id"], record["trace_id"])
+
+
+if __name__ == "__main__":
+    unittest.main()
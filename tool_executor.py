@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+"""
+Tool executor - concurrent execution of the tool calls of one model turn
+
+A model may answer with several tool calls at once. Read-only ("pure")
+tools such as `get_current_state` and `check_if_solved` can run at the same
+time, while tools that change the puzzle must keep their order. The
+executor splits the calls into batches: each run of consecutive pure calls
+is one batch executed on a thread pool, each mutating call is a batch of
+its own executed on the caller's thread. Batches run one after another,
+so every call sees exactly the state it would see in sequential
+execution, and results come back in the original tool_call order.
+The asynchronous loop uses the same batches, awaiting the calls of a pure
+batch together with asyncio.gather instead of the thread pool.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+# Nástroje, které stav hádanky jen čtou (stejná jména má AgentToolbox i MCP server).
+PURE_TOOLS = frozenset({"get_current_state", "check_if_solved"})
+
+
+class ToolExecutor:
+    """
+    Provádí volání nástrojů jednoho tahu modelu.
+
+    :param pure_tools: Jména nástrojů bez vedlejších účinků.
+    :param max_workers: Počet vláken pro souběžná čtení; 1 = vše postupně.
+    """
+
+    def __init__(self, pure_tools=PURE_TOOLS, max_workers=1):
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self.pure_tools = frozenset(pure_tools)
+        self.max_workers = max_workers
+        self._executor = None
+        self.parallel_batches = 0
+
+    def is_pure(self, name):
+        return name in self.pure_tools
+
+    def batches(self, names):
+        """
+        Rozdělí volání (jména nástrojů v pořadí) na dávky indexů: souvislý úsek
+        čtení tvoří jednu dávku, každý měnící nástroj dávku samostatnou.
+        """
+        batches = []
+        for index, name in enumerate(names):
+            if self.is_pure(name) and batches and self.is_pure(names[batches[-1][0]]):
+                batches[-1].append(index)
+            else:
+                batches.append([index])
+        return batches
+
+    def _pool(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="tool"
+            )
+        return self._executor
+
+    def run(self, names, dispatch):
+        """
+        Provede `dispatch(index)` pro každé volání a vrátí výsledky v pořadí volání.
+        Výjimka kteréhokoli volání se propaguje a další dávky se už neprovedou.
+        """
+        results = [None] * len(names)
+        for batch in self.batches(names):
+            if len(batch) > 1 and self.max_workers > 1:
+                self.parallel_batches += 1
+                for index, value in zip(batch, self._pool().map(dispatch, batch)):
+                    results[index] = value
+            else:
+                for index in batch:
+                    results[index] = dispatch(index)
+        return results
+
+    async def arun(self, names, dispatch):
+        """
+        Asynchronní varianta run: `dispatch(index)` vrací korutinu a čtení jedné
+        dávky se čekají souběžně, nejvýše max_workers najednou.
+        """
+        results = [None] * len(names)
+        for batch in self.batches(names):
+            if len(batch) > 1 and self.max_workers > 1:
+                self.parallel_batches += 1
+                for start in range(0, len(batch), self.max_workers):
+                    chunk = batch[start:start + self.max_workers]
+                    values = await asyncio.gather(*(dispatch(index) for index in chunk))
+                    for index, value in zip(chunk, values):
+                        results[index] = value
+            else:
+                for index in batch:
+                    results[index] = await dispatch(index)
+        return results
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
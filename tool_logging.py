@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+"""
+Tool logging - levelled output for per-call tool chatter
+
+The tools (AgentToolbox, PuzzleMCPServer) report every call through a
+logger of the "puzzle" family instead of print(). Until someone configures
+the output, INFO messages go nowhere. configure_tool_logging picks a mode:
+
+- "off":   per-call messages are dropped already in logger.info
+           (benchmarks, production),
+- "sync":  messages go straight to the stream, in the same order as the
+           agent loop's print() (interactive single-episode runs),
+- "queue": a tool call only enqueues the record and a QueueListener thread
+           writes it to the stream, so a slow stdout does not stall tools.
+"""
+import atexit
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+LOGGER_NAME = "puzzle"
+LOG_MODES = ("off", "sync", "queue")
+
+_root_logger = logging.getLogger(LOGGER_NAME)
+# Bez nastavení nic nevypisujeme - ani přes logging.lastResort.
+_root_logger.addHandler(logging.NullHandler())
+
+_installed_handler = None
+_listener = None
+# Poslední nastavení (mode, stream, level); None = nenastaveno.
+_config = None
+
+
+def get_tool_logger(name):
+    """
+    Vrátí logger nástrojů, např. get_tool_logger("tools") -> "puzzle.tools".
+    """
+    return logging.getLogger(f"{LOGGER_NAME}.{name}")
+
+
+def stop_tool_logging():
+    """
+    Odpojí handler nastavený configure_tool_logging, vyprázdní frontu
+    a vrátí loggery do výchozího (nenastaveného) stavu.
+    """
+    global _installed_handler, _listener, _config
+    _config = None
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _installed_handler is not None:
+        _root_logger.removeHandler(_installed_handler)
+        _installed_handler = None
+    _root_logger.setLevel(logging.NOTSET)
+    _root_logger.propagate = True
+
+
+def configure_tool_logging(mode="sync", stream=None, level=logging.INFO):
+    """
+    Nastaví výstup hlášek nástrojů; opakované volání předchozí nastavení nahradí.
+
+    :param mode: "off", "sync" nebo "queue".
+    :param stream: Cíl výpisu (výchozí sys.stdout).
+    :param level: Nejnižší vypisovaná úroveň.
+    """
+    global _installed_handler, _listener, _config
+    if mode not in LOG_MODES:
+        raise ValueError(f"Unknown log mode '{mode}'. Must be one of: {', '.join(LOG_MODES)}")
+    stop_tool_logging()
+    _config = (mode, stream, level)
+
+    if mode == "off":
+        # Per-call hlášky jsou INFO; varování a chyby propadnou dál k aplikaci.
+        _root_logger.setLevel(logging.WARNING)
+        return
+
+    handler = logging.StreamHandler(stream if stream is not None else sys.stdout)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    if mode == "queue":
+        records = queue.SimpleQueue()
+        _listener = QueueListener(records, handler)
+        _listener.start()
+        handler = QueueHandler(records)
+
+    _installed_handler = handler
+    _root_logger.addHandler(handler)
+    _root_logger.setLevel(level)
+    # Hlášky nástrojů nemají zdvojeně projít i handlery kořenového loggeru.
+    _root_logger.propagate = False
+
+
+def tool_logging_config():
+    """
+    Vrátí aktuální nastavení (mode, stream, level), nebo None, pokud výstup nikdo nenastavil.
+    """
+    return _config
+
+
+def restore_tool_logging(config):
+    """
+    Obnoví nastavení vrácené dříve funkcí tool_logging_config.
+    """
+    if config is None:
+        stop_tool_logging()
+    else:
+        configure_tool_logging(*config)
+
+
+atexit.register(stop_tool_logging)
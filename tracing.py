@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+"""
+Tracing - per-step spans for the agent loop
+
+A Tracer records nested spans (episode -> step -> completion / parse /
+dispatch / tool) with OpenTelemetry-compatible fields: 128-bit trace id,
+64-bit span ids, unix-nanosecond start/end times, a status and attributes
+named after the OpenTelemetry GenAI conventions (`gen_ai.usage.input_tokens`
+and friends). Finished spans can be streamed to a JSONL file, one record
+per line, and every tracer can summarize where an episode spent its time.
+
+Tracing is off by default: NULL_TRACER hands out a shared no-op span, so
+the untraced loop pays only for a method call per span.
+"""
+import json
+import os
+import threading
+import time
+
+
+class Span:
+    """
+    Jeden měřený úsek. Atributy lze doplnit během běhu přes `set`.
+    """
+
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent_span_id",
+        "start_time_unix_nano",
+        "end_time_unix_nano",
+        "attributes",
+        "status",
+        "_started",
+    )
+
+    def __init__(self, name, trace_id, parent_span_id, attributes):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_span_id = parent_span_id
+        self.attributes = attributes
+        self.status = {"code": "OK"}
+        self.start_time_unix_nano = time.time_ns()
+        self.end_time_unix_nano = None
+        self._started = time.perf_counter_ns()
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def end(self):
+        # Délka z monotónních hodin, aby ji neovlivnila změna systémového času.
+        self.end_time_unix_nano = self.start_time_unix_nano + (
+            time.perf_counter_ns() - self._started
+        )
+
+    @property
+    def duration_ms(self):
+        return (self.end_time_unix_nano - self.start_time_unix_nano) / 1e6
+
+    def to_record(self):
+        """
+        Vrátí záznam ve tvaru OpenTelemetry span (JSON serializovatelný).
+        """
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "start_time_unix_nano": self.start_time_unix_nano,
+            "end_time_unix_nano": self.end_time_unix_nano,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class _ActiveSpan:
+    """
+    Context manager, který span otevře, zanoří a při výstupu uzavře.
+    """
+
+    __slots__ = ("tracer", "span")
+
+    def __init__(self, tracer, span):
+        self.tracer = tracer
+        self.span = span
+
+    def __enter__(self):
+        self.tracer._stack.append(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        span = self.span
+        span.end()
+        if exc_type is not None:
+            span.status = {"code": "ERROR", "message": f"{exc_type.__name__}: {exc}"}
+        stack = self.tracer._stack
+        if stack[-1] is span:
+            stack.pop()
+        else:
+            # Souběžné korutiny jednoho vlákna mohou spany uzavírat napřeskáčku.
+            stack.remove(span)
+        self.tracer._finish(span)
+        return False
+
+
+class Tracer:
+    """
+    Sběr spanů jedné epizody.
+
+    Každá epizoda má vlastní Tracer (vlastní trace_id a zásobník otevřených
+    spanů), takže souběžné asynchronní epizody se nepletou. Zásobník je
+    zvlášť pro každé vlákno; span otevřený ve vlákně poolu dostane rodiče
+    explicitně přes `parent_span_id`. Exportér může být sdílený.
+
+    :param exporter: Objekt s metodou `export(span)`, např. JsonlSpanExporter.
+    """
+
+    def __init__(self, exporter=None):
+        self.trace_id = os.urandom(16).hex()
+        self.exporter = exporter
+        self.spans = []
+        self._local = threading.local()
+
+    @property
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def current_span_id(self):
+        """
+        Vrátí id právě otevřeného spanu tohoto vlákna (None mimo span).
+        """
+        stack = self._stack
+        return stack[-1].span_id if stack else None
+
+    def span(self, name, parent_span_id=None, **attributes):
+        parent = parent_span_id or self.current_span_id()
+        return _ActiveSpan(self, Span(name, self.trace_id, parent, attributes))
+
+    def _finish(self, span):
+        self.spans.append(span)
+        if self.exporter is not None:
+            self.exporter.export(span)
+
+    def summary(self):
+        """
+        Agreguje dokončené spany podle jména a sečte tokeny z volání modelu.
+        """
+        by_name = {}
+        for span in self.spans:
+            stats = by_name.setdefault(
+                span.name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "errors": 0}
+            )
+            duration = span.duration_ms
+            stats["count"] += 1
+            stats["total_ms"] += duration
+            stats["max_ms"] = max(stats["max_ms"], duration)
+            if span.status["code"] != "OK":
+                stats["errors"] += 1
+        for stats in by_name.values():
+            stats["mean_ms"] = stats["total_ms"] / stats["count"]
+
+        completions = [span for span in self.spans if span.name == "completion"]
+        return {
+            "trace_id": self.trace_id,
+            "spans": by_name,
+            "input_tokens": sum(
+                s.attributes.get("gen_ai.usage.input_tokens", 0) for s in completions
+            ),
+            "output_tokens": sum(
+                s.attributes.get("gen_ai.usage.output_tokens", 0) for s in completions
+            ),
+        }
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    span_id = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+
+class NullTracer:
+    """
+    Tracer, který nic neměří - výchozí stav smyčky.
+    """
+
+    _span = _NullSpan()
+    spans = ()
+
+    def span(self, name, parent_span_id=None, **attributes):
+        return self._span
+
+    def current_span_id(self):
+        return None
+
+    def summary(self):
+        return None
+
+
+NULL_TRACER = NullTracer()
+
+
+class JsonlSpanExporter:
+    """
+    Zapisuje dokončené spany jako JSONL; lze sdílet mezi epizodami i vlákny.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        line = json.dumps(span.to_record(), ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def format_summary(summary):
+    """
+    Vrátí čitelnou tabulku souhrnu pro výpis na konci epizody.
+    """
+    lines = [f"{'span':<12}{'počet':>7}{'celkem ms':>12}{'průměr ms':>12}{'max ms':>10}"]
+    for name, stats in sorted(
+        summary["spans"].items(), key=lambda item: item[1]["total_ms"], reverse=True
+    ):
+        lines.append(
+            f"{name:<12}{stats['count']:>7}{stats['total_ms']:>12.2f}"
+            f"{stats['mean_ms']:>12.3f}{stats['max_ms']:>10.2f}"
+        )
+    lines.append(
+        f"tokeny: vstup {summary['input_tokens']}, výstup {summary['output_tokens']}"
+    )
+    return "\n".join(lines)